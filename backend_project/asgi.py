@@ -3,6 +3,9 @@ ASGI config for backend_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Las peticiones HTTP las atiende Django; las conexiones websocket
+(/ws/viajes/<id>/) van a travel/consumers.py.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +16,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_project.settings')
 
-application = get_asgi_application()
+# Primero se inicializa Django; recién después se pueden importar modelos
+django_application = get_asgi_application()
+
+from travel.consumers import websocket_application  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
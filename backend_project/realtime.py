@@ -0,0 +1,268 @@
+"""
+Pub/sub para las actualizaciones en tiempo real (websockets, ver travel/consumers.py).
+
+Las vistas y servicios (código normal, síncrono) PUBLICAN mensajes en un
+canal, ej. "viaje:15" o "conductor:7"; cada websocket abierto está
+SUSCRITO a los canales que le interesan y recibe los mensajes al instante.
+Así el pasajero no tiene que preguntar cada pocos segundos "¿y ahora?".
+
+El "broker" que reparte los mensajes se elige con REALTIME_BROKER:
+- InMemoryBroker (por defecto): dentro del mismo proceso. Sirve si la API
+  y los websockets corren en UN proceso ASGI (uvicorn con un worker).
+- RedisBroker: reparte entre procesos y servidores (pub/sub de Redis).
+  Hace falta con varios workers. Necesita el paquete 'redis'. Usa una
+  sola conexión de pub/sub por worker, sin importar cuántos clientes tenga.
+
+Los mensajes son dicts que se puedan pasar a JSON. Publicar nunca bloquea
+ni falla por culpa de un cliente lento: si su cola se llena, se descartan
+sus mensajes más viejos (lo que importa es el último estado/ubicación).
+"""
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+TAMANO_COLA = 100
+
+
+class Subscription:
+    """Los mensajes de uno o varios canales para UN cliente."""
+
+    async def listo(self):
+        """Espera a que la suscripción esté activa: lo publicado desde ahora llega."""
+
+    async def get(self):
+        """Espera y devuelve el siguiente mensaje (un dict)."""
+        raise NotImplementedError
+
+    async def close(self):
+        raise NotImplementedError
+
+
+class Broker:
+    """Interfaz de los brokers: publish() se llama desde cualquier hilo; subscribe() desde el event loop."""
+
+    def publish(self, canal, mensaje):
+        raise NotImplementedError
+
+    def subscribe(self, canales):
+        raise NotImplementedError
+
+
+# ---------------------------------------------------------------------------
+# BROKER EN MEMORIA (un solo proceso)
+# ---------------------------------------------------------------------------
+class _ColaLocal(Subscription):
+
+    def __init__(self, broker, canales):
+        self._broker = broker
+        self.canales = tuple(canales)
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue(maxsize=TAMANO_COLA)
+
+    def _poner(self, mensaje):
+        # Corre dentro del event loop del suscriptor
+        if self._cola.full():
+            self._cola.get_nowait()  # Cliente lento: perdemos el mensaje más viejo
+        self._cola.put_nowait(mensaje)
+
+    def entregar(self, mensaje):
+        """Se llama desde el hilo que publica."""
+        try:
+            self._loop.call_soon_threadsafe(self._poner, mensaje)
+        except RuntimeError:
+            pass  # El loop ya se cerró: el cliente se fue
+
+    async def get(self):
+        return await self._cola.get()
+
+    async def close(self):
+        self._broker._desuscribir(self)
+
+
+class InMemoryBroker(Broker):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._suscriptores = defaultdict(set)  # canal -> {_ColaLocal}
+
+    def __len__(self):
+        return sum(len(s) for s in self._suscriptores.values())
+
+    def publish(self, canal, mensaje):
+        with self._lock:
+            suscriptores = list(self._suscriptores.get(canal, ()))
+        for suscripcion in suscriptores:
+            suscripcion.entregar(mensaje)
+        return len(suscriptores)
+
+    def subscribe(self, canales):
+        suscripcion = _ColaLocal(self, canales)
+        with self._lock:
+            for canal in suscripcion.canales:
+                self._suscriptores[canal].add(suscripcion)
+        return suscripcion
+
+    def _desuscribir(self, suscripcion):
+        with self._lock:
+            for canal in suscripcion.canales:
+                suscriptores = self._suscriptores.get(canal)
+                if suscriptores is not None:
+                    suscriptores.discard(suscripcion)
+                    if not suscriptores:
+                        del self._suscriptores[canal]
+
+
+# ---------------------------------------------------------------------------
+# BROKER CON REDIS (varios procesos / servidores)
+# ---------------------------------------------------------------------------
+class _SuscripcionRedis(Subscription):
+    """Una cola local (ver InMemoryBroker); la conexión a Redis es del broker."""
+
+    def __init__(self, broker, local, pendientes):
+        self._broker = broker
+        self._local = local
+        self.canales = local.canales
+        self._pendientes = pendientes  # Los SUBSCRIBE a Redis de sus canales
+
+    async def listo(self):
+        if self._pendientes:
+            await asyncio.gather(*self._pendientes)
+
+    async def get(self):
+        return await self._local.get()
+
+    async def close(self):
+        await self._local.close()
+        self._broker._soltar(self.canales)
+
+
+def _fallo(tarea):
+    return tarea.done() and (tarea.cancelled() or tarea.exception() is not None)
+
+
+class RedisBroker(Broker):
+    """
+    UNA conexión de pub/sub a Redis por worker, suscrita a los canales que
+    tienen al menos un cliente en este worker; lo que llega se reparte a
+    las colas locales con un InMemoryBroker. (Una conexión por websocket
+    llegaría al 'maxclients' de Redis con unos miles de clientes.)
+    """
+
+    def __init__(self, url=None):
+        self._url = url or getattr(settings, 'REALTIME_REDIS_URL', 'redis://localhost:6379/2')
+        self._publicador = None
+        self._local = InMemoryBroker()
+        self._loop = None
+        self._pubsub = None
+        self._lector = None
+        self._canales = {}  # canal -> (cuántas suscripciones locales, tarea del SUBSCRIBE)
+
+    def _conectar(self):
+        """El pub/sub de Redis para el event loop actual."""
+        import redis.asyncio  # Solo hace falta si se usa este broker
+        return redis.asyncio.Redis.from_url(self._url).pubsub(ignore_subscribe_messages=True)
+
+    def publish(self, canal, mensaje):
+        if self._publicador is None:
+            import redis
+            self._publicador = redis.Redis.from_url(self._url)
+        return self._publicador.publish(canal, json.dumps(mensaje, default=str))
+
+    def _preparar(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Primer uso en este event loop (uno por worker ASGI)
+            self._loop, self._pubsub, self._canales = loop, self._conectar(), {}
+            self._lector = loop.create_task(self._leer(self._pubsub))
+
+    async def _leer(self, pubsub):
+        """Reparte lo que llega de Redis a las colas locales."""
+        while True:
+            try:
+                if not pubsub.subscribed:
+                    await asyncio.sleep(0.05)
+                    continue
+                mensaje = await pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Error leyendo de Redis (se reintenta): {e}")
+                await asyncio.sleep(1)
+                continue
+            if mensaje is not None and mensaje.get('type') == 'message':
+                canal = mensaje['channel']
+                canal = canal.decode() if isinstance(canal, bytes) else canal
+                self._local.publish(canal, json.loads(mensaje['data']))
+
+    def subscribe(self, canales):
+        self._preparar()
+        local = self._local.subscribe(canales)
+        pendientes = []
+        for canal in local.canales:
+            cuantas, tarea = self._canales.get(canal, (0, None))
+            if cuantas == 0 or _fallo(tarea):
+                tarea = self._loop.create_task(self._pubsub.subscribe(canal))
+            self._canales[canal] = (cuantas + 1, tarea)
+            pendientes.append(tarea)
+        return _SuscripcionRedis(self, local, pendientes)
+
+    def _soltar(self, canales):
+        for canal in canales:
+            cuantas, tarea = self._canales.get(canal, (1, None))
+            if cuantas > 1:
+                self._canales[canal] = (cuantas - 1, tarea)
+            else:
+                # Ya nadie en este worker escucha el canal
+                self._canales.pop(canal, None)
+                self._loop.create_task(self._pubsub.unsubscribe(canal))
+
+
+# ---------------------------------------------------------------------------
+# ACCESO AL BROKER
+# ---------------------------------------------------------------------------
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """El broker configurado en REALTIME_BROKER (se crea una vez por proceso)."""
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                clase = getattr(settings, 'REALTIME_BROKER', 'backend_project.realtime.InMemoryBroker')
+                _broker = import_string(clase)()
+    return _broker
+
+
+def publish_now(canal, mensaje):
+    """Publica el mensaje ya. Un error del broker se registra, pero nunca rompe la petición."""
+    try:
+        get_broker().publish(canal, mensaje)
+    except Exception as e:
+        logger.warning(f"No se pudo publicar en {canal}: {e}")
+
+
+def publish(canal, mensaje):
+    """Publica el mensaje cuando termine la transacción actual (si se deshace, no se publica nada)."""
+    transaction.on_commit(lambda: publish_now(canal, mensaje))
+
+
+def canal_viaje(viaje_id):
+    return f"viaje:{viaje_id}"
+
+
+def canal_conductor(conductor_id):
+    return f"conductor:{conductor_id}"
+
+
+def canal_ticket(ticket_id):
+    return f"ticket:{ticket_id}"
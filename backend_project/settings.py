@@ -129,6 +129,24 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Hash de contraseñas (ver users/hashing.py)
+# El primero es el que se usa para las claves nuevas; los demás solo para verificar claves viejas
+PASSWORD_HASHERS = [
+    'users.hashing.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# Costo de cada hash: más iteraciones = más seguro, pero menos logins por segundo.
+# Elegirlo midiendo con 'python manage.py benchmark_password_hashers' (OWASP recomienda >= 600000).
+PASSWORD_PBKDF2_ITERATIONS = int(os.environ.get('PASSWORD_PBKDF2_ITERATIONS', 1_000_000))
+# Hashes a la vez por worker, y cuántos pueden esperar turno antes de responder 429
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 2))
+PASSWORD_HASHING_QUEUE = int(os.environ.get('PASSWORD_HASHING_QUEUE', 8))
+
+# El login normal de Django, pero con el hash en el pool con cupo
+AUTHENTICATION_BACKENDS = ['users.backends.PooledModelBackend']
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -155,9 +173,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # -----------------------------------------------------------------
 
 REST_FRAMEWORK = {
-    # Usamos la autenticación de JWT por defecto
+    # Usamos la autenticación de JWT por defecto (el usuario sale del token,
+    # sin consultar la BD en cada petición; ver users/authentication.py)
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ),
     # Por defecto, todas las vistas requerirán un token (ser logueado)
     'DEFAULT_PERMISSION_CLASSES': (
@@ -175,7 +194,9 @@ SIMPLE_JWT = {
     
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': False,
-    'UPDATE_LAST_LOGIN': True, # Actualiza el "último login" del usuario
+    # El "último login" NO se escribe dentro del login: se anota en memoria y
+    # se guarda en lote (ver users/logins.py y LAST_LOGIN_FLUSH_INTERVAL_SECONDS)
+    'UPDATE_LAST_LOGIN': False,
 
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY, # ¡Usa nuestra clave secreta!
@@ -191,4 +212,86 @@ SIMPLE_JWT = {
     'TOKEN_USER_CLASS': 'django.contrib.auth.models.User',
 
     'JTI_CLAIM': 'jti',
-}
\ No newline at end of file
+
+    # El login agrega al token el perfil y los roles del usuario
+    'TOKEN_OBTAIN_SERIALIZER': 'users.authentication.PerfilTokenObtainPairSerializer',
+    # Si el usuario cambia su contraseña, sus tokens anteriores dejan de valer
+    'CHECK_REVOKE_TOKEN': True,
+}
+# Cada cuántos segundos se revisa en la BD si el usuario del token sigue activo
+# (y no cambió su contraseña). Es lo más que tarda en notarse una revocación.
+JWT_REVOCATION_CHECK_SECONDS = 60
+# Cada cuántos segundos se guarda en lote el "último login" de los usuarios
+LAST_LOGIN_FLUSH_INTERVAL_SECONDS = 10
+LAST_LOGIN_FLUSH_BATCH_SIZE = 1000
+
+
+# -----------------------------------------------------------------
+# UBICACIÓN Y BÚSQUEDA DE CONDUCTORES CERCANOS
+# -----------------------------------------------------------------
+# Tamaño de cada celda de la grilla (en grados, ~1.1 km).
+# Si se cambia, hay que recalcular 'UserProfile.grid_cell'.
+DRIVER_GRID_CELL_DEG = 0.01
+# Cada cuántos segundos cada worker recarga su índice desde la BD
+DRIVER_INDEX_REFRESH_SECONDS = 30
+# Cada cuántos milisegundos se guardan en lote los pings GPS de los conductores
+LOCATION_FLUSH_INTERVAL_MS = 1000
+LOCATION_FLUSH_BATCH_SIZE = 1000
+
+
+# -----------------------------------------------------------------
+# DESPACHO DE VIAJES
+# -----------------------------------------------------------------
+# Radio (km) en el que buscamos conductores y a cuántos se les ofrece el viaje
+DISPATCH_RADIUS_KM = 5.0
+DISPATCH_MAX_OFFERS = 5
+
+# -----------------------------------------------------------------
+# TARIFAS DE VIAJES (en soles)
+# -----------------------------------------------------------------
+# precio = max(MINIMA, BASE + POR_KM * km) * multiplicador de la zona
+TARIFA_BASE = '3.00'
+TARIFA_POR_KM = '1.20'
+TARIFA_MINIMA = '5.00'
+# La distancia en línea recta se multiplica por esto para aproximar la ruta real
+FACTOR_DISTANCIA_RUTA = '1.30'
+# Cada cuántos segundos cada worker recarga las tarifas dinámicas por zona (se editan en el admin)
+SURGE_REFRESH_SECONDS = 60
+# Comisión que se queda la App por cada viaje (10%)
+COMISION_APP = '0.10'
+
+
+# -----------------------------------------------------------------
+# CACHÉ
+# -----------------------------------------------------------------
+# En memoria por defecto (una por worker). En producción conviene una compartida,
+# ej. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache y CACHE_LOCATION=redis://redis:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+# Roles y tipos de método de pago viven en memoria en cada worker (users/catalogs.py).
+# Cada cuántos segundos un worker mira en la caché si otro los cambió.
+CATALOG_VERSION_CHECK_SECONDS = 5
+# Y cada cuántos los recarga igual (por si la caché no es compartida o se perdió un aviso).
+CATALOG_MAX_AGE_SECONDS = 300
+
+# -----------------------------------------------------------------
+# CUPONES DE PROMOCIÓN
+# -----------------------------------------------------------------
+# Cuántos segundos se guarda en caché un cupón (se borra al editarlo en el admin)
+PROMO_CODE_CACHE_SECONDS = 300
+# Cada cuántos segundos cada worker recarga su lista de cupones activos (para elegir el mejor)
+PROMO_INDEX_REFRESH_SECONDS = 60
+# Los usos de cupones vencidos hace más de estos días se mueven al archivo
+PROMO_ARCHIVE_AFTER_DAYS = 90
+
+# -----------------------------------------------------------------
+# TIEMPO REAL (websockets de los viajes, ver backend_project/realtime.py)
+# -----------------------------------------------------------------
+# En memoria solo llega a los websockets del MISMO proceso. Con varios workers
+# hay que usar REALTIME_BROKER=backend_project.realtime.RedisBroker
+REALTIME_BROKER = os.environ.get('REALTIME_BROKER', 'backend_project.realtime.InMemoryBroker')
+REALTIME_REDIS_URL = os.environ.get('REALTIME_REDIS_URL', 'redis://localhost:6379/2')
@@ -45,6 +45,18 @@ urlpatterns = [
     # "Cualquier URL que empiece con 'api/users/'
     # debe ser manejada por el archivo 'users.urls.py'"
     path('api/users/', include('users.urls')),
+
+    # 3. URLs de la app 'travel' (viajes)
+    path('api/travel/', include('travel.urls')),
+
+    # 4. URLs de la app 'wallets' (billeteras)
+    path('api/wallets/', include('wallets.urls')),
+
+    # 5. URLs de la app 'promotions' (cupones)
+    path('api/promotions/', include('promotions.urls')),
+
+    # 6. URLs de la app 'support' (tickets de soporte)
+    path('api/support/', include('support.urls')),
     
-    # (Aquí, en el futuro, conectaremos las URLs de 'travel', 'reviews', etc.)
+    # (Aquí, en el futuro, conectaremos las URLs de 'reviews', etc.)
 ]
\ No newline at end of file
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PromoCode, UserPromoCodeUsage
+from .models import PromoCode, UserPromoCodeUsage, UserPromoCodeUsageArchive
 
 # Register your models here.
 
@@ -12,15 +12,29 @@ class PromoCodeAdmin(admin.ModelAdmin):
         'valid_from', 
         'valid_to', 
         'max_uses', 
+        'times_used',
         'uses_per_user'
     )
-    list_filter = ('is_active', 'discount_type')
+    list_filter = ('is_active', 'discount_type', 'campaign')
     search_fields = ('code', 'description')
+    readonly_fields = ('times_used',) # Lo lleva el canje (promotions/services.py)
 
 class UserPromoCodeUsageAdmin(admin.ModelAdmin):
     list_display = ('user_profile', 'promo_code', 'used_at', 'viaje')
     search_fields = ('user_profile__full_name', 'promo_code__code')
     autocomplete_fields = ('user_profile', 'promo_code', 'viaje') # Facilita la búsqueda
 
+class UserPromoCodeUsageArchiveAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user_profile_id', 'promo_code_id', 'viaje_id', 'used_at', 'archived_at')
+    list_filter = ('archived_at',)
+
+    # Solo lectura: lo llena el comando 'cleanup_promotions'
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 admin.site.register(PromoCode, PromoCodeAdmin)
-admin.site.register(UserPromoCodeUsage, UserPromoCodeUsageAdmin)
\ No newline at end of file
+admin.site.register(UserPromoCodeUsage, UserPromoCodeUsageAdmin)
+admin.site.register(UserPromoCodeUsageArchive, UserPromoCodeUsageArchiveAdmin)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PromotionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'promotions'
+
+    # Carga los "signals" (limpian la caché de cupones al editarlos)
+    def ready(self):
+        import promotions.signals
@@ -0,0 +1,86 @@
+"""
+Limpieza de cupones vencidos (para correr cada noche, ver 'cleanup_promotions').
+
+1. Desactiva los cupones activos cuyo 'valid_to' ya pasó, usando el índice
+   (is_active, valid_to), y los saca de la caché.
+2. Mueve a UserPromoCodeUsageArchive los usos de los cupones que vencieron
+   hace más de PROMO_ARCHIVE_AFTER_DAYS días.
+
+Todo va por lotes de tamaño fijo, cada uno en su propia transacción corta,
+así ninguna fila queda bloqueada mucho tiempo y el job se puede cortar y
+volver a correr en cualquier momento.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .discounts import promo_index
+from .models import PromoCode, UserPromoCodeUsage, UserPromoCodeUsageArchive
+from .services import forget_promo_codes
+
+CAMPOS_USO = ('id', 'user_profile_id', 'promo_code_id', 'viaje_id', 'used_at')
+
+
+def deactivate_expired(ahora=None, batch_size=1000, pausa=0, on_batch=None):
+    """Desactiva los cupones vencidos. Devuelve cuántos se desactivaron."""
+    ahora = ahora or timezone.now()
+    total = 0
+    while True:
+        vencidos = dict(
+            PromoCode.objects.filter(is_active=True, valid_to__lt=ahora)
+            .values_list('id', 'code')[:batch_size]
+        )
+        if not vencidos:
+            break
+        total += PromoCode.objects.filter(pk__in=vencidos, is_active=True).update(is_active=False)
+        forget_promo_codes(vencidos.values())
+        if on_batch:
+            on_batch(total)
+        time.sleep(pausa)
+    if total:
+        promo_index.invalidar()
+    return total
+
+
+def _cupones_para_archivar(antes_de, desde_id, cuantos):
+    return list(
+        PromoCode.objects.filter(is_active=False, valid_to__lt=antes_de, pk__gt=desde_id)
+        .order_by('pk').values_list('id', flat=True)[:cuantos]
+    )
+
+
+def archive_usages(antes_de=None, batch_size=1000, pausa=0, on_batch=None):
+    """
+    Mueve al archivo los usos de cupones desactivados que vencieron antes de
+    'antes_de' (por defecto, hace PROMO_ARCHIVE_AFTER_DAYS días).
+    Cada lote copia y borra como mucho 'batch_size' usos en una transacción.
+    Devuelve cuántos usos se archivaron.
+    """
+    if antes_de is None:
+        antes_de = timezone.now() - timedelta(days=getattr(settings, 'PROMO_ARCHIVE_AFTER_DAYS', 90))
+    total, ultimo_cupon = 0, 0
+    while True:
+        cupones = _cupones_para_archivar(antes_de, ultimo_cupon, 500)
+        if not cupones:
+            return total
+        ultimo_cupon = cupones[-1]
+        while True:
+            with transaction.atomic():
+                usos = list(
+                    UserPromoCodeUsage.objects.filter(promo_code_id__in=cupones)
+                    .order_by('pk').values(*CAMPOS_USO)[:batch_size]
+                )
+                if not usos:
+                    break
+                # ignore_conflicts: si un lote anterior se cortó a la mitad, no se duplica
+                UserPromoCodeUsageArchive.objects.bulk_create(
+                    [UserPromoCodeUsageArchive(**uso) for uso in usos], ignore_conflicts=True
+                )
+                UserPromoCodeUsage.objects.filter(pk__in=[uso['id'] for uso in usos]).delete()
+            total += len(usos)
+            if on_batch:
+                on_batch(total)
+            time.sleep(pausa)
@@ -0,0 +1,145 @@
+"""
+Motor de descuentos: elegir el mejor cupón para un viaje.
+
+Cada worker tiene en memoria los cupones activos que todavía no vencieron
+y que no son de una campaña masiva, ordenados por 'valid_from'. Para saber cuáles están vigentes AHORA no se
+consulta la BD: con bisect se corta la lista en los que ya empezaron y
+de esos se descartan los que vencieron desde la última carga.
+
+Para elegir el mejor se recorren todos los vigentes en una sola pasada
+(calculando el descuento de cada uno), con UNA sola consulta a la BD:
+cuántas veces usó el usuario cada cupón (índice user_profile, promo_code).
+Los límites se vuelven a verificar de forma atómica al canjearlo
+(ver promotions/services.py), así que un índice un poco viejo no regala
+cupones de más: como mucho deja de ofrecer uno recién creado por unos segundos.
+
+Los cupones de campaña (miles de códigos de un solo uso) no entran al índice:
+si el pasajero escribe uno, se busca en la caché de cupones.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import PromoCode, UserPromoCodeUsage
+from .services import PromoCodeError, calcular_descuento, get_active_promo, redeem_promo_code
+
+CERO = Decimal('0.00')
+# Cuántos cupones se devuelven como alternativa (por si el mejor se agota al canjearlo)
+ALTERNATIVAS = 5
+
+# Los campos que hacen falta para elegir y calcular el descuento
+CAMPOS_INDICE = (
+    'id', 'code', 'discount_type', 'discount_value', 'max_discount_amount',
+    'valid_from', 'valid_to', 'max_uses', 'uses_per_user', 'times_used',
+)
+
+
+class ActivePromoIndex:
+    """
+    Cupones activos en memoria, ordenados por fecha de inicio.
+    Se reemplaza entero en cada recarga (las lecturas no se bloquean).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cupones = []   # PromoCode ordenados por valid_from
+        self._inicios = []   # Sus valid_from, para bisect
+        self.cargado_en = None
+
+    def __len__(self):
+        return len(self._cupones)
+
+    def reemplazar(self, cupones):
+        cupones = sorted(cupones, key=lambda c: c.valid_from)
+        with self._lock:
+            # Se cambian juntas, así una lectura nunca ve una lista vieja con inicios nuevos
+            self._cupones, self._inicios = cupones, [c.valid_from for c in cupones]
+            self.cargado_en = time.monotonic()
+
+    def invalidar(self):
+        """La próxima consulta recarga desde la BD (ej. se editó un cupón en este worker)."""
+        self.cargado_en = None
+
+    def vigentes(self, ahora):
+        """Los cupones con valid_from <= ahora <= valid_to."""
+        cupones, inicios = self._cupones, self._inicios
+        return [c for c in cupones[:bisect_right(inicios, ahora)] if c.valid_to >= ahora]
+
+
+promo_index = ActivePromoIndex()
+
+
+def refresh_promo_index(force=False):
+    """Recarga los cupones activos si nunca se cargaron o si el índice ya está "viejo"."""
+    segundos = getattr(settings, 'PROMO_INDEX_REFRESH_SECONDS', 60)
+    cargado_en = promo_index.cargado_en
+    if force or cargado_en is None or time.monotonic() - cargado_en > segundos:
+        promo_index.reemplazar(
+            PromoCode.objects.filter(is_active=True, valid_to__gte=timezone.now(), campaign='')
+            .only(*CAMPOS_INDICE).iterator(chunk_size=2000)
+        )
+
+
+def elegir_descuentos(cupones, usos_del_usuario, monto, cuantos=ALTERNATIVAS):
+    """
+    Una pasada por los cupones: descarta los agotados o ya usados por el
+    usuario y devuelve los 'cuantos' mejores como [(descuento, cupón)], del
+    mejor al peor. A igual descuento, primero el que vence antes.
+    """
+    aplicables = (
+        (calcular_descuento(cupon, monto), cupon)
+        for cupon in cupones
+        if cupon.times_used < cupon.max_uses and usos_del_usuario.get(cupon.id, 0) < cupon.uses_per_user
+    )
+    return heapq.nsmallest(
+        cuantos,
+        (par for par in aplicables if par[0] > 0),
+        key=lambda par: (-par[0], par[1].valid_to, par[1].id),
+    )
+
+
+def descuentos_aplicables(profile_id, monto, codigos=None, ahora=None):
+    """
+    Los mejores cupones que el usuario puede usar para un viaje de 'monto',
+    del mejor al peor, como [(descuento, cupón)]. Si se pasan 'codigos', solo
+    se consideran esos (ej. el que escribió el pasajero), estén o no en el índice.
+    """
+    ahora = ahora or timezone.now()
+    if codigos is None:
+        refresh_promo_index()
+        cupones = promo_index.vigentes(ahora)
+    else:
+        cupones = [get_active_promo(codigo) for codigo in set(codigos)]
+        cupones = [c for c in cupones if c is not None and c.valid_from <= ahora <= c.valid_to]
+    if not cupones:
+        return []
+    # Una sola consulta: los usos de este usuario, agrupados por cupón
+    usos = dict(
+        UserPromoCodeUsage.objects.filter(user_profile_id=profile_id)
+        .values('promo_code_id').annotate(total=Count('id')).order_by()
+        .values_list('promo_code_id', 'total')
+    )
+    return elegir_descuentos(cupones, usos, monto)
+
+
+def apply_best_discount(viaje, aplicables):
+    """
+    Canjea el mejor cupón de 'aplicables' para el viaje (si el primero se
+    agotó justo ahora, prueba con el siguiente) y guarda el descuento.
+    Devuelve el UserPromoCodeUsage, o None si no se pudo usar ninguno.
+    """
+    for descuento, cupon in aplicables:
+        try:
+            uso = redeem_promo_code(viaje.pasajero_id, cupon.code, viaje_id=viaje.pk)
+        except PromoCodeError:
+            continue
+        type(viaje).objects.filter(pk=viaje.pk).update(descuento=descuento)
+        viaje.descuento = descuento
+        return uso
+    return None
@@ -0,0 +1,67 @@
+"""
+Generación masiva de cupones para campañas (ej. 500.000 códigos de un solo uso).
+
+Los códigos se arman en memoria a partir de uuid4 (aleatorios, imposibles
+de adivinar) y se insertan por lotes con bulk_create(ignore_conflicts=True):
+un INSERT por lote, sin pasar por save() ni por los signals. Antes de
+cada INSERT se descartan los códigos que ya existían (una consulta por
+el índice único de 'code'), y se generan códigos nuevos hasta llegar a
+la cantidad pedida. ignore_conflicts cubre el caso raro de que otro
+proceso inserte el mismo código entre la consulta y el INSERT.
+"""
+import uuid
+
+from django.db import transaction
+
+from .models import PromoCode
+
+# Sin caracteres que se confunden al escribirlos (0/O, 1/I)
+ALFABETO = '23456789ABCDEFGHJKLMNPQRSTUVWXYZ'
+
+
+def generar_codigo(prefijo='', largo=10):
+    """Un código aleatorio: 'prefijo' + 'largo' caracteres sacados de un uuid4."""
+    numero = uuid.uuid4().int
+    caracteres = []
+    for _ in range(largo):
+        numero, resto = divmod(numero, len(ALFABETO))
+        caracteres.append(ALFABETO[resto])
+    return prefijo + ''.join(caracteres)
+
+
+def generate_promo_codes(cantidad, campaign, plantilla, prefijo='', largo=10,
+                         batch_size=5000, max_reintentos=10, on_batch=None):
+    """
+    Crea 'cantidad' cupones de la campaña con los datos de 'plantilla'
+    (discount_type, discount_value, valid_from, valid_to, etc.).
+    'on_batch(codigos_del_lote, creados_hasta_ahora)' se llama después de
+    cada lote con los códigos que sí se guardaron (ej. para escribirlos a un archivo).
+    Devuelve cuántos se crearon.
+    """
+    prefijo = PromoCode.normalize_code(prefijo)  # bulk_create no pasa por save()
+    if len(prefijo) + largo > PromoCode._meta.get_field('code').max_length:
+        raise ValueError("El código queda demasiado largo")
+    datos = {'max_uses': 1, 'uses_per_user': 1, **plantilla, 'campaign': campaign}
+
+    creados, reintentos = 0, 0
+    while creados < cantidad:
+        faltan = min(batch_size, cantidad - creados)
+        lote = set()
+        while len(lote) < faltan:
+            lote.add(generar_codigo(prefijo, largo))
+
+        with transaction.atomic():
+            repetidos = set(PromoCode.objects.filter(code__in=lote).values_list('code', flat=True))
+            guardados = sorted(lote - repetidos)
+            PromoCode.objects.bulk_create(
+                [PromoCode(code=codigo, **datos) for codigo in guardados], ignore_conflicts=True
+            )
+
+        if len(guardados) < faltan:
+            reintentos += 1
+            if reintentos > max_reintentos:
+                raise RuntimeError("Demasiados códigos repetidos: usa un código más largo")
+        creados += len(guardados)
+        if on_batch:
+            on_batch(guardados, creados)
+    return creados
@@ -0,0 +1,83 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from promotions.discounts import ActivePromoIndex, elegir_descuentos
+from promotions.models import PromoCode
+from promotions.services import calcular_descuento
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuánto cuesta elegir el mejor cupón con miles de campañas: "
+        "revisar todos los cupones vs. el índice en memoria por fecha de inicio."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--campaigns', type=int, default=5000, help="Cupones simulados")
+        parser.add_argument('--queries', type=int, default=1000, help="Viajes a cotizar")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ahora = timezone.now()
+
+        # Campañas repartidas en +-30 días, de 1 a 15 días de duración (solo en memoria, no se guardan)
+        cupones = []
+        for i in range(options['campaigns']):
+            inicio = ahora + timedelta(hours=rng.uniform(-30 * 24, 30 * 24))
+            porcentaje = rng.random() < 0.5
+            cupones.append(PromoCode(
+                id=i + 1, code=f"BENCH{i}",
+                discount_type=PromoCode.DiscountType.PERCENTAGE if porcentaje else PromoCode.DiscountType.FIXED,
+                discount_value=Decimal(rng.randint(5, 40) if porcentaje else rng.randint(1, 8)),
+                max_discount_amount=Decimal(rng.randint(3, 10)) if porcentaje else None,
+                valid_from=inicio, valid_to=inicio + timedelta(days=rng.uniform(1, 15)),
+                max_uses=1000, uses_per_user=1, times_used=rng.randint(0, 1000),
+            ))
+        consultas = [
+            (ahora + timedelta(hours=rng.uniform(-24, 24)), Decimal(rng.randint(500, 5000)) / 100)
+            for _ in range(options['queries'])
+        ]
+        usos = {}
+
+        # Sin índice: se revisa cada cupón (fechas, límites y descuento), como haría un filtro por cupón
+        def revisar_todos(momento, monto):
+            mejores = []
+            for cupon in cupones:
+                if cupon.is_active and cupon.valid_from <= momento <= cupon.valid_to and cupon.times_used < cupon.max_uses:
+                    descuento = calcular_descuento(cupon, monto)
+                    if descuento > 0:
+                        mejores.append((descuento, cupon))
+            mejores.sort(key=lambda par: (-par[0], par[1].valid_to, par[1].id))
+            return mejores[:5]
+
+        indice = ActivePromoIndex()
+        inicio = time.perf_counter()
+        # Al cargar solo entran los que no vencieron (como hace refresh_promo_index)
+        indice.reemplazar(c for c in cupones if c.valid_to >= ahora - timedelta(days=1))
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        esperados = [revisar_todos(momento, monto) for momento, monto in consultas]
+        t_todos = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        obtenidos = [elegir_descuentos(indice.vigentes(momento), usos, monto) for momento, monto in consultas]
+        t_indice = time.perf_counter() - inicio
+
+        distintos = sum(1 for a, b in zip(esperados, obtenidos) if a[:1] != b[:1])
+        n = len(consultas)
+        self.stdout.write(f"Campañas: {len(cupones)} (en el índice: {len(indice)}) | Viajes: {n}")
+        self.stdout.write(f"Carga del índice:        {carga * 1000:.1f} ms")
+        self.stdout.write(f"Revisar todos:           {t_todos / n * 1000:.3f} ms/viaje")
+        self.stdout.write(f"Índice por fecha:        {t_indice / n * 1000:.3f} ms/viaje")
+        self.stdout.write(f"Aceleración:             x{t_todos / t_indice:.1f}")
+        if distintos:
+            self.stdout.write(self.style.WARNING(f"Mejor cupón distinto en {distintos} viajes"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Ambos métodos eligen el mismo cupón."))
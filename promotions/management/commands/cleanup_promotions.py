@@ -0,0 +1,41 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from promotions.cleanup import archive_usages, deactivate_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Desactiva los cupones vencidos y mueve al archivo los usos de cupones "
+        "vencidos hace tiempo. Trabaja por lotes cortos; pensado para correr cada noche (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Filas por lote")
+        parser.add_argument(
+            '--archive-after-days', type=int, default=getattr(settings, 'PROMO_ARCHIVE_AFTER_DAYS', 90),
+            help="Archivar los usos de cupones vencidos hace más de estos días",
+        )
+        parser.add_argument('--sleep', type=float, default=0, help="Segundos de pausa entre lotes")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        lote, pausa = options['batch_size'], options['sleep']
+
+        desactivados = deactivate_expired(
+            batch_size=lote, pausa=pausa,
+            on_batch=lambda n: self.stdout.write(f"  {n} cupones desactivados..."),
+        )
+        archivados = archive_usages(
+            timezone.now() - timedelta(days=options['archive_after_days']),
+            batch_size=lote, pausa=pausa,
+            on_batch=lambda n: self.stdout.write(f"  {n} usos archivados..."),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Cupones desactivados: {desactivados}. Usos archivados: {archivados}. "
+            f"({time.perf_counter() - inicio:.1f} s)"
+        ))
@@ -0,0 +1,86 @@
+import csv
+import time
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from promotions.generation import generate_promo_codes
+from promotions.models import PromoCode
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera en masa cupones de un solo uso para una campaña (ej. 500.000) "
+        "y opcionalmente escribe los códigos en un CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int, help="Cuántos cupones crear")
+        parser.add_argument('--campaign', required=True, help="Nombre de la campaña")
+        parser.add_argument('--value', required=True, help="Valor del descuento (ej. 10 o 5.50)")
+        parser.add_argument('--type', choices=PromoCode.DiscountType.values, default=PromoCode.DiscountType.FIXED)
+        parser.add_argument('--max-discount', help="Tope del descuento (para porcentaje)")
+        parser.add_argument('--valid-from', help="Inicio (ISO 8601). Por defecto, ahora")
+        parser.add_argument('--valid-days', type=int, default=30, help="Días de vigencia")
+        parser.add_argument('--description', default='', help="Descripción de los cupones")
+        parser.add_argument('--prefix', default='', help="Prefijo de los códigos (ej. VERANO-)")
+        parser.add_argument('--length', type=int, default=10, help="Caracteres aleatorios por código")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Cupones por INSERT")
+        parser.add_argument('--output', help="Archivo CSV donde escribir los códigos creados")
+
+    def _decimal(self, valor, nombre):
+        try:
+            return Decimal(valor)
+        except InvalidOperation:
+            raise CommandError(f"{nombre} inválido: {valor}")
+
+    def handle(self, *args, **options):
+        valid_from = timezone.now()
+        if options['valid_from']:
+            valid_from = parse_datetime(options['valid_from'])
+            if valid_from is None:
+                raise CommandError("Fecha inválida, usa ISO 8601 (ej. 2024-05-01T00:00:00)")
+            if timezone.is_naive(valid_from):
+                valid_from = timezone.make_aware(valid_from)
+
+        plantilla = {
+            'description': options['description'] or f"Campaña {options['campaign']}",
+            'discount_type': options['type'],
+            'discount_value': self._decimal(options['value'], "--value"),
+            'max_discount_amount': (
+                self._decimal(options['max_discount'], "--max-discount") if options['max_discount'] else None
+            ),
+            'valid_from': valid_from,
+            'valid_to': valid_from + timedelta(days=options['valid_days']),
+        }
+
+        archivo = open(options['output'], 'w', newline='') if options['output'] else None
+        escritor = csv.writer(archivo) if archivo else None
+        inicio = time.perf_counter()
+
+        def progreso(codigos, creados):
+            if escritor:
+                escritor.writerows([codigo] for codigo in codigos)
+            segundos = time.perf_counter() - inicio
+            self.stdout.write(f"  {creados} cupones ({creados / segundos:.0f}/s)")
+
+        try:
+            creados = generate_promo_codes(
+                options['count'], options['campaign'], plantilla,
+                prefijo=options['prefix'], largo=options['length'],
+                batch_size=options['batch_size'], on_batch=progreso,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            if archivo:
+                archivo.close()
+
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Campaña '{options['campaign']}': {creados} cupones en {duracion:.1f} s "
+            f"({creados / duracion:.0f} cupones/s)"
+        ))
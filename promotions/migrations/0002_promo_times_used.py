@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def contar_usos(apps, schema_editor):
+    """Llena 'times_used' con los usos que ya estaban registrados."""
+    PromoCode = apps.get_model('promotions', 'PromoCode')
+    UserPromoCodeUsage = apps.get_model('promotions', 'UserPromoCodeUsage')
+    conteos = UserPromoCodeUsage.objects.values('promo_code_id').annotate(total=Count('id')).order_by()
+    PromoCode.objects.bulk_update(
+        [PromoCode(id=fila['promo_code_id'], times_used=fila['total']) for fila in conteos],
+        ['times_used'], batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0001_initial'),
+        ('travel', '0004_viaje_liquidado_at'),
+        ('users', '0006_userprofile_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promocode',
+            name='times_used',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Veces Usado'),
+        ),
+        migrations.AddIndex(
+            model_name='userpromocodeusage',
+            index=models.Index(fields=['user_profile', 'promo_code'], name='promo_usage_perfil_codigo_idx'),
+        ),
+        migrations.RunPython(contar_usos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0002_promo_times_used'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promocode',
+            name='campaign',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50, verbose_name='Campaña'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0003_promo_campaign'),
+        ('travel', '0005_viaje_descuento'),
+        ('users', '0006_userprofile_rating_sum'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPromoCodeUsageArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('used_at', models.DateTimeField(verbose_name='Fecha de Uso')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Archivo')),
+            ],
+            options={
+                'verbose_name': 'Uso de Cupón Archivado',
+                'verbose_name_plural': 'Usos de Cupones Archivados',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='promocode',
+            index=models.Index(fields=['is_active', 'valid_to'], name='promo_activo_vence_idx'),
+        ),
+        migrations.AddField(
+            model_name='userpromocodeusagearchive',
+            name='promo_code',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='promotions.promocode'),
+        ),
+        migrations.AddField(
+            model_name='userpromocodeusagearchive',
+            name='user_profile',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='users.userprofile'),
+        ),
+        migrations.AddField(
+            model_name='userpromocodeusagearchive',
+            name='viaje',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='travel.viaje'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+from django.db.models.functions import Upper
+
+
+def codigos_en_mayusculas(apps, schema_editor):
+    # Desde ahora los códigos se guardan y se buscan en mayúsculas (ver PromoCode.normalize_code)
+    PromoCode = apps.get_model('promotions', 'PromoCode')
+    PromoCode.objects.update(code=Upper('code'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('promotions', '0004_promo_cleanup'),
+    ]
+
+    operations = [
+        migrations.RunPython(codigos_en_mayusculas, migrations.RunPython.noop),
+    ]
@@ -20,6 +20,10 @@ class PromoCode(models.Model):
         verbose_name="Código del Cupón"
     )
     description = models.TextField(verbose_name="Descripción")
+    # Los cupones generados en masa (ver el comando 'generate_promo_codes') llevan
+    # el nombre de su campaña. Esos son personales: solo se usan si el pasajero
+    # escribe el código. Los que no tienen campaña se aplican solos al pedir un viaje.
+    campaign = models.CharField(max_length=50, blank=True, default='', db_index=True, verbose_name="Campaña")
     
     discount_type = models.CharField(
         max_length=20,
@@ -45,6 +49,9 @@ class PromoCode(models.Model):
     
     max_uses = models.PositiveIntegerField(default=1000, verbose_name="Usos Totales Máximos")
     uses_per_user = models.PositiveIntegerField(default=1, verbose_name="Usos por Usuario")
+    # Contador de usos (se suma con un UPDATE condicional, ver promotions/services.py).
+    # Así no hace falta un COUNT(*) de UserPromoCodeUsage en cada canje.
+    times_used = models.PositiveIntegerField(default=0, editable=False, verbose_name="Veces Usado")
     
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -53,9 +60,25 @@ class PromoCode(models.Model):
             return f"{self.code} ({self.discount_value}%)"
         return f"{self.code} (S/ {self.discount_value})"
 
+    @staticmethod
+    def normalize_code(code):
+        """
+        Los códigos se guardan y se buscan en mayúsculas: la BD (MySQL) los
+        compara sin distinguir mayúsculas, y la caché sí.
+        """
+        return code.strip().upper()
+
+    def save(self, *args, **kwargs):
+        self.code = self.normalize_code(self.code)
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Código de Promoción"
         verbose_name_plural = "Códigos de Promoción"
+        indexes = [
+            # Cupones activos por fecha de vencimiento (índice de descuentos y limpieza de vencidos)
+            models.Index(fields=['is_active', 'valid_to'], name='promo_activo_vence_idx'),
+        ]
 
 # ---------------------------------------------------------------------------
 # MODELO 2: REGISTRO DE USO DE CUPONES
@@ -89,4 +112,38 @@ class UserPromoCodeUsage(models.Model):
         verbose_name = "Uso de Cupón"
         verbose_name_plural = "Usos de Cupones"
         # Un usuario solo puede usar el mismo cupón las veces que 'uses_per_user' diga
-        # (Lógica más compleja se manejaría en la API)
\ No newline at end of file
+        # (se verifica al canjear, ver promotions/services.py, usando este índice)
+        indexes = [
+            models.Index(fields=['user_profile', 'promo_code'], name='promo_usage_perfil_codigo_idx'),
+        ]
+
+# ---------------------------------------------------------------------------
+# MODELO 3: ARCHIVO DE USOS DE CUPONES VENCIDOS
+# ---------------------------------------------------------------------------
+class UserPromoCodeUsageArchive(models.Model):
+    """
+    Usos de cupones que vencieron hace tiempo (ver el comando 'cleanup_promotions').
+    Se mueven aquí para que la tabla de usos, que se consulta en cada canje,
+    no crezca para siempre. Conserva el id original del uso.
+    Sin claves foráneas en la BD: el archivo no se bloquea ni se borra en
+    cascada con los perfiles, cupones o viajes.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user_profile = models.ForeignKey(
+        UserProfile, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    promo_code = models.ForeignKey(
+        PromoCode, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+'
+    )
+    viaje = models.ForeignKey(
+        'travel.Viaje', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    used_at = models.DateTimeField(verbose_name="Fecha de Uso")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Archivo")
+
+    def __str__(self):
+        return f"Uso #{self.id} del cupón #{self.promo_code_id} (archivado)"
+
+    class Meta:
+        verbose_name = "Uso de Cupón Archivado"
+        verbose_name_plural = "Usos de Cupones Archivados"
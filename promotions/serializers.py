@@ -0,0 +1,8 @@
+from rest_framework import serializers
+
+
+class CanjeSerializer(serializers.Serializer):
+    """
+    El cupón que el usuario quiere canjear.
+    """
+    code = serializers.CharField(max_length=50)
@@ -0,0 +1,129 @@
+"""
+Canje de cupones de promoción.
+
+- El cupón se busca en la caché (por 'code', en mayúsculas), no en la BD, en cada canje.
+  Se borra de la caché cuando se edita o se borra (ver promotions/signals.py).
+  También se guarda por un rato que un código NO existe, para que los
+  intentos con códigos inventados no lleguen a la BD.
+- El límite total ('max_uses') lo controla un solo UPDATE condicional:
+
+      UPDATE promocode SET times_used = times_used + 1
+      WHERE id = 7 AND times_used < max_uses
+
+  Si dos personas canjean el último cupón a la vez, solo una lo consigue.
+- El límite por usuario ('uses_per_user') se cuenta con el índice
+  (user_profile, promo_code), con el perfil bloqueado para que el mismo
+  usuario no pueda canjear dos veces en paralelo.
+- Si el viaje se cancela, el cupón se devuelve (release_promo_usages).
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from users.models import UserProfile
+from .models import PromoCode, UserPromoCodeUsage
+
+NO_EXISTE = 'NO_EXISTE'  # Lo que se guarda en la caché para un código que no existe
+CENTIMO = Decimal('0.01')
+
+
+class PromoCodeError(ValueError):
+    """El cupón no existe, no está vigente o ya no se puede usar."""
+
+    def __init__(self, message="Cupón inválido"):
+        super().__init__(message)
+
+
+def _clave(code):
+    return f"promo:{PromoCode.normalize_code(code)}"
+
+
+def forget_promo_code(code):
+    """Borra el cupón de la caché (se llama al guardarlo o borrarlo)."""
+    cache.delete(_clave(code))
+
+
+def forget_promo_codes(codes):
+    """Borra varios cupones de la caché de una vez (ej. al desactivarlos en masa)."""
+    cache.delete_many([_clave(code) for code in codes])
+
+
+def get_active_promo(code):
+    """
+    Devuelve el PromoCode activo con ese código (desde la caché si se
+    puede), o None si no existe o está desactivado.
+    El campo 'times_used' de la copia en caché NO está al día.
+    """
+    clave = _clave(code)
+    promo = cache.get(clave)
+    if promo is None:
+        promo = PromoCode.objects.filter(code=PromoCode.normalize_code(code), is_active=True).first() or NO_EXISTE
+        cache.set(clave, promo, getattr(settings, 'PROMO_CODE_CACHE_SECONDS', 300))
+    return None if promo == NO_EXISTE else promo
+
+
+def calcular_descuento(promo, monto):
+    """Cuánto se descuenta de 'monto' con este cupón (nunca más que el monto)."""
+    if promo.discount_type == PromoCode.DiscountType.PERCENTAGE:
+        descuento = (monto * promo.discount_value / 100).quantize(CENTIMO, ROUND_HALF_UP)
+        if promo.max_discount_amount is not None:
+            descuento = min(descuento, promo.max_discount_amount)
+    else:
+        descuento = promo.discount_value
+    return min(descuento, monto)
+
+
+def redeem_promo_code(profile_id, code, viaje_id=None):
+    """
+    Canjea el cupón para el perfil. Devuelve el UserPromoCodeUsage creado.
+    Lanza PromoCodeError si no existe, no está vigente, se agotó o el
+    usuario ya lo usó todas las veces permitidas.
+    """
+    promo = get_active_promo(code)
+    if promo is None:
+        raise PromoCodeError("El cupón no existe")
+    ahora = timezone.now()
+    if not promo.valid_from <= ahora <= promo.valid_to:
+        raise PromoCodeError("El cupón no está vigente")
+
+    with transaction.atomic():
+        # Bloqueamos el perfil: los canjes del MISMO usuario van en fila
+        UserProfile.objects.select_for_update().filter(pk=profile_id).values_list('id').first()
+        usados = UserPromoCodeUsage.objects.filter(user_profile_id=profile_id, promo_code_id=promo.pk).count()
+        if usados >= promo.uses_per_user:
+            raise PromoCodeError("Ya usaste este cupón")
+
+        uso = UserPromoCodeUsage.objects.create(user_profile_id=profile_id, promo_code_id=promo.pk, viaje_id=viaje_id)
+        # Al final, para tener bloqueada la fila del cupón (la más disputada) el menor tiempo posible
+        disponibles = PromoCode.objects.filter(pk=promo.pk, is_active=True, times_used__lt=F('max_uses'))
+        if not disponibles.update(times_used=F('times_used') + 1):
+            raise PromoCodeError("El cupón se agotó")  # Se deshace también el INSERT del uso
+
+    uso.promo_code = promo
+    return uso
+
+
+def release_promo_usages(viaje_id):
+    """
+    Devuelve los cupones canjeados para el viaje (ej. se canceló): borra
+    el uso y le resta uno a 'times_used', para que se pueda volver a usar.
+    Devuelve cuántos usos se liberaron.
+    """
+    with transaction.atomic():
+        usos = list(
+            UserPromoCodeUsage.objects.filter(viaje_id=viaje_id).values_list('id', 'promo_code_id', 'promo_code__code')
+        )
+        if not usos:
+            return 0
+        UserPromoCodeUsage.objects.filter(pk__in=[uso_id for uso_id, _, _ in usos]).delete()
+        for _, promo_id, _ in usos:
+            PromoCode.objects.filter(pk=promo_id).update(times_used=Greatest(F('times_used') - 1, 0))
+        # La copia en caché podría decir que está agotado
+        codigos = [code for _, _, code in usos]
+        transaction.on_commit(lambda: forget_promo_codes(codigos))
+    return len(usos)
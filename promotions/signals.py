@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from .models import PromoCode
+from .discounts import promo_index
+from .services import forget_promo_codes
+
+# -------------------------------------------------------------------
+# "SIGNALS" (Los Gatillos)
+# -------------------------------------------------------------------
+# Los cupones se guardan en caché al canjearlos (ver promotions/services.py).
+# Cuando se editan o borran (ej. desde el admin) hay que sacarlos de la caché,
+# y el índice de cupones activos de este worker se recarga en la próxima consulta
+# (los demás workers lo recargan solos cada PROMO_INDEX_REFRESH_SECONDS).
+# Todo recién después del commit: antes, una consulta simultánea volvería a
+# guardar en la caché la fila vieja.
+
+# Guardamos el código con el que se cargó, por si lo cambian al editar
+@receiver(post_init, sender=PromoCode)
+def promo_loaded_handler(sender, instance, **kwargs):
+    instance._code_original = instance.__dict__.get('code')
+
+def _olvidar_al_confirmar(codigos):
+    def olvidar():
+        forget_promo_codes(codigos)
+        promo_index.invalidar()
+    transaction.on_commit(olvidar)
+
+@receiver(post_save, sender=PromoCode)
+def promo_saved_handler(sender, instance, **kwargs):
+    codigos = {instance.code}
+    if instance._code_original:
+        codigos.add(instance._code_original)  # Por si lo cambiaron al editar
+    _olvidar_al_confirmar(codigos)
+    instance._code_original = instance.code
+
+@receiver(post_delete, sender=PromoCode)
+def promo_deleted_handler(sender, instance, **kwargs):
+    _olvidar_al_confirmar({instance.code})
@@ -1,3 +1,305 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from travel.models import Viaje
+from users.geo import driver_index
+from users.models import UserProfile
+from .discounts import ActivePromoIndex, descuentos_aplicables, promo_index
+from .cleanup import archive_usages
+from .generation import generate_promo_codes
+from .models import PromoCode, UserPromoCodeUsage, UserPromoCodeUsageArchive
+from .services import PromoCodeError, calcular_descuento, get_active_promo, redeem_promo_code
+
+
+def crear_perfil(username, phone):
+    user = User.objects.create(username=username)
+    UserProfile.objects.filter(user=user).delete()  # Lo crea el signal; lo rehacemos con nuestros datos
+    return UserProfile.objects.create(user=user, full_name=username, phone=phone)
+
+
+def crear_cupon(code='VERANO', **campos):
+    ahora = timezone.now()
+    datos = dict(
+        code=code, description="Promo", discount_type=PromoCode.DiscountType.PERCENTAGE,
+        discount_value=Decimal('20.00'), valid_from=ahora - timedelta(days=1), valid_to=ahora + timedelta(days=1),
+    )
+    datos.update(campos)
+    return PromoCode.objects.create(**datos)
+
+
+# ---------------------------------------------------------------------------
+# CANJE DE CUPONES
+# ---------------------------------------------------------------------------
+class CanjeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.perfil = crear_perfil('pasajero@test.com', '900000000')
+
+    def test_limite_por_usuario_y_total(self):
+        cupon = crear_cupon(max_uses=2, uses_per_user=1)
+        redeem_promo_code(self.perfil.id, 'VERANO')
+        with self.assertRaisesMessage(PromoCodeError, "Ya usaste este cupón"):
+            redeem_promo_code(self.perfil.id, 'VERANO')
+
+        redeem_promo_code(crear_perfil('otro@test.com', '900000001').id, 'VERANO')
+        with self.assertRaisesMessage(PromoCodeError, "El cupón se agotó"):
+            redeem_promo_code(crear_perfil('tercero@test.com', '900000002').id, 'VERANO')
+
+        cupon.refresh_from_db()
+        self.assertEqual(cupon.times_used, 2)
+        self.assertEqual(UserPromoCodeUsage.objects.count(), 2)
+
+    def test_cache_y_limpieza_al_editar(self):
+        cupon = crear_cupon(uses_per_user=5)
+        redeem_promo_code(self.perfil.id, 'VERANO')
+        # Con el cupón en caché: bloqueo del perfil, COUNT, INSERT, UPDATE (+ savepoints)
+        with self.assertNumQueries(6):
+            redeem_promo_code(self.perfil.id, 'VERANO')
+
+        cupon.valid_to = timezone.now() - timedelta(minutes=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            cupon.save()  # Como desde el admin: se borra de la caché al hacer commit
+            self.assertIsNotNone(cache.get('promo:VERANO'))
+        with self.assertRaisesMessage(PromoCodeError, "no está vigente"):
+            redeem_promo_code(self.perfil.id, 'VERANO')
+
+    def test_el_codigo_no_distingue_mayusculas(self):
+        with self.assertRaisesMessage(PromoCodeError, "no existe"):
+            redeem_promo_code(self.perfil.id, 'otoño')  # Queda en caché que no existe
+        with self.captureOnCommitCallbacks(execute=True):
+            cupon = crear_cupon(code=' Otoño ')
+        self.assertEqual(cupon.code, 'OTOÑO')
+        self.assertEqual(redeem_promo_code(self.perfil.id, 'otoño').promo_code.pk, cupon.pk)
+
+    def test_codigo_inexistente_no_vuelve_a_la_bd(self):
+        with self.assertRaisesMessage(PromoCodeError, "no existe"):
+            redeem_promo_code(self.perfil.id, 'NOEXISTE')
+        with self.assertNumQueries(0), self.assertRaises(PromoCodeError):
+            redeem_promo_code(self.perfil.id, 'NOEXISTE')
+
+    def test_descuento(self):
+        cupon = crear_cupon(max_discount_amount=Decimal('3.00'))
+        self.assertEqual(calcular_descuento(cupon, Decimal('10.00')), Decimal('2.00'))
+        self.assertEqual(calcular_descuento(cupon, Decimal('50.00')), Decimal('3.00'))
+
+    def test_api_canjear(self):
+        crear_cupon()
+        client = APIClient()
+        client.force_authenticate(self.perfil.user)
+        respuesta = client.post(reverse('canjear-cupon'), {'code': 'VERANO'}, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data['discount_value'], '20.00')
+        respuesta = client.post(reverse('canjear-cupon'), {'code': 'VERANO'}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+# ---------------------------------------------------------------------------
+# MOTOR DE DESCUENTOS
+# ---------------------------------------------------------------------------
+class DescuentosTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        promo_index.invalidar()
+        driver_index.reemplazar([])
+        self.perfil = crear_perfil('pasajero@test.com', '900000000')
+
+    def test_indice_por_ventana_de_vigencia(self):
+        ahora = timezone.now()
+        indice = ActivePromoIndex()
+        indice.reemplazar([
+            PromoCode(id=1, code='FUTURO', valid_from=ahora + timedelta(days=1), valid_to=ahora + timedelta(days=2)),
+            PromoCode(id=2, code='VIGENTE', valid_from=ahora - timedelta(days=1), valid_to=ahora + timedelta(days=1)),
+            PromoCode(id=3, code='VENCIDO', valid_from=ahora - timedelta(days=2), valid_to=ahora - timedelta(hours=1)),
+        ])
+        self.assertEqual([c.code for c in indice.vigentes(ahora)], ['VIGENTE'])
+        self.assertEqual([c.code for c in indice.vigentes(ahora + timedelta(days=1, hours=1))], ['FUTURO'])
+
+    def test_elige_el_mejor_con_una_consulta(self):
+        crear_cupon('PCT', discount_value=Decimal('50.00'), max_discount_amount=Decimal('4.00'))
+        crear_cupon('FIJO', discount_type=PromoCode.DiscountType.FIXED, discount_value=Decimal('6.00'))
+        crear_cupon('AGOTADO', discount_type=PromoCode.DiscountType.FIXED, discount_value=Decimal('9.00'), max_uses=0)
+        redeem_promo_code(self.perfil.id, 'FIJO')  # Ya lo usó
+
+        descuentos_aplicables(self.perfil.id, Decimal('10.00'))  # Carga el índice
+        with self.assertNumQueries(1):
+            aplicables = descuentos_aplicables(self.perfil.id, Decimal('10.00'))
+        self.assertEqual([(d, c.code) for d, c in aplicables], [(Decimal('4.00'), 'PCT')])
+
+    def test_pedir_viaje_aplica_el_cupon(self):
+        crear_cupon('VIAJE10', discount_type=PromoCode.DiscountType.FIXED, discount_value=Decimal('2.50'))
+        client = APIClient()
+        client.force_authenticate(self.perfil.user)
+        ruta = {'origen_lat': '-6.03', 'origen_lng': '-76.97', 'destino_lat': '-6.05', 'destino_lng': '-76.98'}
+
+        respuesta = client.post(reverse('viaje-create'), dict(ruta, promo_code='OTRO'), format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+        respuesta = client.post(reverse('viaje-create'), dict(ruta, promo_code='VIAJE10'), format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data['descuento'], '2.50')
+        uso = UserPromoCodeUsage.objects.get()
+        self.assertEqual((uso.viaje_id, uso.user_profile_id), (respuesta.data['id'], self.perfil.id))
+
+        # Ya lo usó: el siguiente viaje sale sin descuento
+        respuesta = client.post(reverse('viaje-create'), ruta, format='json')
+        self.assertEqual(Viaje.objects.get(pk=respuesta.data['id']).descuento, Decimal('0.00'))
+
+    def test_cupon_pedido_que_se_agota_no_crea_el_viaje(self):
+        crear_cupon('ULTIMO', discount_type=PromoCode.DiscountType.FIXED, discount_value=Decimal('2.50'))
+        client = APIClient()
+        client.force_authenticate(self.perfil.user)
+        ruta = {'origen_lat': '-6.03', 'origen_lng': '-76.97', 'destino_lat': '-6.05', 'destino_lng': '-76.98'}
+        # Otro pasajero se lleva el último uso entre elegirlo y canjearlo
+        with mock.patch('promotions.discounts.redeem_promo_code', side_effect=PromoCodeError("El cupón se agotó")):
+            respuesta = client.post(reverse('viaje-create'), dict(ruta, promo_code='ULTIMO'), format='json')
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertFalse(Viaje.objects.exists())
+
+    def test_cancelar_el_viaje_devuelve_el_cupon(self):
+        cupon = crear_cupon('UNAVEZ', discount_type=PromoCode.DiscountType.FIXED, discount_value=Decimal('2.50'), max_uses=1)
+        client = APIClient()
+        client.force_authenticate(self.perfil.user)
+        ruta = {'origen_lat': '-6.03', 'origen_lng': '-76.97', 'destino_lat': '-6.05', 'destino_lng': '-76.98'}
+        viaje_id = client.post(reverse('viaje-create'), dict(ruta, promo_code='UNAVEZ'), format='json').data['id']
+
+        respuesta = client.post(reverse('viaje-estado', args=[viaje_id]), {'estado': 'CANCELADO'}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        cupon.refresh_from_db()
+        self.assertEqual(cupon.times_used, 0)
+        self.assertFalse(UserPromoCodeUsage.objects.exists())
+        # Se puede volver a usar en otro viaje
+        respuesta = client.post(reverse('viaje-create'), dict(ruta, promo_code='UNAVEZ'), format='json')
+        self.assertEqual(respuesta.data['descuento'], '2.50')
+
+
+# ---------------------------------------------------------------------------
+# GENERACIÓN MASIVA
+# ---------------------------------------------------------------------------
+class GeneracionTests(TestCase):
+
+    def plantilla(self):
+        ahora = timezone.now()
+        return {
+            'description': "Campaña", 'discount_type': PromoCode.DiscountType.FIXED,
+            'discount_value': Decimal('5.00'), 'valid_from': ahora, 'valid_to': ahora + timedelta(days=7),
+        }
+
+    def test_genera_por_lotes_y_reintenta_repetidos(self):
+        crear_cupon('X-YA-EXISTE')
+        codigos = iter(['X-YA-EXISTE', 'X-A', 'X-A', 'X-B', 'X-C', 'X-D', 'X-E'])
+        lotes = []
+        with mock.patch('promotions.generation.generar_codigo', side_effect=lambda *a: next(codigos)):
+            creados = generate_promo_codes(
+                4, 'VERANO', self.plantilla(), batch_size=3, on_batch=lambda c, n: lotes.append((c, n)),
+            )
+        self.assertEqual(creados, 4)
+        self.assertEqual(lotes, [(['X-A', 'X-B'], 2), (['X-C', 'X-D'], 4)])
+        cupones = PromoCode.objects.filter(campaign='VERANO')
+        self.assertEqual(cupones.count(), 4)
+        self.assertEqual({(c.max_uses, c.uses_per_user) for c in cupones}, {(1, 1)})
+
+    def test_codigos_aleatorios_con_prefijo(self):
+        self.assertEqual(generate_promo_codes(50, 'OTOÑO', self.plantilla(), prefijo='OT-', batch_size=20), 50)
+        codigos = list(PromoCode.objects.filter(campaign='OTOÑO').values_list('code', flat=True))
+        self.assertTrue(all(c.startswith('OT-') and len(c) == 13 for c in codigos))
+
+    def test_no_entran_al_indice_pero_se_pueden_escribir(self):
+        generate_promo_codes(1, 'PERSONAL', self.plantilla())
+        codigo = PromoCode.objects.get(campaign='PERSONAL').code
+        perfil = crear_perfil('pasajero@test.com', '900000000')
+        promo_index.invalidar()
+        self.assertEqual(descuentos_aplicables(perfil.id, Decimal('20.00')), [])
+        self.assertEqual(
+            [d for d, _ in descuentos_aplicables(perfil.id, Decimal('20.00'), codigos=[codigo])], [Decimal('5.00')]
+        )
+
+
+# ---------------------------------------------------------------------------
+# LIMPIEZA DE CUPONES VENCIDOS
+# ---------------------------------------------------------------------------
+class LimpiezaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.perfil = crear_perfil('pasajero@test.com', '900000000')
+        hace = lambda dias: timezone.now() - timedelta(days=dias)
+        self.viejo = crear_cupon('VIEJO', uses_per_user=5)
+        self.reciente = crear_cupon('RECIENTE')
+        self.vigente = crear_cupon('VIGENTE')
+        for cupon in (self.viejo, self.viejo, self.viejo, self.reciente, self.vigente):
+            redeem_promo_code(self.perfil.id, cupon.code)
+        # Vencen después de canjearlos
+        PromoCode.objects.filter(pk=self.viejo.pk).update(valid_from=hace(200), valid_to=hace(120))
+        PromoCode.objects.filter(pk=self.reciente.pk).update(valid_to=hace(1))
+
+    def test_desactiva_y_archiva_por_lotes(self):
+        self.assertIsNotNone(get_active_promo('RECIENTE'))  # Queda en caché
+        salida = StringIO()
+        call_command('cleanup_promotions', batch_size=2, stdout=salida)
+        self.assertIn("Cupones desactivados: 2. Usos archivados: 3.", salida.getvalue())
+
+        self.assertEqual(set(PromoCode.objects.filter(is_active=True).values_list('code', flat=True)), {'VIGENTE'})
+        self.assertIsNone(get_active_promo('RECIENTE'))
+        # Solo se archivan los usos del cupón vencido hace más de 90 días
+        self.assertEqual(set(UserPromoCodeUsage.objects.values_list('promo_code__code', flat=True)), {'RECIENTE', 'VIGENTE'})
+        archivados = UserPromoCodeUsageArchive.objects.all()
+        self.assertEqual(len(archivados), 3)
+        self.assertEqual({(a.promo_code_id, a.user_profile_id) for a in archivados}, {(self.viejo.id, self.perfil.id)})
+
+        # Volver a correrlo no hace nada
+        self.assertEqual(archive_usages(), 0)
+
+
+class CanjeConcurrenteTests(TransactionTestCase):
+    """
+    Muchos usuarios canjeando a la vez un cupón con pocos usos:
+    nunca se entregan más de 'max_uses'. En SQLite (sin bloqueo por fila)
+    algunos canjes fallan con "database is locked": se cuentan aparte.
+    """
+
+    def test_no_se_sobrevende(self):
+        cache.clear()
+        cupon = crear_cupon(max_uses=5)
+        perfiles = [crear_perfil(f'u{i}@test.com', f'90000001{i}') for i in range(10)]
+        exitos, rechazos, bloqueados = [], [], []
+        barrera = threading.Barrier(len(perfiles))
+
+        def hilo(perfil):
+            try:
+                barrera.wait()
+                redeem_promo_code(perfil.id, 'VERANO')
+                exitos.append(perfil.id)
+            except PromoCodeError:
+                rechazos.append(perfil.id)
+            except OperationalError:
+                bloqueados.append(perfil.id)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=hilo, args=(p,)) for p in perfiles]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        cupon.refresh_from_db()
+        self.assertLessEqual(len(exitos), 5)
+        self.assertEqual(cupon.times_used, len(exitos))
+        self.assertEqual(UserPromoCodeUsage.objects.count(), len(exitos))
+        if connection.features.has_select_for_update:
+            self.assertEqual((len(exitos), len(rechazos), len(bloqueados)), (5, 5, 0))
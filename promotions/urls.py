@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import CanjearCuponView
+
+urlpatterns = [
+    # POST /api/promotions/canjear/
+    path('canjear/', CanjearCuponView.as_view(), name='canjear-cupon'),
+]
@@ -1,3 +1,42 @@
-from django.shortcuts import render
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from users.models import UserProfile
+from users.utils import get_profile_id
+from .serializers import CanjeSerializer
+from .services import PromoCodeError, redeem_promo_code
+
+
+# ---------------------------------------------------------------------------
+# VISTA 1: CANJEAR UN CUPÓN
+# /api/promotions/canjear/
+# ---------------------------------------------------------------------------
+class CanjearCuponView(APIView):
+    """
+    Canjea un cupón para el usuario. Respeta el límite total de usos y el
+    límite por usuario, aun con miles de canjes al mismo tiempo.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = CanjeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            uso = redeem_promo_code(get_profile_id(request.user), serializer.validated_data['code'])
+        except UserProfile.DoesNotExist:
+            return Response(
+                {"error": "Tu usuario no tiene un perfil."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except PromoCodeError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        promo = uso.promo_code
+        return Response({
+            "id": uso.id,
+            "code": promo.code,
+            "discount_type": promo.discount_type,
+            "discount_value": str(promo.discount_value),
+            "max_discount_amount": None if promo.max_discount_amount is None else str(promo.max_discount_amount),
+        }, status=status.HTTP_201_CREATED)
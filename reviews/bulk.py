@@ -0,0 +1,104 @@
+"""
+Carga masiva de reseñas (migración del sistema anterior, ETL, etc.).
+
+Las reseñas se insertan por lotes con bulk_create (que NO dispara los
+signals de post_save), y en la misma transacción de cada lote se
+recalcula el rating de los perfiles de ese lote, con un GROUP BY. Así, si
+un lote falla (ej. un perfil que no existe), los anteriores quedan
+guardados con su rating al día.
+
+Pensado para comandos de management / scripts, no para peticiones web:
+para conservar las fechas originales se desactiva por un momento el
+auto_now_add de 'created_at', y eso afecta a todo el proceso.
+"""
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Review
+from .ratings import recompute_ratings
+
+
+def _por_lotes(filas, tamano):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+@contextmanager
+def _conservar_created_at():
+    campo = Review._meta.get_field('created_at')
+    campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        campo.auto_now_add = True
+
+
+def _fecha(valor):
+    if not valor:
+        return timezone.now()
+    if isinstance(valor, str):
+        valor = parse_datetime(valor)
+        if valor is None:
+            raise ValueError("Fecha inválida")
+    if timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+def _a_review(fila):
+    """Convierte un dict en Review. Lanza ValueError si la fila no es válida."""
+    rating = int(fila['rating'])
+    if not 1 <= rating <= 5:
+        raise ValueError("La calificación debe ser de 1 a 5")
+    return Review(
+        reviewer_profile_id=fila.get('reviewer_profile_id') or None,
+        reviewed_profile_id=int(fila['reviewed_profile_id']),
+        viaje_id=fila.get('viaje_id') or None,
+        rating=rating,
+        comment=fila.get('comment') or None,
+        created_at=_fecha(fila.get('created_at')),
+    )
+
+
+def bulk_import_reviews(filas, batch_size=1000):
+    """
+    Inserta reseñas a partir de dicts con: reviewed_profile_id, rating y,
+    opcionalmente, reviewer_profile_id, viaje_id, comment, created_at.
+
+    Devuelve un dict con cuántas se insertaron, cuántas filas se saltaron
+    por inválidas y cuántos perfiles se recalcularon.
+    """
+    insertadas, invalidas = 0, 0
+    afectados = set()
+
+    with _conservar_created_at():
+        for lote in _por_lotes(filas, batch_size):
+            reviews = []
+            for fila in lote:
+                try:
+                    reviews.append(_a_review(fila))
+                except (KeyError, TypeError, ValueError):
+                    invalidas += 1
+            perfiles = sorted({r.reviewed_profile_id for r in reviews})
+            with transaction.atomic():
+                Review.objects.bulk_create(reviews, batch_size=batch_size)
+                # Un GROUP BY + un bulk_update por cada 2000 perfiles del lote
+                for perfiles_lote in _por_lotes(perfiles, 2000):
+                    recompute_ratings(perfiles_lote)
+            insertadas += len(reviews)
+            afectados.update(perfiles)
+
+    return {
+        'insertadas': insertadas,
+        'invalidas': invalidas,
+        'perfiles_recalculados': len(afectados),
+    }
@@ -0,0 +1,41 @@
+import csv
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from reviews.bulk import bulk_import_reviews
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa reseñas en lote desde un archivo .csv o .jsonl "
+        "(columnas: reviewed_profile_id, rating, reviewer_profile_id, viaje_id, comment, created_at) "
+        "y recalcula una sola vez el rating de cada perfil afectado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help="Ruta al archivo .csv o .jsonl")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        ruta = options['archivo']
+        if not ruta.endswith(('.csv', '.jsonl')):
+            raise CommandError("El archivo debe ser .csv o .jsonl")
+
+        inicio = time.perf_counter()
+        with open(ruta, encoding='utf-8', newline='') as archivo:
+            if ruta.endswith('.csv'):
+                filas = csv.DictReader(archivo)
+            else:
+                filas = (json.loads(linea) for linea in archivo if linea.strip())
+            resumen = bulk_import_reviews(filas, batch_size=options['batch_size'])
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reseñas insertadas: {resumen['insertadas']} en {duracion:.1f} s "
+            f"({resumen['insertadas'] / max(duracion, 1e-9):.0f}/s)"
+        ))
+        self.stdout.write(f"Perfiles recalculados: {resumen['perfiles_recalculados']}")
+        if resumen['invalidas']:
+            self.stdout.write(self.style.WARNING(f"Filas inválidas (saltadas): {resumen['invalidas']}"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from reviews.ratings import recompute_ratings
+from users.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula desde cero el rating de todos los perfiles (por lotes) y corrige "
+        "los que se desviaron de la suma real de sus reseñas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Perfiles por lote")
+
+    def handle(self, *args, **options):
+        tamano = options['chunk_size']
+        ultimo_id, revisados, corregidos = 0, 0, 0
+        while True:
+            # Paginamos por id (keyset): cada lote cuesta lo mismo
+            ids = list(
+                UserProfile.objects.filter(pk__gt=ultimo_id)
+                .order_by('pk').values_list('pk', flat=True)[:tamano]
+            )
+            if not ids:
+                break
+            corregidos += recompute_ratings(ids)
+            revisados += len(ids)
+            ultimo_id = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Perfiles revisados: {revisados} | Corregidos: {corregidos}"
+        ))
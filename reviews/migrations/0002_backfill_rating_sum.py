@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:37
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def calcular_rating_sum(apps, schema_editor):
+    """Llena 'rating_sum' y 'total_ratings' a partir de las reseñas existentes."""
+    Review = apps.get_model('reviews', 'Review')
+    UserProfile = apps.get_model('users', 'UserProfile')
+    agregados = (
+        Review.objects.values('reviewed_profile_id')
+        .annotate(suma=Sum('rating'), total=Count('id'))
+        .order_by()
+    )
+    lote = []
+    for fila in agregados.iterator(chunk_size=2000):
+        lote.append(UserProfile(id=fila['reviewed_profile_id'], rating_sum=fila['suma'], total_ratings=fila['total']))
+        if len(lote) >= 2000:
+            UserProfile.objects.bulk_update(lote, ['rating_sum', 'total_ratings'])
+            lote = []
+    if lote:
+        UserProfile.objects.bulk_update(lote, ['rating_sum', 'total_ratings'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0001_initial'),
+        ('users', '0006_userprofile_rating_sum'),
+    ]
+
+    operations = [
+        migrations.RunPython(calcular_rating_sum, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+"""
+Mantenimiento del promedio de calificaciones de cada perfil.
+
+Cada perfil guarda 'rating_sum' (suma de estrellas) y 'total_ratings'.
+Cuando se crea, borra o cambia una reseña no volvemos a recorrer todas
+sus reseñas: sumamos/restamos la diferencia con un solo UPDATE atómico
+usando F() (la BD hace la cuenta, sin carreras entre reseñas simultáneas).
+
+recompute_ratings() hace el cálculo completo (con GROUP BY) y sirve para
+corregir diferencias o después de cargas masivas. Bloquea los perfiles
+ANTES de contar: un apply_rating_delta() simultáneo espera a que termine
+(y suma su diferencia encima), o ya hizo commit y entra en la cuenta.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Round
+
+from users.models import UserProfile
+from .models import Review
+
+RATING_POR_DEFECTO = Decimal('5.00')
+
+
+def apply_rating_delta(profile_id, delta_suma, delta_total):
+    """
+    Suma 'delta_suma' estrellas y 'delta_total' reseñas al perfil, y
+    recalcula el promedio, todo en un solo UPDATE.
+    """
+    nueva_suma = F('rating_sum') + delta_suma
+    nuevo_total = F('total_ratings') + delta_total
+    return UserProfile.objects.filter(pk=profile_id).update(
+        # OJO: 'average_rating' va primero. MySQL evalúa el SET de izquierda a
+        # derecha con los valores ya actualizados; así usamos los valores viejos
+        # (igual que el SQL estándar) en todas las bases de datos.
+        average_rating=Case(
+            When(total_ratings__lte=-delta_total, then=Value(RATING_POR_DEFECTO)),
+            default=Round(Cast(nueva_suma, FloatField()) / nuevo_total, 2),
+            output_field=DecimalField(max_digits=3, decimal_places=2),
+        ),
+        rating_sum=nueva_suma,
+        total_ratings=nuevo_total,
+    )
+
+
+def _promedio(suma, total):
+    if not total:
+        return RATING_POR_DEFECTO
+    return (Decimal(suma) / Decimal(total)).quantize(Decimal('0.01'), ROUND_HALF_UP)
+
+
+def recompute_ratings(profile_ids):
+    """
+    Recalcula desde cero los ratings de los perfiles indicados, en una
+    transacción: un SELECT ... FOR UPDATE de los perfiles + un GROUP BY
+    sobre las reseñas + un bulk_update solo de los que tenían diferencias.
+    Devuelve cuántos perfiles se corrigieron.
+    """
+    profile_ids = list(profile_ids)
+    if not profile_ids:
+        return 0
+    # savepoint=False: dentro de otra transacción (ej. la carga masiva) basta con la de afuera
+    with transaction.atomic(savepoint=False):
+        # En orden de id, para que dos recálculos no se bloqueen en cruz
+        perfiles = list(
+            UserProfile.objects.select_for_update().filter(pk__in=profile_ids).order_by('pk').only(
+                'id', 'rating_sum', 'total_ratings', 'average_rating'
+            )
+        )
+        agregados = {
+            fila['reviewed_profile_id']: (fila['suma'], fila['total'])
+            for fila in (
+                Review.objects.filter(reviewed_profile_id__in=profile_ids)
+                .values('reviewed_profile_id')
+                .annotate(suma=Sum('rating'), total=Count('id'))
+                .order_by()
+            )
+        }
+
+        corregidos = []
+        for perfil in perfiles:
+            suma, total = agregados.get(perfil.id, (0, 0))
+            promedio = _promedio(suma, total)
+            if (perfil.rating_sum, perfil.total_ratings, perfil.average_rating) != (suma, total, promedio):
+                perfil.rating_sum, perfil.total_ratings, perfil.average_rating = suma, total, promedio
+                corregidos.append(perfil)
+
+        UserProfile.objects.bulk_update(corregidos, ['rating_sum', 'total_ratings', 'average_rating'])
+    return len(corregidos)
@@ -1,48 +1,51 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_init, post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import Avg, Count
 from .models import Review
-from users.models import UserProfile
-
-# Esta función calcula y actualiza el promedio del perfil reseñado
-def update_profile_rating(profile_id):
-    try:
-        profile = UserProfile.objects.get(id=profile_id)
-        
-        # Obtenemos todas las reseñas para este perfil
-        reviews = Review.objects.filter(reviewed_profile=profile)
-        
-        if reviews.exists():
-            # Usamos la base de datos para calcular el promedio (Avg) y el conteo (Count)
-            agg_data = reviews.aggregate(
-                average_rating=Avg('rating'),
-                total_ratings=Count('id')
-            )
-            
-            # Actualizamos los campos del perfil
-            profile.average_rating = agg_data['average_rating']
-            profile.total_ratings = agg_data['total_ratings']
-        else:
-            # Si no hay reseñas, reseteamos a los valores por defecto
-            profile.average_rating = 5.00
-            profile.total_ratings = 0
-            
-        profile.save() # Guardamos el perfil con los nuevos valores
-
-    except UserProfile.DoesNotExist:
-        pass # El perfil no existe, no hacemos nada
+from .ratings import apply_rating_delta, recompute_ratings
 
 # -------------------------------------------------------------------
-# "SIGNAL" (El Gatillo)
+# "SIGNALS" (Los Gatillos)
 # -------------------------------------------------------------------
+# En vez de recalcular el promedio con TODAS las reseñas del perfil,
+# solo aplicamos la diferencia (ver reviews/ratings.py).
+
+# Guardamos a quién y cuántas estrellas tenía la reseña al cargarse,
+# para saber qué cambió cuando se vuelva a guardar.
+# (Leemos __dict__ para no disparar una consulta si el campo fue diferido con only()).
+@receiver(post_init, sender=Review)
+def review_loaded_handler(sender, instance, **kwargs):
+    datos = instance.__dict__
+    if instance.pk and 'rating' in datos and 'reviewed_profile_id' in datos:
+        instance._rating_original = (datos['reviewed_profile_id'], datos['rating'])
+    else:
+        instance._rating_original = None
+
 # Esta función se "dispara" CADA VEZ que una 'Review' se guarda (post_save)
 @receiver(post_save, sender=Review)
 def review_saved_handler(sender, instance, created, **kwargs):
     # 'instance' es la Reseña que se acaba de guardar
-    update_profile_rating(instance.reviewed_profile.id)
+    original = instance._rating_original
+    if created:
+        apply_rating_delta(instance.reviewed_profile_id, instance.rating, 1)
+    elif original is None:
+        # No sabemos cómo estaba antes: recalculamos ese perfil completo
+        recompute_ratings([instance.reviewed_profile_id])
+    else:
+        perfil_anterior, rating_anterior = original
+        if perfil_anterior != instance.reviewed_profile_id:
+            # La reseña cambió de perfil: se la quitamos a uno y se la damos al otro
+            apply_rating_delta(perfil_anterior, -rating_anterior, -1)
+            apply_rating_delta(instance.reviewed_profile_id, instance.rating, 1)
+        elif rating_anterior != instance.rating:
+            apply_rating_delta(instance.reviewed_profile_id, instance.rating - rating_anterior, 0)
+    instance._rating_original = (instance.reviewed_profile_id, instance.rating)
 
 # Esta función se "dispara" CADA VEZ que una 'Review' se borra (post_delete)
 @receiver(post_delete, sender=Review)
 def review_deleted_handler(sender, instance, **kwargs):
     # 'instance' es la Reseña que se acaba de borrar
-    update_profile_rating(instance.reviewed_profile.id)
\ No newline at end of file
+    if instance._rating_original is None:
+        recompute_ratings([instance.reviewed_profile_id])
+    else:
+        perfil_id, rating = instance._rating_original
+        apply_rating_delta(perfil_id, -rating, -1)
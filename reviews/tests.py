@@ -1,3 +1,158 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+
+from users.models import UserProfile
+from . import ratings
+from .bulk import bulk_import_reviews
+from .models import Review
+
+
+def crear_perfil(username, phone):
+    user = User.objects.create(username=username)
+    UserProfile.objects.filter(user=user).delete()  # Lo crea el signal; lo rehacemos con nuestros datos
+    return UserProfile.objects.create(user=user, full_name=username, phone=phone)
+
+
+# ---------------------------------------------------------------------------
+# PROMEDIO DE CALIFICACIONES
+# ---------------------------------------------------------------------------
+class RatingIncrementalTests(TestCase):
+
+    def setUp(self):
+        self.pasajero = crear_perfil('pasajero@test.com', '900000000')
+        self.conductor = crear_perfil('conductor@test.com', '900000001')
+        self.otro = crear_perfil('otro@test.com', '900000002')
+
+    def resenar(self, rating, perfil=None):
+        return Review.objects.create(
+            reviewer_profile=self.pasajero, reviewed_profile=perfil or self.conductor, rating=rating
+        )
+
+    def assertRating(self, perfil, promedio, total, suma):
+        perfil.refresh_from_db()
+        self.assertEqual(
+            (perfil.average_rating, perfil.total_ratings, perfil.rating_sum),
+            (Decimal(promedio), total, suma),
+        )
+
+    def test_crear_cambiar_y_borrar(self):
+        with self.assertNumQueries(2):  # INSERT de la reseña + UPDATE del perfil
+            self.resenar(5)
+        resena = self.resenar(4)
+        self.resenar(4)
+        self.assertRating(self.conductor, '4.33', 3, 13)
+
+        resena.rating = 1
+        resena.save()
+        self.assertRating(self.conductor, '3.33', 3, 10)
+
+        resena.delete()
+        self.assertRating(self.conductor, '4.50', 2, 9)
+
+    def test_borrar_la_ultima_vuelve_al_valor_por_defecto(self):
+        resena = self.resenar(2)
+        self.assertRating(self.conductor, '2.00', 1, 2)
+        Review.objects.get(pk=resena.pk).delete()
+        self.assertRating(self.conductor, '5.00', 0, 0)
+
+    def test_reseña_que_cambia_de_perfil(self):
+        resena = self.resenar(3)
+        resena = Review.objects.get(pk=resena.pk)
+        resena.reviewed_profile = self.otro
+        resena.save()
+        self.assertRating(self.conductor, '5.00', 0, 0)
+        self.assertRating(self.otro, '3.00', 1, 3)
+
+    def test_reconcile_corrige_desviaciones(self):
+        self.resenar(5)
+        self.resenar(2)
+        UserProfile.objects.filter(pk=self.conductor.pk).update(rating_sum=99, total_ratings=1, average_rating=1)
+        call_command('reconcile_ratings', chunk_size=2, stdout=StringIO())
+        self.assertRating(self.conductor, '3.50', 2, 7)
+
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class RecalculoConcurrenteTests(TransactionTestCase):
+
+    def test_una_reseña_durante_el_recalculo_no_se_pierde(self):
+        pasajero = crear_perfil('pasajero@test.com', '900000000')
+        conductor = crear_perfil('conductor@test.com', '900000001')
+        Review.objects.create(reviewer_profile=pasajero, reviewed_profile=conductor, rating=5)
+        UserProfile.objects.filter(pk=conductor.pk).update(rating_sum=99)  # Para que haya algo que corregir
+
+        def resenar():
+            try:
+                Review.objects.create(reviewer_profile=pasajero, reviewed_profile=conductor, rating=1)
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=resenar)
+        promedio = ratings._promedio
+
+        def promedio_con_reseña_en_medio(suma, total):
+            # Ya se contaron las reseñas y falta escribir: llega otra
+            if not hilo.is_alive() and hilo.ident is None:
+                hilo.start()
+                hilo.join(0.5)  # Espera el bloqueo del perfil (no debe terminar)
+            return promedio(suma, total)
+
+        with mock.patch.object(ratings, '_promedio', promedio_con_reseña_en_medio):
+            self.assertEqual(ratings.recompute_ratings([conductor.id]), 1)
+        hilo.join()
+
+        conductor.refresh_from_db()
+        self.assertEqual((conductor.rating_sum, conductor.total_ratings, conductor.average_rating), (6, 2, Decimal('3.00')))
+
+
+# ---------------------------------------------------------------------------
+# CARGA MASIVA
+# ---------------------------------------------------------------------------
+class BulkImportTests(TestCase):
+
+    def setUp(self):
+        self.a = crear_perfil('a@test.com', '900000010')
+        self.b = crear_perfil('b@test.com', '900000011')
+
+    def test_importa_y_recalcula_una_vez_por_perfil(self):
+        filas = [
+            {'reviewed_profile_id': self.a.id, 'rating': 5, 'created_at': '2024-01-15T10:00:00Z'},
+            {'reviewed_profile_id': self.a.id, 'rating': '2', 'reviewer_profile_id': self.b.id},
+            {'reviewed_profile_id': self.b.id, 'rating': 4},
+            {'reviewed_profile_id': self.b.id, 'rating': 9},  # Inválida
+        ]
+        # INSERT del lote (+ savepoint) y luego GROUP BY + SELECT + UPDATE de perfiles
+        with self.assertNumQueries(6):
+            resumen = bulk_import_reviews(filas)
+        self.assertEqual(resumen, {'insertadas': 3, 'invalidas': 1, 'perfiles_recalculados': 2})
+
+        self.a.refresh_from_db()
+        self.b.refresh_from_db()
+        self.assertEqual((self.a.average_rating, self.a.total_ratings, self.a.rating_sum), (Decimal('3.50'), 2, 7))
+        self.assertEqual((self.b.average_rating, self.b.total_ratings), (Decimal('4.00'), 1))
+        # Se conserva la fecha original de la reseña
+        self.assertEqual(Review.objects.filter(created_at__year=2024).count(), 1)
+
+
+class BulkImportFalloTests(TransactionTestCase):
+
+    def test_un_lote_que_falla_no_deja_ratings_viejos(self):
+        a = crear_perfil('a@test.com', '900000010')
+        filas = [
+            {'reviewed_profile_id': a.id, 'rating': 5},
+            {'reviewed_profile_id': a.id, 'rating': 3},
+            {'reviewed_profile_id': 999999, 'rating': 4},  # Perfil que no existe: falla el 2do lote
+        ]
+        with self.assertRaises(IntegrityError):
+            bulk_import_reviews(filas, batch_size=2)
+
+        a.refresh_from_db()
+        self.assertEqual(Review.objects.count(), 2)
+        self.assertEqual((a.average_rating, a.total_ratings), (Decimal('4.00'), 2))
@@ -1,5 +1,8 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR
+from django.db.models import Case, IntegerField, Value, When
 from .models import SupportTicket, TicketMessage
+from .search import rank_tickets
 
 # Register your models here.
 
@@ -9,15 +12,41 @@ class TicketMessageInline(admin.StackedInline):
     extra = 1 # Mostrar 1 campo para escribir una nueva respuesta
     readonly_fields = ('sender', 'sent_at') # No dejar editar quién lo mandó
 
+    # Sin esto, mostrar el remitente de cada mensaje es una consulta más por mensaje
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('sender')
+
 class SupportTicketAdmin(admin.ModelAdmin):
     list_display = ('id', 'subject', 'user_profile', 'status', 'priority', 'assigned_to', 'updated_at')
     list_filter = ('status', 'priority', 'assigned_to')
-    search_fields = ('subject', 'user_profile__full_name')
+    search_fields = ('subject',) # Solo para que aparezca el buscador; la búsqueda real está abajo
     list_editable = ('status', 'priority', 'assigned_to')
     readonly_fields = ('user_profile',) # No se puede cambiar quién creó el ticket
     
     # ¡Aquí conectamos los mensajes!
     inlines = [TicketMessageInline]
 
+    # Cuántos tickets trae como mucho una búsqueda (los más relevantes)
+    limite_busqueda = 1000
+
+    # Buscamos en el asunto Y en los mensajes con el índice FULLTEXT (ver support/search.py)
+    # en vez de LIKE '%texto%', que recorre toda la tabla
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = [ticket_id for ticket_id, _ in rank_tickets(search_term, limite=self.limite_busqueda)]
+        if len(ids) >= self.limite_busqueda:
+            self.message_user(
+                request,
+                f"Se muestran solo los {self.limite_busqueda} tickets más relevantes. Afina la búsqueda para ver otros.",
+                messages.WARNING,
+            )
+        queryset = queryset.filter(pk__in=ids)
+        # Del más relevante al menos (y no por '-updated_at'), salvo que se ordene a mano por una columna
+        if ids and ORDER_VAR not in request.GET:
+            posicion = Case(*[When(pk=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+            queryset = queryset.order_by(posicion, '-pk')
+        return queryset, False
+
 admin.site.register(SupportTicket, SupportTicketAdmin)
 # No registramos TicketMessage por separado, ya que se maneja "dentro" del Ticket
\ No newline at end of file
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SupportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'support'
+
+    # Carga los "signals" (avisan de mensajes nuevos a quien los espera)
+    def ready(self):
+        import support.signals
@@ -0,0 +1,73 @@
+"""
+Chat de los tickets de soporte: traer solo los mensajes NUEVOS.
+
+El cliente recuerda el id del último mensaje que vio y pide los que vienen
+después ('since_id'), en vez de volver a bajar toda la conversación en cada
+actualización. Los ids crecen con cada mensaje, así que "después de tal id"
+es lo mismo que "enviados después".
+
+Long-polling: si no hay mensajes nuevos, la petición espera (hasta unos
+segundos) a que llegue alguno. La espera es asíncrona (ver
+mensajes_ticket en support/views.py): no ocupa un hilo del worker, solo
+una suscripción al canal del ticket en el broker de tiempo real
+(backend_project/realtime.py), así que llega a todos los workers. Por si
+un aviso se pierde, la BD se vuelve a consultar cada INTERVALO_SONDEO
+segundos igual.
+"""
+import asyncio
+
+from backend_project.realtime import canal_ticket, get_broker, publish
+from .models import TicketMessage
+
+LIMITE_MENSAJES = 100
+INTERVALO_SONDEO = 5.0
+ESPERA_MAXIMA = 25
+
+
+def _mensajes(ticket_id):
+    return TicketMessage.objects.filter(ticket_id=ticket_id).select_related('sender')
+
+
+def mensajes_nuevos(ticket_id, since_id, limite=LIMITE_MENSAJES):
+    """Hasta 'limite' mensajes del ticket con id > since_id, del más antiguo al más nuevo."""
+    return list(_mensajes(ticket_id).filter(pk__gt=since_id).order_by('pk')[:limite])
+
+
+def mensajes_recientes(ticket_id, antes_de_id=None, limite=LIMITE_MENSAJES):
+    """
+    Los últimos 'limite' mensajes (o los anteriores a 'antes_de_id', para
+    ir subiendo en la conversación), del más antiguo al más nuevo.
+    """
+    mensajes = _mensajes(ticket_id).order_by('-sent_at', '-pk')
+    if antes_de_id is not None:
+        mensajes = mensajes.filter(pk__lt=antes_de_id)
+    return list(mensajes[:limite])[::-1]
+
+
+def avisar_mensaje_nuevo(mensaje):
+    """Avisa (al terminar la transacción) a las peticiones que esperan mensajes de ese ticket."""
+    publish(canal_ticket(mensaje.ticket_id), {'tipo': 'mensaje', 'ticket': mensaje.ticket_id, 'id': mensaje.id})
+
+
+async def suscribirse_al_ticket(ticket_id, broker=None):
+    """
+    Suscripción a los avisos de mensajes nuevos del ticket. Hay que
+    suscribirse ANTES de consultar la BD: un mensaje que llegue entre la
+    consulta y la espera igual avisa.
+    """
+    suscripcion = (broker or get_broker()).subscribe([canal_ticket(ticket_id)])
+    try:
+        await suscripcion.listo()
+    except BaseException:
+        await suscripcion.close()
+        raise
+    return suscripcion
+
+
+async def esperar_aviso(suscripcion, segundos):
+    """Espera hasta 'segundos' a que llegue un aviso. Devuelve True si llegó."""
+    try:
+        await asyncio.wait_for(suscripcion.get(), timeout=max(segundos, 0))
+    except asyncio.TimeoutError:
+        return False
+    return True
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def calcular_priority_rank(apps, schema_editor):
+    """Llena 'priority_rank' de los tickets existentes (MEDIUM ya quedó en 1 por defecto)."""
+    SupportTicket = apps.get_model('support', 'SupportTicket')
+    SupportTicket.objects.filter(priority='HIGH').update(priority_rank=0)
+    SupportTicket.objects.filter(priority='LOW').update(priority_rank=2)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0001_initial'),
+        ('users', '0006_userprofile_rating_sum'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportticket',
+            name='priority_rank',
+            field=models.PositiveSmallIntegerField(default=1, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(fields=['status', 'priority_rank', 'created_at'], name='ticket_cola_idx'),
+        ),
+        migrations.RunPython(calcular_priority_rank, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# Índices FULLTEXT para buscar en tickets y mensajes (ver support/search.py).
+# Solo existen en MySQL; en otras bases de datos (ej. SQLite en desarrollo)
+# la búsqueda usa LIKE y esta migración no hace nada.
+INDICES = (
+    ('support_supportticket', 'ticket_asunto_ft', 'subject'),
+    ('support_ticketmessage', 'mensaje_texto_ft', 'message'),
+)
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for tabla, indice, columna in INDICES:
+        schema_editor.execute(f"CREATE FULLTEXT INDEX {indice} ON {tabla} ({columna})")
+
+
+def borrar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for tabla, indice, _ in INDICES:
+        schema_editor.execute(f"DROP INDEX {indice} ON {tabla}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('support', '0003_ticket_message_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indices, borrar_indices),
+    ]
@@ -42,6 +42,9 @@ class SupportTicket(models.Model):
         default=TicketPriority.MEDIUM,
         verbose_name="Prioridad"
     )
+    # La prioridad como número (0 = la más urgente), para ordenar la cola con
+    # un índice: como texto, 'HIGH' < 'LOW' < 'MEDIUM'. Se llena en save().
+    priority_rank = models.PositiveSmallIntegerField(default=1, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -55,6 +58,13 @@ class SupportTicket(models.Model):
         limit_choices_to={'is_staff': True} # Solo se puede asignar a admins
     )
 
+    # Orden de atención: primero los de prioridad alta
+    PRIORITY_RANKS = {
+        TicketPriority.HIGH: 0,
+        TicketPriority.MEDIUM: 1,
+        TicketPriority.LOW: 2,
+    }
+
     def __str__(self):
         return f"Ticket #{self.id} ({self.subject}) - {self.get_status_display()}"
 
@@ -62,6 +72,18 @@ class SupportTicket(models.Model):
         verbose_name = "Ticket de Soporte"
         verbose_name_plural = "Tickets de Soporte"
         ordering = ['-updated_at']
+        indexes = [
+            # La cola de los agentes: tickets ABIERTOS por prioridad y antigüedad
+            models.Index(fields=['status', 'priority_rank', 'created_at'], name='ticket_cola_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Mantenemos 'priority_rank' al día con 'priority' (ej. al cambiarla desde el admin)
+        self.priority_rank = self.PRIORITY_RANKS.get(self.priority, self.PRIORITY_RANKS[self.TicketPriority.MEDIUM])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'priority' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'priority_rank'}
+        super().save(*args, **kwargs)
 
 # ---------------------------------------------------------------------------
 # MODELO 2: MENSAJE DEL TICKET (LA CONVERSACIÓN)
@@ -85,9 +107,15 @@ class TicketMessage(models.Model):
     sent_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"Mensaje de {self.sender.username} en Ticket #{self.ticket.id}"
+        # 'ticket_id' en vez de 'ticket.id': no hace falta cargar el ticket
+        remitente = self.sender.username if self.sender else "(usuario borrado)"
+        return f"Mensaje de {remitente} en Ticket #{self.ticket_id}"
 
     class Meta:
         verbose_name = "Mensaje de Ticket"
         verbose_name_plural = "Mensajes de Tickets"
-        ordering = ['sent_at'] # El más antiguo primero, para leer como chat    
\ No newline at end of file
+        ordering = ['sent_at'] # El más antiguo primero, para leer como chat
+        indexes = [
+            # La conversación de UN ticket, en orden
+            models.Index(fields=['ticket', 'sent_at'], name='mensaje_ticket_enviado_idx'),
+        ]    
\ No newline at end of file
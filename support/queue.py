@@ -0,0 +1,49 @@
+"""
+Cola de trabajo de los agentes de soporte.
+
+Cada agente pide "el siguiente ticket" y se lo queda. Con decenas de
+agentes pidiendo a la vez, todos leerían el MISMO primer ticket; por eso:
+
+    SELECT ... FROM support_supportticket
+    WHERE status = 'OPEN'
+    ORDER BY priority_rank, created_at, id
+    LIMIT 1 FOR UPDATE SKIP LOCKED
+
+Cada agente bloquea la primera fila que NADIE más tiene bloqueada, sin
+esperar a los demás (usa el índice status, priority_rank, created_at).
+Además, el ticket se asigna con un UPDATE condicional (solo si sigue
+ABIERTO), así que aunque la base de datos no soporte SKIP LOCKED nunca
+se asigna el mismo ticket a dos agentes.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import SupportTicket
+
+Status = SupportTicket.TicketStatus
+
+
+def cola_abierta():
+    """Los tickets ABIERTOS en el orden en que se atienden."""
+    return SupportTicket.objects.filter(status=Status.OPEN).order_by('priority_rank', 'created_at', 'id')
+
+
+def claim_next_ticket(agente, intentos=5):
+    """
+    Asigna al agente el siguiente ticket ABIERTO (el más urgente y antiguo)
+    y lo pasa a EN PROGRESO. Devuelve el ticket, o None si la cola está vacía.
+    """
+    for _ in range(intentos):
+        with transaction.atomic():
+            ticket = cola_abierta().select_for_update(skip_locked=True).first()
+            if ticket is None:
+                return None
+            ahora = timezone.now()
+            tomado = SupportTicket.objects.filter(pk=ticket.pk, status=Status.OPEN).update(
+                status=Status.IN_PROGRESS, assigned_to=agente, updated_at=ahora
+            )
+        if tomado:
+            ticket.status, ticket.assigned_to, ticket.updated_at = Status.IN_PROGRESS, agente, ahora
+            return ticket
+        # Otro agente se lo llevó justo antes (sin SKIP LOCKED): probamos con el siguiente
+    return None
@@ -0,0 +1,89 @@
+"""
+Búsqueda de texto en los tickets de soporte (asunto y mensajes).
+
+En MySQL se usan índices FULLTEXT (migración 0004) con MATCH ... AGAINST,
+que además da un puntaje de relevancia: no recorre la tabla como
+LIKE '%texto%'. Un ticket suma la relevancia de su asunto (que pesa el
+doble) y la de sus mensajes, y se devuelven los más relevantes primero.
+
+En otras bases de datos (SQLite en desarrollo y tests) se busca con LIKE
+y la relevancia es cuántas palabras aparecen en el asunto (x2) y en los
+mensajes. Sirve para probar, no para millones de mensajes.
+
+Ojo: MySQL ignora las palabras muy cortas (menos de 3 letras en InnoDB)
+y las muy comunes.
+"""
+from django.db import connection
+from django.db.models import Q
+
+from .models import SupportTicket, TicketMessage
+
+LIMITE_RESULTADOS = 50
+PESO_ASUNTO = 2
+
+
+def _ranking_mysql(texto, limite):
+    tickets = SupportTicket._meta.db_table
+    mensajes = TicketMessage._meta.db_table
+    sql = f"""
+        SELECT ticket_id, SUM(relevancia) AS relevancia FROM (
+            SELECT id AS ticket_id, {PESO_ASUNTO} * MATCH(subject) AGAINST (%s IN NATURAL LANGUAGE MODE) AS relevancia
+            FROM {tickets}
+            WHERE MATCH(subject) AGAINST (%s IN NATURAL LANGUAGE MODE)
+            UNION ALL
+            SELECT ticket_id, MATCH(message) AGAINST (%s IN NATURAL LANGUAGE MODE)
+            FROM {mensajes}
+            WHERE MATCH(message) AGAINST (%s IN NATURAL LANGUAGE MODE)
+        ) AS coincidencias
+        GROUP BY ticket_id
+        ORDER BY relevancia DESC, ticket_id DESC
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [texto] * 4 + [limite])
+        return [(ticket_id, float(relevancia)) for ticket_id, relevancia in cursor.fetchall()]
+
+
+def _ranking_like(texto, limite):
+    palabras = [p for p in texto.lower().split() if p]
+    if not palabras:
+        return []
+    puntajes = {}
+
+    def contar(filas, peso):
+        for ticket_id, contenido in filas:
+            contenido = (contenido or '').lower()
+            aciertos = sum(1 for p in palabras if p in contenido)
+            puntajes[ticket_id] = puntajes.get(ticket_id, 0) + peso * aciertos
+
+    alguna = lambda campo: Q(*[Q(**{f'{campo}__icontains': p}) for p in palabras], _connector=Q.OR)
+    contar(SupportTicket.objects.filter(alguna('subject')).values_list('id', 'subject'), PESO_ASUNTO)
+    contar(TicketMessage.objects.filter(alguna('message')).values_list('ticket_id', 'message'), 1)
+    ranking = sorted(puntajes.items(), key=lambda par: (-par[1], -par[0]))
+    return [(ticket_id, float(puntaje)) for ticket_id, puntaje in ranking[:limite]]
+
+
+def rank_tickets(texto, limite=LIMITE_RESULTADOS):
+    """[(ticket_id, relevancia)] de los tickets que coinciden con 'texto', del más relevante al menos."""
+    texto = (texto or '').strip()
+    if not texto:
+        return []
+    if connection.vendor == 'mysql':
+        return _ranking_mysql(texto, limite)
+    return _ranking_like(texto, limite)
+
+
+def search_tickets(texto, limite=LIMITE_RESULTADOS):
+    """
+    Los tickets que coinciden con 'texto', ordenados por relevancia
+    (cada uno con el atributo 'relevancia'). Dos consultas en total.
+    """
+    ranking = rank_tickets(texto, limite)
+    tickets = SupportTicket.objects.select_related('user_profile').in_bulk([ticket_id for ticket_id, _ in ranking])
+    resultado = []
+    for ticket_id, relevancia in ranking:
+        ticket = tickets.get(ticket_id)
+        if ticket is not None:
+            ticket.relevancia = relevancia
+            resultado.append(ticket)
+    return resultado
@@ -0,0 +1,64 @@
+from rest_framework import serializers
+from .models import SupportTicket, TicketMessage
+
+
+class SupportTicketSerializer(serializers.ModelSerializer):
+    """
+    Un ticket de soporte, como lo ve el agente.
+    """
+    user_full_name = serializers.CharField(source='user_profile.full_name', default=None, read_only=True)
+
+    class Meta:
+        model = SupportTicket
+        fields = (
+            'id',
+            'subject',
+            'status',
+            'priority',
+            'user_profile',
+            'user_full_name',
+            'assigned_to',
+            'created_at',
+            'updated_at',
+        )
+        read_only_fields = fields
+
+
+class TicketMessageSerializer(serializers.ModelSerializer):
+    """
+    Un mensaje del chat del ticket (el remitente viene con select_related).
+    """
+    sender_username = serializers.CharField(source='sender.username', default=None, read_only=True)
+
+    class Meta:
+        model = TicketMessage
+        fields = ('id', 'sender', 'sender_username', 'message', 'sent_at')
+        read_only_fields = ('id', 'sender', 'sender_username', 'sent_at')
+
+
+class MensajesQuerySerializer(serializers.Serializer):
+    """
+    Qué mensajes pide el cliente (por query params):
+    - since_id: solo los posteriores a ese mensaje (y 'wait' segundos de espera si no hay)
+    - before_id: los anteriores a ese mensaje (para subir en la conversación)
+    - sin ninguno: los últimos mensajes
+    """
+    since_id = serializers.IntegerField(required=False, min_value=0)
+    before_id = serializers.IntegerField(required=False, min_value=1)
+    wait = serializers.IntegerField(required=False, min_value=0, default=0)
+
+    def validate(self, data):
+        if 'since_id' in data and 'before_id' in data:
+            raise serializers.ValidationError("Usa 'since_id' o 'before_id', no los dos.")
+        return data
+
+
+class TicketBusquedaSerializer(SupportTicketSerializer):
+    """
+    Un ticket en los resultados de búsqueda, con su relevancia.
+    """
+    relevancia = serializers.FloatField(read_only=True)
+
+    class Meta(SupportTicketSerializer.Meta):
+        fields = SupportTicketSerializer.Meta.fields + ('relevancia',)
+        read_only_fields = fields
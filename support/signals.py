@@ -0,0 +1,16 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import TicketMessage
+from .chat import avisar_mensaje_nuevo
+
+# -------------------------------------------------------------------
+# "SIGNALS" (Los Gatillos)
+# -------------------------------------------------------------------
+# Cuando llega un mensaje a un ticket, despertamos a los clientes que
+# están esperando mensajes nuevos (long-polling, ver support/chat.py).
+# El aviso sale recién después del commit: antes, los demás todavía no
+# lo pueden leer.
+@receiver(post_save, sender=TicketMessage)
+def message_saved_handler(sender, instance, created, **kwargs):
+    if created:
+        avisar_mensaje_nuevo(instance)
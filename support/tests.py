@@ -1,3 +1,256 @@
-from django.test import TestCase
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from users.models import UserProfile
+from users.utils import clear_profile_id_cache
+from backend_project.realtime import canal_ticket, get_broker
+from .chat import INTERVALO_SONDEO
+from .search import search_tickets
+from .models import SupportTicket, TicketMessage
+from .queue import claim_next_ticket
+
+Priority = SupportTicket.TicketPriority
+Status = SupportTicket.TicketStatus
+
+
+def crear_perfil(username, phone):
+    user = User.objects.create(username=username)
+    UserProfile.objects.filter(user=user).delete()  # Lo crea el signal; lo rehacemos con nuestros datos
+    return UserProfile.objects.create(user=user, full_name=username, phone=phone)
+
+
+def crear_ticket(subject, priority=Priority.MEDIUM, **campos):
+    return SupportTicket.objects.create(subject=subject, priority=priority, **campos)
+
+
+# ---------------------------------------------------------------------------
+# COLA DE TICKETS
+# ---------------------------------------------------------------------------
+class ColaTicketsTests(TestCase):
+
+    def setUp(self):
+        self.agente = User.objects.create(username='agente@test.com', is_staff=True)
+
+    def test_toma_por_prioridad_y_antiguedad(self):
+        crear_ticket('baja', Priority.LOW)
+        crear_ticket('media 1')
+        crear_ticket('alta', Priority.HIGH)
+        crear_ticket('media 2')
+        crear_ticket('cerrado', Priority.HIGH, status=Status.CLOSED)
+
+        tomados = [claim_next_ticket(self.agente).subject for _ in range(4)]
+        self.assertEqual(tomados, ['alta', 'media 1', 'media 2', 'baja'])
+        self.assertIsNone(claim_next_ticket(self.agente))
+        self.assertEqual(SupportTicket.objects.filter(status=Status.IN_PROGRESS, assigned_to=self.agente).count(), 4)
+
+    def test_cambiar_prioridad_reordena(self):
+        ticket = crear_ticket('era baja', Priority.LOW)
+        crear_ticket('media')
+        ticket.priority = Priority.HIGH
+        ticket.save(update_fields=['priority'])  # Como el list_editable del admin
+        self.assertEqual(claim_next_ticket(self.agente).subject, 'era baja')
+
+    def test_api_solo_staff(self):
+        crear_ticket('ayuda')
+        client = APIClient()
+        client.force_authenticate(User(username='cliente@test.com', is_staff=False))
+        self.assertEqual(client.post(reverse('ticket-siguiente')).status_code, 403)
+
+        client.force_authenticate(self.agente)
+        respuesta = client.post(reverse('ticket-siguiente'))
+        self.assertEqual((respuesta.status_code, respuesta.data['status']), (200, Status.IN_PROGRESS))
+        self.assertEqual(client.post(reverse('ticket-siguiente')).status_code, 204)
+
+
+class ColaConcurrenteTests(TransactionTestCase):
+    """
+    Muchos agentes pidiendo el siguiente ticket a la vez: cada ticket se
+    asigna a UN solo agente. En SQLite (sin SKIP LOCKED) algunos agentes
+    se quedan sin ticket o fallan con "database is locked".
+    """
+
+    def test_sin_doble_asignacion(self):
+        for i in range(8):
+            crear_ticket(f'ticket {i}')
+        agentes = [User.objects.create(username=f'agente{i}@test.com', is_staff=True) for i in range(12)]
+        tomados = []
+        barrera = threading.Barrier(len(agentes))
+
+        def hilo(agente):
+            try:
+                barrera.wait()
+                ticket = claim_next_ticket(agente)
+                if ticket:
+                    tomados.append((ticket.id, agente.id))
+            except OperationalError:
+                pass
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=hilo, args=(a,)) for a in agentes]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        ids = [ticket_id for ticket_id, _ in tomados]
+        self.assertEqual(len(ids), len(set(ids)))  # Ningún ticket se entregó dos veces
+        self.assertEqual(
+            set(SupportTicket.objects.filter(status=Status.IN_PROGRESS).values_list('id', 'assigned_to_id')),
+            set(tomados),
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            self.assertEqual(len(ids), 8)
+            self.assertFalse(SupportTicket.objects.filter(status=Status.OPEN).exists())
+
+
+# ---------------------------------------------------------------------------
+# CHAT DE TICKETS
+# ---------------------------------------------------------------------------
+class ChatTicketTests(TestCase):
+
+    def setUp(self):
+        clear_profile_id_cache()
+        self.cliente = crear_perfil('cliente@test.com', '900000000')
+        self.agente = crear_perfil('agente@test.com', '900000009').user
+        self.agente.is_staff = True
+        self.ticket = crear_ticket('No llegó mi conductor', user_profile=self.cliente)
+        self.url = reverse('ticket-mensajes', args=[self.ticket.id])
+        self.client = APIClient()
+
+    def escribir(self, user, texto):
+        return TicketMessage.objects.create(ticket=self.ticket, sender=user, message=texto)
+
+    def test_solo_los_nuevos(self):
+        mensajes = [self.escribir(self.cliente.user if i % 2 else self.agente, f"m{i}") for i in range(5)]
+        self.client.force_authenticate(self.agente)
+
+        # Ticket + mensajes con su remitente (sin una consulta por mensaje)
+        with self.assertNumQueries(2):
+            respuesta = self.client.get(self.url)
+        self.assertEqual([m['message'] for m in respuesta.data['mensajes']], ['m0', 'm1', 'm2', 'm3', 'm4'])
+        self.assertEqual(respuesta.data['mensajes'][1]['sender_username'], 'cliente@test.com')
+
+        respuesta = self.client.get(self.url, {'since_id': mensajes[2].id})
+        self.assertEqual([m['message'] for m in respuesta.data['mensajes']], ['m3', 'm4'])
+        self.assertEqual(respuesta.data['ultimo_id'], mensajes[4].id)
+
+        respuesta = self.client.get(self.url, {'since_id': mensajes[4].id})
+        self.assertEqual((respuesta.data['mensajes'], respuesta.data['ultimo_id']), ([], mensajes[4].id))
+
+        respuesta = self.client.get(self.url, {'before_id': mensajes[2].id})
+        self.assertEqual([m['message'] for m in respuesta.data['mensajes']], ['m0', 'm1'])
+
+    def test_enviar_y_permisos(self):
+        self.client.force_authenticate(self.cliente.user)
+        respuesta = self.client.post(self.url, {'message': "Hola"}, format='json')
+        self.assertEqual((respuesta.status_code, respuesta.data['sender']), (201, self.cliente.user.id))
+
+        otro = crear_perfil('otro@test.com', '900000001')
+        self.client.force_authenticate(otro.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+        SupportTicket.objects.filter(pk=self.ticket.pk).update(status=SupportTicket.TicketStatus.CLOSED)
+        self.client.force_authenticate(self.agente)
+        self.assertEqual(self.client.post(self.url, {'message': "Tarde"}, format='json').status_code, 400)
+
+
+# ---------------------------------------------------------------------------
+# BÚSQUEDA
+# ---------------------------------------------------------------------------
+class BusquedaTests(TestCase):
+    """En SQLite se prueba la búsqueda con LIKE (el FULLTEXT es solo de MySQL)."""
+
+    def setUp(self):
+        self.agente = User.objects.create(username='agente@test.com', is_staff=True)
+        self.cobro = crear_ticket('Cobro doble en mi tarjeta')
+        self.olvido = crear_ticket('Olvidé mi mochila')
+        self.otro = crear_ticket('Consulta')
+        TicketMessage.objects.create(ticket=self.olvido, sender=self.agente, message="¿La mochila era negra?")
+        TicketMessage.objects.create(ticket=self.otro, sender=self.agente, message="Se le hizo un cobro por error")
+
+    def test_ordena_por_relevancia(self):
+        with self.assertNumQueries(3):  # Asuntos, mensajes y los tickets encontrados
+            tickets = search_tickets('cobro tarjeta')
+        self.assertEqual([t.id for t in tickets], [self.cobro.id, self.otro.id])
+        self.assertGreater(tickets[0].relevancia, tickets[1].relevancia)
+
+    def test_api_y_admin(self):
+        client = APIClient()
+        client.force_authenticate(self.agente)
+        respuesta = client.get(reverse('tickets-buscar'), {'q': 'mochila'})
+        self.assertEqual([t['id'] for t in respuesta.data['results']], [self.olvido.id])
+        self.assertEqual(client.get(reverse('tickets-buscar')).status_code, 400)
+
+        self.agente.is_superuser = True
+        self.agente.save()
+        self.client.force_login(self.agente)
+        respuesta = self.client.get(reverse('admin:support_supportticket_changelist'), {'q': 'mochila'})
+        self.assertEqual([t.id for t in respuesta.context['cl'].result_list], [self.olvido.id])
+
+    def test_admin_ordena_por_relevancia_y_avisa_si_corta(self):
+        self.agente.is_superuser = True
+        self.agente.save()
+        self.client.force_login(self.agente)
+        url = reverse('admin:support_supportticket_changelist')
+        # El más relevante no es el último actualizado (el orden por defecto del listado)
+        respuesta = self.client.get(url, {'q': 'cobro tarjeta'})
+        self.assertEqual([t.id for t in respuesta.context['cl'].result_list], [self.cobro.id, self.otro.id])
+        self.assertEqual(list(respuesta.context['messages']), [])
+
+        with mock.patch.object(admin.site._registry[SupportTicket], 'limite_busqueda', 1):
+            respuesta = self.client.get(url, {'q': 'cobro tarjeta'})
+        self.assertEqual([t.id for t in respuesta.context['cl'].result_list], [self.cobro.id])
+        self.assertIn("solo los 1 tickets", str(list(respuesta.context['messages'])[0]))
+
+
+class LongPollingTests(TransactionTestCase):
+
+    def setUp(self):
+        self.ticket = crear_ticket('ayuda')
+        self.agente = User.objects.create(username='agente@test.com', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.agente)
+        self.url = reverse('ticket-mensajes', args=[self.ticket.id])
+
+    def test_despierta_al_llegar_un_mensaje(self):
+        def responder():
+            try:
+                time.sleep(0.2)
+                TicketMessage.objects.create(ticket=self.ticket, sender=self.agente, message="¿En qué te ayudo?")
+            finally:
+                connection.close()
+
+        hilo = threading.Thread(target=responder)
+        inicio = time.monotonic()
+        hilo.start()
+        respuesta = self.client.get(self.url, {'since_id': 0, 'wait': 5})
+        hilo.join()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual([m['message'] for m in respuesta.data['mensajes']], ["¿En qué te ayudo?"])
+        # Lo despertó el aviso del broker, no el siguiente chequeo a la BD
+        self.assertLess(time.monotonic() - inicio, 0.9 * INTERVALO_SONDEO)
+        # La suscripción al canal del ticket se cerró al responder
+        self.assertFalse(get_broker()._suscriptores.get(canal_ticket(self.ticket.id)))
+
+    def test_sin_mensajes_responde_vacio_al_vencer_la_espera(self):
+        inicio = time.monotonic()
+        respuesta = self.client.get(self.url, {'since_id': 0, 'wait': 1})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['mensajes'], [])
+        self.assertGreaterEqual(time.monotonic() - inicio, 1)
+
+    def test_sin_permiso_no_espera(self):
+        self.client.force_authenticate(User.objects.create(username='otro@test.com'))
+        inicio = time.monotonic()
+        respuesta = self.client.get(self.url, {'since_id': 0, 'wait': 5})
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertLess(time.monotonic() - inicio, 1)
@@ -0,0 +1,15 @@
+from django.urls import path
+from .views import TomarSiguienteTicketView, BuscarTicketsView, mensajes_ticket
+
+urlpatterns = [
+    # POST /api/support/cola/siguiente/ (el agente toma el siguiente ticket)
+    path('cola/siguiente/', TomarSiguienteTicketView.as_view(), name='ticket-siguiente'),
+
+    # GET/POST /api/support/tickets/<id>/mensajes/ (chat del ticket)
+    # GET ?since_id=<último id visto>&wait=20 -> solo los nuevos, esperando si no hay
+    # (vista asíncrona: la espera no ocupa un hilo del worker)
+    path('tickets/<int:pk>/mensajes/', mensajes_ticket, name='ticket-mensajes'),
+
+    # GET /api/support/buscar/?q=... (búsqueda por relevancia en asuntos y mensajes)
+    path('buscar/', BuscarTicketsView.as_view(), name='tickets-buscar'),
+]
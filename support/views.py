@@ -1,3 +1,166 @@
-from django.shortcuts import render
+import time
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.shortcuts import get_object_or_404
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import permissions, status
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from users.models import UserProfile
+from users.utils import get_db_user, get_profile_id
+from .chat import (
+    ESPERA_MAXIMA,
+    INTERVALO_SONDEO,
+    esperar_aviso,
+    mensajes_nuevos,
+    mensajes_recientes,
+    suscribirse_al_ticket,
+)
+from .models import SupportTicket
+from .queue import claim_next_ticket
+from .search import search_tickets
+from .serializers import (
+    SupportTicketSerializer,
+    TicketMessageSerializer,
+    MensajesQuerySerializer,
+    TicketBusquedaSerializer,
+)
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# ---------------------------------------------------------------------------
+# VISTA 1: TOMAR EL SIGUIENTE TICKET (AGENTES)
+# /api/support/cola/siguiente/
+# ---------------------------------------------------------------------------
+class TomarSiguienteTicketView(APIView):
+    """
+    El agente (staff) toma el siguiente ticket ABIERTO de la cola, por
+    prioridad y antigüedad. Muchos agentes pueden pedir a la vez sin
+    esperarse entre ellos y sin recibir el mismo ticket.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        ticket = claim_next_ticket(get_db_user(request.user))
+        if ticket is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        logger.info(f"Ticket #{ticket.id} asignado a {request.user.username}")
+        return Response(SupportTicketSerializer(ticket).data, status=status.HTTP_200_OK)
+
+
+# ---------------------------------------------------------------------------
+# VISTA 2: CHAT DEL TICKET
+# /api/support/tickets/<id>/mensajes/
+# ---------------------------------------------------------------------------
+class MensajesTicketView(APIView):
+    """
+    GET: mensajes del ticket. Con ?since_id=N solo los nuevos (la espera
+    de &wait=S la hace mensajes_ticket, más abajo, sin ocupar un hilo).
+    Con ?before_id=N, los anteriores (para cargar la conversación de a poco).
+    POST: enviar un mensaje.
+    Solo el dueño del ticket o el staff.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_ticket(self, request, pk):
+        ticket = get_object_or_404(SupportTicket.objects.only('id', 'user_profile_id', 'status'), pk=pk)
+        if not request.user.is_staff:
+            try:
+                es_dueno = ticket.user_profile_id == get_profile_id(request.user)
+            except UserProfile.DoesNotExist:
+                es_dueno = False
+            if not es_dueno:
+                raise PermissionDenied("Este ticket no es tuyo.")
+        return ticket
+
+    def get(self, request, pk):
+        ticket = self.get_ticket(request, pk)
+        params = MensajesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        datos = params.validated_data
+
+        if 'since_id' in datos:
+            mensajes = mensajes_nuevos(ticket.id, datos['since_id'])
+        else:
+            mensajes = mensajes_recientes(ticket.id, antes_de_id=datos.get('before_id'))
+
+        ultimo_id = mensajes[-1].id if mensajes else datos.get('since_id')
+        return Response({
+            "mensajes": TicketMessageSerializer(mensajes, many=True).data,
+            "ultimo_id": ultimo_id, # El cliente lo manda como 'since_id' en la siguiente consulta
+        })
+
+    def post(self, request, pk):
+        ticket = self.get_ticket(request, pk)
+        if ticket.status == SupportTicket.TicketStatus.CLOSED:
+            return Response({"error": "El ticket está cerrado."}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = TicketMessageSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        mensaje = serializer.save(ticket=ticket, sender=get_db_user(request.user))
+        return Response(TicketMessageSerializer(mensaje).data, status=status.HTTP_201_CREATED)
+
+
+_mensajes_ticket_view = MensajesTicketView.as_view()
+
+
+def _quiere_esperar(request):
+    """Los segundos de long-polling que pide la petición (0 si no espera)."""
+    if request.method != 'GET':
+        return 0
+    params = MensajesQuerySerializer(data=request.GET)
+    if not params.is_valid() or 'since_id' not in params.validated_data:
+        return 0  # Los errores los responde la vista normal
+    return min(params.validated_data['wait'], ESPERA_MAXIMA)
+
+
+def _sin_mensajes(respuesta):
+    return respuesta.status_code == status.HTTP_200_OK and not respuesta.data['mensajes']
+
+
+@csrf_exempt
+async def mensajes_ticket(request, pk):
+    """
+    La URL del chat. Sin long-polling es MensajesTicketView tal cual. Con
+    ?since_id=N&wait=S, si no hay mensajes nuevos espera el aviso del
+    ticket en el event loop (no bloquea un hilo del worker mientras tanto)
+    y vuelve a preguntarle a la vista. Los permisos y el formato de la
+    respuesta son siempre los de MensajesTicketView.
+    """
+    vista = sync_to_async(_mensajes_ticket_view)
+    espera = _quiere_esperar(request)
+    if not espera:
+        return await vista(request, pk=pk)
+
+    limite_tiempo = time.monotonic() + espera
+    suscripcion = await suscribirse_al_ticket(pk)
+    try:
+        while True:
+            respuesta = await vista(request, pk=pk)
+            restante = limite_tiempo - time.monotonic()
+            if not _sin_mensajes(respuesta) or restante <= 0:
+                return respuesta
+            await esperar_aviso(suscripcion, min(restante, INTERVALO_SONDEO))
+    finally:
+        await suscripcion.close()
+
+
+# ---------------------------------------------------------------------------
+# VISTA 3: BUSCAR TICKETS (AGENTES)
+# /api/support/buscar/?q=...
+# ---------------------------------------------------------------------------
+class BuscarTicketsView(APIView):
+    """
+    Busca en el asunto y en los mensajes de los tickets y los devuelve del
+    más relevante al menos relevante (índices FULLTEXT, ver support/search.py).
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        texto = request.query_params.get('q', '').strip()
+        if not texto:
+            return Response({"error": "Falta el texto a buscar (?q=...)."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"results": TicketBusquedaSerializer(search_tickets(texto), many=True).data})
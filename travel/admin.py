@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Viaje
+from .models import Viaje, OfertaViaje, TarifaDinamica
 
 # Register your models here.
 
@@ -13,4 +13,16 @@ class ViajeAdmin(admin.ModelAdmin):
     # No dejar editar todo en la lista
     readonly_fields = ('created_at', 'updated_at')
 
-admin.site.register(Viaje, ViajeAdmin)
\ No newline at end of file
+class OfertaViajeAdmin(admin.ModelAdmin):
+    list_display = ('viaje', 'conductor', 'orden', 'distancia_km', 'created_at')
+    list_select_related = ('viaje__pasajero', 'conductor__user')
+    readonly_fields = ('viaje', 'conductor', 'created_at')
+
+class TarifaDinamicaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'celda', 'multiplicador', 'updated_at')
+    search_fields = ('nombre', 'celda')
+    readonly_fields = ('celda', 'updated_at')
+
+admin.site.register(Viaje, ViajeAdmin)
+admin.site.register(OfertaViaje, OfertaViajeAdmin)
+admin.site.register(TarifaDinamica, TarifaDinamicaAdmin)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class TravelConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'travel'
+
+    # Carga los "signals" (recargan las tarifas dinámicas al editarlas)
+    def ready(self):
+        import travel.signals
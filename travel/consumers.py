@@ -0,0 +1,173 @@
+"""
+Websocket del viaje: el pasajero y el conductor reciben al instante los
+cambios de estado del viaje y la ubicación del conductor, sin preguntar
+cada pocos segundos a la API.
+
+    ws://<host>/ws/viajes/<id>/?token=<access token JWT>
+
+Es una aplicación ASGI "pura" (no hace falta Django Channels): ver
+backend_project/asgi.py. Al conectarse se suscribe al canal del viaje y
+recién entonces envía el estado actual (así no se pierde un cambio que
+llegue justo en medio); después, cada mensaje publicado en los canales del viaje (ver
+backend_project/realtime.py). Los mensajes son JSON:
+
+    {"tipo": "estado", "viaje": 15, "estado": "ACEPTADO", "conductor": 7}
+    {"tipo": "ubicacion", "conductor": 7, "lat": -6.03, "lng": -76.97, "ts": "..."}
+
+Cuando el viaje termina (FINALIZADO o CANCELADO) se cierra la conexión.
+Una conexión sin mensajes no consume CPU: solo espera en el event loop.
+"""
+import asyncio
+import json
+import logging
+import re
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from backend_project.realtime import canal_conductor, canal_viaje, get_broker
+from users.authentication import StatelessJWTAuthentication
+from .models import Viaje
+
+logger = logging.getLogger(__name__)
+
+RUTA_VIAJE = re.compile(r'^/ws/viajes/(?P<viaje_id>\d+)/?$')
+ESTADOS_FINALES = {Viaje.EstadoViaje.FINALIZADO, Viaje.EstadoViaje.CANCELADO}
+
+# Códigos de cierre (4000-4999 son para la aplicación)
+CIERRE_NORMAL = 1000
+CIERRE_NO_AUTORIZADO = 4401
+CIERRE_PROHIBIDO = 4403
+CIERRE_NO_ENCONTRADO = 4404
+
+
+def _usuario_del_token(token):
+    """El User del access token (mismas reglas que la API), o None si no es válido."""
+    autenticacion = StatelessJWTAuthentication()
+    try:
+        return autenticacion.get_user(autenticacion.get_validated_token(token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+def _estado_inicial(viaje_id, user_id):
+    """El estado del viaje si el usuario es su pasajero o conductor, o None."""
+    return (
+        Viaje.objects.filter(pk=viaje_id)
+        .filter(Q(pasajero__user_id=user_id) | Q(conductor__user_id=user_id))
+        .values('id', 'estado', 'conductor_id', 'conductor__current_latitude', 'conductor__current_longitude')
+        .first()
+    )
+
+
+async def _enviar(send, mensaje):
+    await send({'type': 'websocket.send', 'text': json.dumps(mensaje, default=str)})
+
+
+async def transmitir(viaje_id, conductor_id, receive, send, broker=None, suscripcion_viaje=None):
+    """
+    Reenvía al cliente los mensajes del viaje (y de su conductor, si ya tiene)
+    hasta que el cliente se desconecte o el viaje termine.
+    Si el viaje recibe conductor mientras tanto, se suscribe también a él.
+    'suscripcion_viaje': la del canal del viaje, si ya se hizo antes.
+    """
+    if broker is None:
+        broker = get_broker()
+    suscripciones = [suscripcion_viaje or broker.subscribe([canal_viaje(viaje_id)])]
+    if conductor_id:
+        suscripciones.append(broker.subscribe([canal_conductor(conductor_id)]))
+    esperando = {asyncio.ensure_future(s.get()): s for s in suscripciones}
+    cliente = asyncio.ensure_future(receive())
+    try:
+        while True:
+            listos, _ = await asyncio.wait([cliente, *esperando], return_when=asyncio.FIRST_COMPLETED)
+            for tarea in listos:
+                if tarea is cliente:
+                    continue
+                suscripcion = esperando.pop(tarea)
+                mensaje = tarea.result()
+                await _enviar(send, mensaje)
+                esperando[asyncio.ensure_future(suscripcion.get())] = suscripcion
+
+                if mensaje.get('tipo') != 'estado':
+                    continue
+                if mensaje['estado'] in ESTADOS_FINALES:
+                    await send({'type': 'websocket.close', 'code': CIERRE_NORMAL})
+                    return
+                if mensaje.get('conductor') and not conductor_id:
+                    conductor_id = mensaje['conductor']
+                    nueva = broker.subscribe([canal_conductor(conductor_id)])
+                    suscripciones.append(nueva)
+                    esperando[asyncio.ensure_future(nueva.get())] = nueva
+
+            if cliente in listos:
+                # El cliente no manda nada útil (a lo sumo pings): solo nos importa si se fue
+                if cliente.result()['type'] == 'websocket.disconnect':
+                    return
+                cliente = asyncio.ensure_future(receive())
+    finally:
+        for tarea in (cliente, *esperando):
+            tarea.cancel()
+        for suscripcion in suscripciones:
+            await suscripcion.close()
+
+
+async def viaje_websocket(scope, receive, send, viaje_id):
+    """Atiende una conexión a /ws/viajes/<id>/."""
+    evento = await receive()
+    if evento['type'] != 'websocket.connect':
+        return
+
+    token = parse_qs(scope.get('query_string', b'').decode()).get('token', [''])[0]
+    usuario = await sync_to_async(_usuario_del_token)(token) if token else None
+    if usuario is None:
+        await send({'type': 'websocket.close', 'code': CIERRE_NO_AUTORIZADO})
+        return
+
+    # Primero nos suscribimos y DESPUÉS leemos el estado: un cambio publicado
+    # entre las dos cosas llega por la suscripción (si no, se perdería; y si
+    # era FINALIZADO o CANCELADO, el socket quedaría abierto)
+    broker = get_broker()
+    suscripcion = broker.subscribe([canal_viaje(viaje_id)])
+    transmitiendo = False
+    try:
+        await suscripcion.listo()
+        viaje = await sync_to_async(_estado_inicial)(viaje_id, usuario.id)
+        if viaje is None:
+            # No existe o no es suyo: no le decimos cuál de las dos
+            logger.info(f"Websocket del viaje #{viaje_id} rechazado para el usuario {usuario.id}")
+            await send({'type': 'websocket.close', 'code': CIERRE_PROHIBIDO})
+            return
+
+        await send({'type': 'websocket.accept'})
+        await _enviar(send, {
+            'tipo': 'estado', 'viaje': viaje['id'], 'estado': viaje['estado'], 'conductor': viaje['conductor_id'],
+        })
+        if viaje['conductor__current_latitude'] is not None:
+            await _enviar(send, {
+                'tipo': 'ubicacion', 'conductor': viaje['conductor_id'],
+                'lat': float(viaje['conductor__current_latitude']),
+                'lng': float(viaje['conductor__current_longitude']),
+                'ts': None,
+            })
+        if viaje['estado'] in ESTADOS_FINALES:
+            await send({'type': 'websocket.close', 'code': CIERRE_NORMAL})
+            return
+
+        transmitiendo = True  # Desde aquí transmitir() cierra la suscripción
+        await transmitir(viaje_id, viaje['conductor_id'], receive, send, broker=broker, suscripcion_viaje=suscripcion)
+    finally:
+        if not transmitiendo:
+            await suscripcion.close()
+
+
+async def websocket_application(scope, receive, send):
+    """Enruta las conexiones websocket según la ruta."""
+    ruta = RUTA_VIAJE.match(scope['path'])
+    if ruta is None:
+        await receive()  # websocket.connect
+        await send({'type': 'websocket.close', 'code': CIERRE_NO_ENCONTRADO})
+        return
+    await viaje_websocket(scope, receive, send, int(ruta['viaje_id']))
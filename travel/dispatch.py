@@ -0,0 +1,104 @@
+"""
+Despacho de viajes: ofrecer un viaje BUSCANDO a los conductores cercanos
+y asignarlo al primero que acepte.
+
+La asignación es un único UPDATE condicional:
+
+    UPDATE travel_viaje SET conductor_id = X, estado = 'ACEPTADO'
+    WHERE id = V AND estado = 'BUSCANDO' AND conductor_id IS NULL
+
+La base de datos garantiza que solo una de varias aceptaciones simultáneas
+modifica la fila (las demás ven 0 filas afectadas), sin bloquear tablas ni
+hacer "leer, modificar y guardar" en Python.
+
+Ese UPDATE protege al viaje, pero no al conductor: con ofertas de varios
+viajes podría ganarlos todos a la vez. Por eso, en la misma transacción,
+antes se bloquea la fila de su perfil (SELECT ... FOR UPDATE) y se revisa
+que no tenga ya un viaje en curso.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+
+from users.geo import nearest_available_drivers
+from users.models import UserProfile
+from .models import Viaje, OfertaViaje
+
+# Estados en los que un conductor está ocupado con un viaje
+ESTADOS_ACTIVOS = (
+    Viaje.EstadoViaje.ACEPTADO,
+    Viaje.EstadoViaje.EN_CAMINO,
+    Viaje.EstadoViaje.EN_PROGRESO,
+)
+
+
+def rank_drivers(lat, lng, radius=None, k=None, exclude=()):
+    """
+    Conductores en línea más cercanos a (lat, lng) que no tienen un viaje
+    en curso. Devuelve una lista de (profile_id, distancia_km).
+    """
+    radius = radius or getattr(settings, 'DISPATCH_RADIUS_KM', 5.0)
+    k = k or getattr(settings, 'DISPATCH_MAX_OFFERS', 5)
+
+    # Pedimos algunos de más por si varios están ocupados
+    candidatos = nearest_available_drivers(lat, lng, radius=radius, k=k * 2, exclude=exclude)
+    if not candidatos:
+        return []
+    ocupados = set(
+        Viaje.objects.filter(
+            conductor_id__in=[pid for pid, _ in candidatos],
+            estado__in=ESTADOS_ACTIVOS,
+        ).values_list('conductor_id', flat=True)
+    )
+    return [c for c in candidatos if c[0] not in ocupados][:k]
+
+
+def dispatch_trip(viaje, radius=None, k=None):
+    """
+    Ofrece un viaje BUSCANDO a los conductores mejor rankeados.
+    Crea las ofertas en un solo INSERT y devuelve la lista de ofertas.
+    """
+    if viaje.estado != Viaje.EstadoViaje.BUSCANDO:
+        return []
+    # No volvemos a ofrecerle el viaje a quien ya lo recibió
+    ya_ofrecidos = set(viaje.ofertas.values_list('conductor_id', flat=True))
+    ranking = rank_drivers(viaje.origen_lat, viaje.origen_lng, radius, k, exclude=ya_ofrecidos)
+
+    inicio = len(ya_ofrecidos)
+    ofertas = [
+        OfertaViaje(viaje=viaje, conductor_id=profile_id, orden=inicio + i, distancia_km=round(distancia, 3))
+        for i, (profile_id, distancia) in enumerate(ranking, start=1)
+    ]
+    return OfertaViaje.objects.bulk_create(ofertas, ignore_conflicts=True)
+
+
+def accept_trip(viaje_id, conductor_id, require_offer=True):
+    """
+    El conductor acepta el viaje. Devuelve True si lo ganó, False si otro
+    conductor lo tomó antes (o el viaje ya no está BUSCANDO), o si el
+    conductor ya tiene otro viaje en curso.
+    Con require_offer=True solo puede aceptarlo un conductor al que se le
+    ofreció (la condición va dentro del mismo UPDATE).
+    """
+    condiciones = [Q(conductor__isnull=True)]
+    if require_offer:
+        condiciones.append(
+            Exists(OfertaViaje.objects.filter(viaje=OuterRef('pk'), conductor_id=conductor_id))
+        )
+    with transaction.atomic():
+        # Las aceptaciones del mismo conductor (de viajes distintos) se hacen de a una
+        list(UserProfile.objects.select_for_update().filter(pk=conductor_id).values_list('pk', flat=True))
+        if Viaje.objects.filter(conductor_id=conductor_id, estado__in=ESTADOS_ACTIVOS).exists():
+            return False
+        ganado = Viaje.transicionar(
+            viaje_id,
+            Viaje.EstadoViaje.ACEPTADO,
+            *condiciones,
+            desde=Viaje.EstadoViaje.BUSCANDO,
+            conductor_id=conductor_id,
+        ) == 1
+
+        if ganado:
+            # El viaje ya tiene dueño: las demás ofertas sobran
+            OfertaViaje.objects.filter(viaje_id=viaje_id).delete()
+    return ganado
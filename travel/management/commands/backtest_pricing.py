@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from travel.models import Viaje
+from travel.pricing import backtest_pricing
+
+
+class Command(BaseCommand):
+    help = "Compara la fórmula de tarifas actual contra el precio final de los viajes finalizados."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help="Solo viajes creados desde esta fecha (AAAA-MM-DD)")
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        viajes = Viaje.objects.filter(estado=Viaje.EstadoViaje.FINALIZADO)
+        if options['since']:
+            viajes = viajes.filter(created_at__date__gte=options['since'])
+
+        resumen = backtest_pricing(viajes, chunk_size=options['chunk_size'])
+        if not resumen['viajes']:
+            self.stdout.write("No hay viajes finalizados con precio final.")
+            return
+        self.stdout.write(f"Viajes comparados:      {resumen['viajes']}")
+        self.stdout.write(f"Error absoluto medio:   S/ {resumen['error_absoluto_medio']}")
+        self.stdout.write(f"Sesgo medio:            S/ {resumen['sesgo_medio']} (positivo = cobra de más)")
@@ -0,0 +1,44 @@
+import random
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from travel.pricing import estimate_fare, estimate_fares
+
+
+class Command(BaseCommand):
+    help = "Compara la cotización viaje por viaje (Decimal) contra la cotización vectorizada (NumPy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--routes', type=int, default=500, help="Rutas por lote")
+        parser.add_argument('--repeat', type=int, default=20, help="Veces que se repite cada lote")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rutas = [
+            (-6.03 + rng.uniform(-0.1, 0.1), -76.97 + rng.uniform(-0.1, 0.1),
+             -6.03 + rng.uniform(-0.1, 0.1), -76.97 + rng.uniform(-0.1, 0.1))
+            for _ in range(options['routes'])
+        ]
+        repetir = options['repeat']
+
+        inicio = time.perf_counter()
+        for _ in range(repetir):
+            escalares = [estimate_fare(*r)[1] for r in rutas]
+        t_escalar = (time.perf_counter() - inicio) / repetir
+
+        matriz = np.array(rutas)
+        inicio = time.perf_counter()
+        for _ in range(repetir):
+            _, vectorizados = estimate_fares(matriz)
+        t_vector = (time.perf_counter() - inicio) / repetir
+
+        diferencia = max(abs(float(a) - b) for a, b in zip(escalares, vectorizados))
+
+        self.stdout.write(f"Rutas por lote: {len(rutas)} (promedio de {repetir} repeticiones)")
+        self.stdout.write(f"Decimal, una por una: {t_escalar * 1000:.2f} ms/lote")
+        self.stdout.write(f"NumPy vectorizado:    {t_vector * 1000:.2f} ms/lote")
+        self.stdout.write(f"Aceleración:          x{t_escalar / t_vector:.1f}")
+        self.stdout.write(f"Diferencia máxima:    S/ {diferencia:.2f}")
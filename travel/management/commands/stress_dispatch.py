@@ -0,0 +1,95 @@
+import threading
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from travel.dispatch import accept_trip
+from travel.models import Viaje, OfertaViaje
+from users.models import UserProfile
+
+PREFIJO = 'stress-dispatch-'
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de estrés del despacho: varios hilos (conductores) aceptan los mismos "
+        "viajes a la vez. Verifica que cada viaje tenga un solo ganador y mide "
+        "asignaciones por segundo. Crea datos temporales: ¡usar en staging, no en producción!"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trips', type=int, default=2000, help="Viajes a asignar")
+        parser.add_argument('--drivers', type=int, default=16, help="Conductores (hilos) compitiendo")
+        parser.add_argument('--keep', action='store_true', help="No borrar los datos creados")
+
+    def handle(self, *args, **options):
+        n_viajes, n_conductores = options['trips'], options['drivers']
+        self._limpiar()
+
+        users = User.objects.bulk_create([User(username=f'{PREFIJO}{i}') for i in range(n_conductores + 1)])
+        # El signal de User no corre con bulk_create: creamos los perfiles nosotros
+        perfiles = UserProfile.objects.bulk_create([
+            UserProfile(user=u, full_name=u.username, phone=f'{PREFIJO}{u.id}') for u in users
+        ])
+        pasajero, conductores = perfiles[0], perfiles[1:]
+
+        viajes = Viaje.objects.bulk_create([
+            Viaje(
+                pasajero=pasajero,
+                origen_lat=Decimal('-6.0346'), origen_lng=Decimal('-76.9717'),
+                destino_lat=Decimal('-6.0500'), destino_lng=Decimal('-76.9600'),
+            )
+            for _ in range(n_viajes)
+        ], batch_size=1000)
+        viaje_ids = list(
+            Viaje.objects.filter(pasajero=pasajero).order_by('id').values_list('id', flat=True)
+        )
+        OfertaViaje.objects.bulk_create([
+            OfertaViaje(viaje_id=vid, conductor=c, orden=i, distancia_km=0.5)
+            for vid in viaje_ids
+            for i, c in enumerate(conductores, start=1)
+        ], batch_size=5000)
+
+        barrera = threading.Barrier(len(conductores))
+        victorias = {c.id: 0 for c in conductores}
+
+        def conductor(conductor_id):
+            try:
+                barrera.wait()
+                for vid in viaje_ids:
+                    if accept_trip(vid, conductor_id):
+                        victorias[conductor_id] += 1
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=conductor, args=(c.id,)) for c in conductores]
+        inicio = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        duracion = time.perf_counter() - inicio
+
+        asignados = sum(victorias.values())
+        en_bd = Viaje.objects.filter(id__in=viaje_ids, estado=Viaje.EstadoViaje.ACEPTADO, conductor__isnull=False).count()
+        intentos = len(viaje_ids) * len(conductores)
+
+        self.stdout.write(f"Viajes: {len(viaje_ids)} | Conductores compitiendo: {len(conductores)}")
+        self.stdout.write(f"Intentos de aceptación: {intentos} en {duracion:.2f} s ({intentos / duracion:.0f}/s)")
+        self.stdout.write(f"Asignaciones: {asignados} ({asignados / duracion:.0f}/s)")
+        if asignados == en_bd == len(viaje_ids):
+            self.stdout.write(self.style.SUCCESS("Cada viaje tiene exactamente un conductor."))
+        else:
+            self.stdout.write(self.style.ERROR(
+                f"¡Inconsistencia! Ganadores reportados: {asignados}, asignados en BD: {en_bd}"
+            ))
+
+        if not options['keep']:
+            self._limpiar()
+
+    def _limpiar(self):
+        Viaje.objects.filter(pasajero__user__username__startswith=PREFIJO).delete()
+        User.objects.filter(username__startswith=PREFIJO).delete()
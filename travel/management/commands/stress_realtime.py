@@ -0,0 +1,111 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from backend_project.realtime import InMemoryBroker, canal_viaje
+from travel.consumers import transmitir
+from travel.models import Viaje
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga de los websockets de viajes: abre miles de conexiones "
+        "inactivas en este proceso (por la interfaz ASGI, con el broker en memoria), "
+        "mide su memoria y su consumo de CPU en reposo, y cuánto tarda en llegar "
+        "un cambio de estado a todas. No toca la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000, help="Conexiones abiertas a la vez")
+        parser.add_argument('--rounds', type=int, default=5, help="Rondas de mensajes (uno por conexión)")
+        parser.add_argument('--idle-seconds', type=float, default=2.0, help="Segundos en reposo para medir la CPU")
+        parser.add_argument('--poll-interval', type=float, default=3.0,
+                            help="Cada cuántos segundos preguntaría un cliente con polling (para comparar)")
+
+    def handle(self, *args, **options):
+        asyncio.run(self._prueba(options))
+
+    async def _prueba(self, options):
+        n, rondas = options['connections'], options['rounds']
+        broker = InMemoryBroker()
+        desconectar = asyncio.Event()
+        entregados, latencias = [0], []
+        ronda_completa = asyncio.Event()
+
+        async def receive():
+            # Un cliente inactivo: no manda nada hasta desconectarse
+            await desconectar.wait()
+            return {'type': 'websocket.disconnect'}
+
+        async def send(evento):
+            mensaje = json.loads(evento['text'])
+            latencias.append(time.perf_counter() - mensaje['enviado'])
+            entregados[0] += 1
+            if entregados[0] == n:
+                ronda_completa.set()
+
+        # --- Abrir las conexiones ---
+        tracemalloc.start()
+        memoria_antes = tracemalloc.get_traced_memory()[0]
+        inicio = time.perf_counter()
+        conexiones = [
+            asyncio.ensure_future(transmitir(viaje_id, viaje_id, receive, send, broker=broker))
+            for viaje_id in range(1, n + 1)
+        ]
+        await asyncio.sleep(0)  # Que todas lleguen a suscribirse
+        while len(broker) < 2 * n:
+            await asyncio.sleep(0.01)
+        apertura = time.perf_counter() - inicio
+        memoria = tracemalloc.get_traced_memory()[0] - memoria_antes
+        tracemalloc.stop()
+
+        # --- En reposo ---
+        cpu = time.process_time()
+        await asyncio.sleep(options['idle_seconds'])
+        cpu_reposo = time.process_time() - cpu
+
+        # --- Rondas: un hilo (como una vista síncrona) publica un cambio por viaje ---
+        def publicar():
+            for viaje_id in range(1, n + 1):
+                broker.publish(canal_viaje(viaje_id), {
+                    'tipo': 'estado', 'viaje': viaje_id, 'estado': Viaje.EstadoViaje.EN_CAMINO,
+                    'conductor': viaje_id, 'enviado': time.perf_counter(),
+                })
+
+        duraciones = []
+        for _ in range(rondas):
+            entregados[0] = 0
+            ronda_completa.clear()
+            inicio = time.perf_counter()
+            threading.Thread(target=publicar).start()
+            await ronda_completa.wait()
+            duraciones.append(time.perf_counter() - inicio)
+
+        # --- Cerrar todo ---
+        desconectar.set()
+        await asyncio.gather(*conexiones)
+
+        latencias.sort()
+        self.stdout.write(f"Conexiones: {n} | abiertas en {apertura:.2f} s")
+        self.stdout.write(f"Memoria: {memoria / 1024 / 1024:.1f} MB ({memoria / n / 1024:.1f} KB por conexión)")
+        self.stdout.write(
+            f"CPU en reposo: {cpu_reposo * 1000:.0f} ms en {options['idle_seconds']:.1f} s "
+            f"(con polling cada {options['poll_interval']:.0f} s serían {n / options['poll_interval']:.0f} peticiones/s a la API)"
+        )
+        self.stdout.write(
+            f"Entrega a todas las conexiones: {statistics.median(duraciones) * 1000:.0f} ms por ronda "
+            f"({n / statistics.median(duraciones):.0f} mensajes/s)"
+        )
+        self.stdout.write(
+            f"Latencia por mensaje: p50 {latencias[len(latencias) // 2] * 1000:.1f} ms | "
+            f"p99 {latencias[int(len(latencias) * 0.99)] * 1000:.1f} ms"
+        )
+        if len(broker) == 0:
+            self.stdout.write(self.style.SUCCESS("Todas las suscripciones se cerraron."))
+        else:
+            self.stdout.write(self.style.ERROR(f"¡Quedaron {len(broker)} suscripciones abiertas!"))
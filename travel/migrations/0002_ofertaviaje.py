@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0001_initial'),
+        ('users', '0005_userprofile_grid_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfertaViaje',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orden', models.PositiveSmallIntegerField(verbose_name='Orden en el Ranking')),
+                ('distancia_km', models.FloatField(verbose_name='Distancia al Origen (km)')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('conductor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ofertas_recibidas', to='users.userprofile')),
+                ('viaje', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ofertas', to='travel.viaje')),
+            ],
+            options={
+                'verbose_name': 'Oferta de Viaje',
+                'verbose_name_plural': 'Ofertas de Viajes',
+                'ordering': ['orden'],
+                'indexes': [models.Index(fields=['conductor', 'created_at'], name='oferta_conductor_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('viaje', 'conductor'), name='oferta_viaje_conductor_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0002_ofertaviaje'),
+        ('users', '0005_userprofile_grid_cell'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='viaje',
+            index=models.Index(fields=['pasajero', 'created_at', 'id'], name='viaje_pasajero_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='viaje',
+            index=models.Index(fields=['conductor', 'created_at', 'id'], name='viaje_conductor_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0003_viaje_historial_indexes'),
+        ('users', '0006_userprofile_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='viaje',
+            name='liquidado_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Fecha de Liquidación'),
+        ),
+        migrations.AddIndex(
+            model_name='viaje',
+            index=models.Index(fields=['estado', 'liquidado_at'], name='viaje_estado_liquidado_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0004_viaje_liquidado_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='viaje',
+            name='descuento',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Descuento'),
+        ),
+    ]
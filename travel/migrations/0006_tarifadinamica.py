@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:23
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0005_viaje_descuento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarifaDinamica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(blank=True, max_length=100, verbose_name='Zona (ej. Plaza de Armas)')),
+                ('latitud', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('longitud', models.DecimalField(decimal_places=6, max_digits=9)),
+                ('celda', models.CharField(editable=False, max_length=24, unique=True, verbose_name='Celda de la Grilla')),
+                ('multiplicador', models.DecimalField(decimal_places=2, max_digits=4, validators=[django.core.validators.MinValueValidator(Decimal('0.01'))], verbose_name='Multiplicador de Tarifa')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Tarifa Dinámica',
+                'verbose_name_plural': 'Tarifas Dinámicas',
+            },
+        ),
+    ]
@@ -1,8 +1,20 @@
-from django.db import models
+from contextlib import nullcontext
+from decimal import Decimal
+
+from django.core.validators import MinValueValidator
+from django.db import models, transaction
+from django.utils import timezone
+from users.geo import clave_celda
 from users.models import UserProfile # <-- ¡Importamos el PERFIL de nuestra app 'usuarios'!
+from backend_project.realtime import canal_viaje, publish
+from promotions.services import release_promo_usages
 
 # Create your models here.
 
+class TransicionInvalida(ValueError):
+    """Se intentó un cambio de estado que la tabla de transiciones no permite."""
+
+
 class Viaje(models.Model):
     # Definimos los "estados" que puede tener un viaje
     # Esto es más limpio que usar strings
@@ -14,6 +26,16 @@ class Viaje(models.Model):
         FINALIZADO = 'FINALIZADO', 'Viaje Finalizado'
         CANCELADO = 'CANCELADO', 'Viaje Cancelado'
 
+    # A qué estados se puede pasar desde cada estado
+    TRANSICIONES = {
+        EstadoViaje.BUSCANDO: {EstadoViaje.ACEPTADO, EstadoViaje.CANCELADO},
+        EstadoViaje.ACEPTADO: {EstadoViaje.EN_CAMINO, EstadoViaje.CANCELADO},
+        EstadoViaje.EN_CAMINO: {EstadoViaje.EN_PROGRESO, EstadoViaje.CANCELADO},
+        EstadoViaje.EN_PROGRESO: {EstadoViaje.FINALIZADO},
+        EstadoViaje.FINALIZADO: set(),
+        EstadoViaje.CANCELADO: set(),
+    }
+
     # --- RELACIONES (QUIÉN) ---
     # Un UserProfile (Pasajero) puede tener muchos viajes
     pasajero = models.ForeignKey(
@@ -53,16 +75,145 @@ class Viaje(models.Model):
     # --- DINERO (CUÁNTO) ---
     precio_estimado = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Precio Estimado")
     precio_final = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, verbose_name="Precio Final")
+    # Descuento del cupón aplicado al pedir el viaje (ver promotions/discounts.py)
+    descuento = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Descuento")
 
     # --- TIEMPO (CUÁNDO) ---
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Fecha de Creación")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última Actualización")
+    # Cuándo se pagó al conductor (ver wallets/settlement.py). Nulo = pendiente.
+    liquidado_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Fecha de Liquidación")
 
     def __str__(self):
         # Esto es para que se vea bonito en el Admin
         return f"Viaje #{self.id} - {self.pasajero.full_name} ({self.get_estado_display()})"
 
+    @classmethod
+    def estados_previos(cls, estado):
+        """Estados desde los que se puede llegar a 'estado'."""
+        return {origen for origen, destinos in cls.TRANSICIONES.items() if estado in destinos}
+
+    @classmethod
+    def transicionar(cls, viaje_id, nuevo_estado, *condiciones, desde=None, **campos):
+        """
+        Cambia el estado de un viaje con UN solo UPDATE condicional
+        (sin cargar el objeto ni reescribir todas sus columnas):
+
+            UPDATE travel_viaje SET estado = <nuevo>, updated_at = ...
+            WHERE id = <id> AND estado IN (<estados previos válidos>) [AND condiciones]
+
+        - desde: estado (o estados) en que esperamos encontrar el viaje.
+          Si no se indica, vale cualquiera que permita llegar a 'nuevo_estado'.
+        - condiciones: filtros extra (Q, Exists...), ej. que sea su conductor.
+        - campos: otras columnas a actualizar en el mismo UPDATE.
+
+        Devuelve las filas afectadas: 1 si se hizo el cambio, 0 si el viaje
+        ya no estaba en un estado válido (ej. otro usuario lo cambió antes).
+        Si se hizo, se publica en el canal del viaje (ver travel/consumers.py),
+        y si se canceló, se devuelve el cupón que usó (en la misma transacción).
+        Lanza TransicionInvalida si la tabla de transiciones no lo permite.
+        """
+        permitidos = cls.estados_previos(nuevo_estado)
+        if desde is not None:
+            desde = {desde} if isinstance(desde, str) else set(desde)
+            if not desde <= permitidos:
+                raise TransicionInvalida(f"No se puede pasar de {', '.join(sorted(desde))} a {nuevo_estado}")
+            permitidos = desde
+        if not permitidos:
+            raise TransicionInvalida(f"Ningún estado puede pasar a {nuevo_estado}")
+
+        cancelar = nuevo_estado == cls.EstadoViaje.CANCELADO
+        with transaction.atomic() if cancelar else nullcontext():
+            filas = cls.objects.filter(*condiciones, pk=viaje_id, estado__in=permitidos).update(
+                estado=nuevo_estado,
+                updated_at=timezone.now(),
+                **campos
+            )
+            if filas and cancelar:
+                release_promo_usages(viaje_id)
+        if filas:
+            # Avisamos a los websockets del viaje (al confirmarse la transacción)
+            publish(canal_viaje(viaje_id), {
+                'tipo': 'estado', 'viaje': viaje_id, 'estado': nuevo_estado,
+                'conductor': campos.get('conductor_id'),
+            })
+        return filas
+
     class Meta:
         verbose_name = "Viaje"
         verbose_name_plural = "Viajes"
-        ordering = ['-created_at'] # Los viajes más nuevos primero
\ No newline at end of file
+        ordering = ['-created_at'] # Los viajes más nuevos primero
+        indexes = [
+            # Historial "mis viajes" (paginado por created_at, id)
+            models.Index(fields=['pasajero', 'created_at', 'id'], name='viaje_pasajero_created_idx'),
+            models.Index(fields=['conductor', 'created_at', 'id'], name='viaje_conductor_created_idx'),
+            # Viajes finalizados pendientes de liquidar
+            models.Index(fields=['estado', 'liquidado_at'], name='viaje_estado_liquidado_idx'),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# MODELO 2: OFERTA DE VIAJE
+# (A qué conductores cercanos se les "ofreció" un viaje que está BUSCANDO)
+# ---------------------------------------------------------------------------
+class OfertaViaje(models.Model):
+    viaje = models.ForeignKey(
+        Viaje,
+        on_delete=models.CASCADE, # Si se borra el viaje, sus ofertas ya no sirven
+        related_name="ofertas"
+    )
+    conductor = models.ForeignKey(
+        UserProfile,
+        on_delete=models.CASCADE,
+        related_name="ofertas_recibidas"
+    )
+    # Posición en el ranking (1 = el más cercano) y distancia al origen
+    orden = models.PositiveSmallIntegerField(verbose_name="Orden en el Ranking")
+    distancia_km = models.FloatField(verbose_name="Distancia al Origen (km)")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Oferta del Viaje #{self.viaje_id} al conductor #{self.conductor_id}"
+
+    class Meta:
+        verbose_name = "Oferta de Viaje"
+        verbose_name_plural = "Ofertas de Viajes"
+        ordering = ['orden']
+        constraints = [
+            models.UniqueConstraint(fields=['viaje', 'conductor'], name='oferta_viaje_conductor_unica'),
+        ]
+        indexes = [
+            # "Mis ofertas" del conductor
+            models.Index(fields=['conductor', 'created_at'], name='oferta_conductor_created_idx'),
+        ]
+
+
+# ---------------------------------------------------------------------------
+# MODELO 3: TARIFA DINÁMICA POR ZONA
+# (El multiplicador de precio de una celda de la grilla, ej. 1.5 en el centro a la hora punta)
+# ---------------------------------------------------------------------------
+class TarifaDinamica(models.Model):
+    nombre = models.CharField(max_length=100, blank=True, verbose_name="Zona (ej. Plaza de Armas)")
+    # Cualquier punto dentro de la zona: la celda se calcula al guardar
+    latitud = models.DecimalField(max_digits=9, decimal_places=6)
+    longitud = models.DecimalField(max_digits=9, decimal_places=6)
+    celda = models.CharField(max_length=24, unique=True, editable=False, verbose_name="Celda de la Grilla")
+    multiplicador = models.DecimalField(
+        max_digits=4, decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.01'))],
+        verbose_name="Multiplicador de Tarifa",
+    )
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre or self.celda}: x{self.multiplicador}"
+
+    def save(self, *args, **kwargs):
+        self.celda = clave_celda(self.latitud, self.longitud)
+        super().save(*args, **kwargs)
+
+    class Meta:
+        verbose_name = "Tarifa Dinámica"
+        verbose_name_plural = "Tarifas Dinámicas"
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class HistorialCursorPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) para historiales.
+    En vez de OFFSET, cada página continúa desde el último (created_at, id)
+    que se vio, así la página 500 cuesta lo mismo que la página 1.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,179 @@
+"""
+Cálculo de tarifas de viajes.
+
+    precio = max(TARIFA_MINIMA, TARIFA_BASE + TARIFA_POR_KM * km) * multiplicador
+
+'km' es la distancia en línea recta (haversine) multiplicada por
+FACTOR_DISTANCIA_RUTA, para aproximar lo que se recorre por las calles.
+El multiplicador ("tarifa dinámica") depende de la celda de la grilla
+donde empieza el viaje. Se configura en el admin (modelo TarifaDinamica) y
+cada worker tiene la tabla en memoria, que recarga cada
+SURGE_REFRESH_SECONDS (al momento si se editó en ese mismo worker).
+
+Hay dos caminos que dan el mismo resultado:
+  - estimate_fare(): un viaje, con Decimal (para guardar en la BD).
+  - estimate_fares(): muchas rutas a la vez con NumPy (pantalla "elige tu
+    viaje" y back-testing contra viajes históricos).
+"""
+import threading
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+from django.conf import settings
+
+from users.geo import RADIO_TIERRA_KM, TAMANO_CELDA_GRADOS, celda_de, haversine_km
+from .models import TarifaDinamica
+
+CENTIMO = Decimal('0.01')
+
+
+def _tarifa(nombre, default):
+    return Decimal(str(getattr(settings, nombre, default)))
+
+
+def tarifas():
+    """Parámetros de tarifa vigentes (se leen de settings)."""
+    return {
+        'base': _tarifa('TARIFA_BASE', '3.00'),
+        'por_km': _tarifa('TARIFA_POR_KM', '1.20'),
+        'minima': _tarifa('TARIFA_MINIMA', '5.00'),
+        'factor_ruta': _tarifa('FACTOR_DISTANCIA_RUTA', '1.30'),
+    }
+
+
+# ---------------------------------------------------------------------------
+# TARIFA DINÁMICA POR CELDA
+# ---------------------------------------------------------------------------
+class SurgeTable:
+    """
+    Multiplicadores de tarifa por celda de la grilla: {(fila, columna): 1.5}.
+    Las celdas que no están en la tabla usan 1.0.
+    """
+
+    def __init__(self):
+        self._multiplicadores = {}
+        self._lock = threading.Lock()
+        self.cargado_en = None
+
+    def replace(self, multiplicadores):
+        """Reemplaza toda la tabla: {(fila, columna): multiplicador}."""
+        nueva = {tuple(celda): Decimal(str(m)) for celda, m in multiplicadores.items()}
+        with self._lock:
+            self._multiplicadores = nueva
+            self.cargado_en = time.monotonic()
+
+    def invalidar(self):
+        """La próxima cotización recarga desde la BD (ej. se editó una tarifa en este worker)."""
+        self.cargado_en = None
+
+    def get(self, lat, lng):
+        return self._multiplicadores.get(celda_de(lat, lng), Decimal('1'))
+
+    def get_many(self, lats, lngs):
+        """Multiplicadores (array float) para muchos orígenes a la vez."""
+        multiplicadores = np.ones(len(lats))
+        tabla = self._multiplicadores
+        if not tabla:
+            return multiplicadores
+        celdas = np.stack(
+            [np.floor(lats / TAMANO_CELDA_GRADOS), np.floor(lngs / TAMANO_CELDA_GRADOS)], axis=1
+        ).astype(np.int64)
+        # Buscamos cada celda distinta una sola vez
+        unicas, inversa = np.unique(celdas, axis=0, return_inverse=True)
+        por_celda = np.array([float(tabla.get((int(f), int(c)), 1)) for f, c in unicas])
+        return por_celda[inversa.reshape(-1)]
+
+
+surge_table = SurgeTable()
+
+
+def refresh_surge_table(force=False):
+    """Recarga los multiplicadores si nunca se cargaron o si la tabla ya está "vieja"."""
+    segundos = getattr(settings, 'SURGE_REFRESH_SECONDS', 60)
+    cargado_en = surge_table.cargado_en
+    if force or cargado_en is None or time.monotonic() - cargado_en > segundos:
+        surge_table.replace({
+            tuple(int(x) for x in celda.split(':')): multiplicador
+            for celda, multiplicador in TarifaDinamica.objects.values_list('celda', 'multiplicador')
+        })
+
+
+# ---------------------------------------------------------------------------
+# UN VIAJE (DECIMAL)
+# ---------------------------------------------------------------------------
+def estimate_fare(origen_lat, origen_lng, destino_lat, destino_lng):
+    """
+    Devuelve (distancia_km, precio) como Decimal para un solo viaje.
+    """
+    t = tarifas()
+    refresh_surge_table()
+    km = Decimal(str(haversine_km(
+        float(origen_lat), float(origen_lng), float(destino_lat), float(destino_lng)
+    ))) * t['factor_ruta']
+    precio = max(t['minima'], t['base'] + t['por_km'] * km) * surge_table.get(origen_lat, origen_lng)
+    return km.quantize(Decimal('0.001'), ROUND_HALF_UP), precio.quantize(CENTIMO, ROUND_HALF_UP)
+
+
+# ---------------------------------------------------------------------------
+# MUCHAS RUTAS A LA VEZ (NUMPY)
+# ---------------------------------------------------------------------------
+def haversine_km_array(lat1, lng1, lat2, lng2):
+    """Haversine vectorizado: recibe arrays (en grados) y devuelve km."""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(a))
+
+
+def estimate_fares(rutas):
+    """
+    Cotiza muchas rutas en una sola pasada vectorizada.
+    'rutas' es un array (o lista) de filas [origen_lat, origen_lng, destino_lat, destino_lng].
+    Devuelve dos arrays: distancias_km y precios (redondeados a céntimos).
+    """
+    rutas = np.asarray(rutas, dtype=float).reshape(-1, 4)
+    t = {k: float(v) for k, v in tarifas().items()}
+    km = haversine_km_array(rutas[:, 0], rutas[:, 1], rutas[:, 2], rutas[:, 3]) * t['factor_ruta']
+    precios = np.maximum(t['minima'], t['base'] + t['por_km'] * km)
+    refresh_surge_table()
+    precios *= surge_table.get_many(rutas[:, 0], rutas[:, 1])
+    # Sumamos un épsilon para redondear "mitad hacia arriba" como Decimal
+    return np.round(km, 3), np.floor(precios * 100 + 0.5 + 1e-9) / 100
+
+
+def _por_lotes(filas, tamano):
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def backtest_pricing(viajes, chunk_size=10000):
+    """
+    Compara el precio que hubiera dado la fórmula actual contra el
+    'precio_final' real de viajes históricos, por lotes.
+    Devuelve un resumen: cantidad, error absoluto medio, y sesgo medio
+    (positivo = la fórmula cobra de más).
+    """
+    filas = viajes.filter(precio_final__isnull=False).values_list(
+        'origen_lat', 'origen_lng', 'destino_lat', 'destino_lng', 'precio_final'
+    ).iterator(chunk_size=chunk_size)
+
+    total, suma_error_abs, suma_error = 0, 0.0, 0.0
+    for lote in _por_lotes(filas, chunk_size):
+        datos = np.array(lote, dtype=float)
+        _, estimados = estimate_fares(datos[:, :4])
+        diferencia = estimados - datos[:, 4]
+        total += len(lote)
+        suma_error_abs += float(np.abs(diferencia).sum())
+        suma_error += float(diferencia.sum())
+
+    return {
+        'viajes': total,
+        'error_absoluto_medio': round(suma_error_abs / total, 2) if total else None,
+        'sesgo_medio': round(suma_error / total, 2) if total else None,
+    }
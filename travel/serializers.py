@@ -0,0 +1,103 @@
+from rest_framework import serializers
+from .models import Viaje, OfertaViaje
+
+
+class ViajeSerializer(serializers.ModelSerializer):
+    """
+    Serializador para MOSTRAR un viaje.
+    """
+    class Meta:
+        model = Viaje
+        fields = (
+            'id',
+            'estado',
+            'pasajero',
+            'conductor',
+            'origen_lat', 'origen_lng', 'origen_direccion',
+            'destino_lat', 'destino_lng', 'destino_direccion',
+            'precio_estimado',
+            'descuento',
+            'precio_final',
+            'created_at',
+        )
+        read_only_fields = fields
+
+
+class ViajePasajeroSerializer(ViajeSerializer):
+    """
+    Un viaje en el historial del PASAJERO (mostramos quién lo llevó).
+    """
+    conductor_nombre = serializers.CharField(source='conductor.full_name', default=None, read_only=True)
+
+    class Meta(ViajeSerializer.Meta):
+        fields = ViajeSerializer.Meta.fields + ('conductor_nombre',)
+        read_only_fields = fields
+
+
+class ViajeConductorSerializer(ViajeSerializer):
+    """
+    Un viaje en el historial del CONDUCTOR (mostramos a quién llevó).
+    """
+    pasajero_nombre = serializers.CharField(source='pasajero.full_name', default=None, read_only=True)
+
+    class Meta(ViajeSerializer.Meta):
+        fields = ViajeSerializer.Meta.fields + ('pasajero_nombre',)
+        read_only_fields = fields
+
+
+class ViajeCreateSerializer(serializers.ModelSerializer):
+    """
+    Serializador para que el pasajero PIDA un viaje.
+    Solo recibe el origen, el destino y (opcional) un cupón; el resto lo pone el servidor.
+    """
+    promo_code = serializers.CharField(max_length=50, required=False, write_only=True)
+
+    class Meta:
+        model = Viaje
+        fields = (
+            'origen_lat', 'origen_lng', 'origen_direccion',
+            'destino_lat', 'destino_lng', 'destino_direccion',
+            'promo_code',
+        )
+
+
+class RutaSerializer(serializers.Serializer):
+    """
+    Una ruta a cotizar (origen -> destino).
+    """
+    origen_lat = serializers.DecimalField(max_digits=22, decimal_places=16, min_value=-90, max_value=90)
+    origen_lng = serializers.DecimalField(max_digits=22, decimal_places=16, min_value=-180, max_value=180)
+    destino_lat = serializers.DecimalField(max_digits=22, decimal_places=16, min_value=-90, max_value=90)
+    destino_lng = serializers.DecimalField(max_digits=22, decimal_places=16, min_value=-180, max_value=180)
+
+
+class CotizacionSerializer(serializers.Serializer):
+    """
+    Varias rutas para cotizar de una sola vez (pantalla "elige tu viaje").
+    """
+    rutas = RutaSerializer(many=True, allow_empty=False, max_length=500)
+
+
+class OfertaViajeSerializer(serializers.ModelSerializer):
+    """
+    Una oferta de viaje que ve el conductor.
+    """
+    viaje = ViajeSerializer(read_only=True)
+
+    class Meta:
+        model = OfertaViaje
+        fields = ('viaje', 'orden', 'distancia_km', 'created_at')
+
+
+class CambioEstadoSerializer(serializers.Serializer):
+    """
+    Cambio de estado de un viaje (ej. "conductor en camino", "viaje finalizado").
+    Al finalizar, el conductor puede mandar el precio final.
+    """
+    estado = serializers.ChoiceField(choices=Viaje.EstadoViaje.choices)
+    precio_final = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0, required=False)
+
+    def validate(self, data):
+        if 'precio_final' in data and data['estado'] != Viaje.EstadoViaje.FINALIZADO:
+            raise serializers.ValidationError({"precio_final": "Solo se envía al finalizar el viaje."})
+        return data
@@ -0,0 +1,18 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import TarifaDinamica
+from .pricing import surge_table
+
+# -------------------------------------------------------------------
+# "SIGNALS" (Los Gatillos)
+# -------------------------------------------------------------------
+# Al editar o borrar una tarifa dinámica (ej. desde el admin), este worker
+# recarga la tabla en la próxima cotización; los demás la recargan solos
+# cada SURGE_REFRESH_SECONDS (ver travel/pricing.py). Recién después del
+# commit: antes, una cotización simultánea recargaría las filas viejas.
+
+@receiver(post_save, sender=TarifaDinamica)
+@receiver(post_delete, sender=TarifaDinamica)
+def surge_changed_handler(sender, instance, **kwargs):
+    transaction.on_commit(surge_table.invalidar)
@@ -1,3 +1,564 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from asgiref.sync import sync_to_async
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend_project.asgi import application
+from backend_project.realtime import InMemoryBroker, RedisBroker, canal_conductor, canal_viaje, get_broker, publish_now
+from users.geo import clave_celda, driver_index
+from users.location import location_buffer, record_location_pings
+from users.models import UserProfile
+from . import consumers
+from .consumers import transmitir
+from .dispatch import accept_trip, dispatch_trip
+from .models import Viaje, OfertaViaje, TarifaDinamica, TransicionInvalida
+from .pricing import backtest_pricing, estimate_fare, estimate_fares, surge_table
+
+ORIGEN = (Decimal('-6.0346'), Decimal('-76.9717'))
+DESTINO = (Decimal('-6.0500'), Decimal('-76.9600'))
+
+
+def crear_perfil(username, phone, **campos):
+    user = User.objects.create(username=username)
+    UserProfile.objects.filter(user=user).delete()  # Lo crea el signal; lo rehacemos con nuestros datos
+    return UserProfile.objects.create(user=user, full_name=username, phone=phone, **campos)
+
+
+def crear_conductor(n, lat, lng):
+    return crear_perfil(
+        f'conductor{n}@test.com', f'91000{n:04d}',
+        current_latitude=lat, current_longitude=lng, is_active_for_service=True,
+    )
+
+
+def crear_viaje(pasajero, **campos):
+    return Viaje.objects.create(
+        pasajero=pasajero,
+        origen_lat=ORIGEN[0], origen_lng=ORIGEN[1],
+        destino_lat=DESTINO[0], destino_lng=DESTINO[1],
+        **campos
+    )
+
+
+# ---------------------------------------------------------------------------
+# DESPACHO DE VIAJES
+# ---------------------------------------------------------------------------
+class DispatchTests(TestCase):
+
+    def setUp(self):
+        driver_index.reemplazar([])
+        self.pasajero = crear_perfil('pasajero@test.com', '900000000')
+        with self.captureOnCommitCallbacks(execute=True):  # El índice se actualiza al hacer commit
+            self.cerca = crear_conductor(1, Decimal('-6.0350'), Decimal('-76.9720'))
+            self.medio = crear_conductor(2, Decimal('-6.0400'), Decimal('-76.9750'))
+            self.lejos = crear_conductor(3, Decimal('-6.4825'), Decimal('-76.3733'))
+
+    def test_ofrece_a_los_cercanos_en_orden_y_salta_ocupados(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ocupado = crear_conductor(4, Decimal('-6.0347'), Decimal('-76.9718'))
+        crear_viaje(self.pasajero, conductor=ocupado, estado=Viaje.EstadoViaje.EN_PROGRESO)
+
+        viaje = crear_viaje(self.pasajero)
+        dispatch_trip(viaje)
+        self.assertEqual(
+            list(viaje.ofertas.values_list('conductor_id', flat=True)),
+            [self.cerca.id, self.medio.id],
+        )
+
+    def test_solo_un_conductor_gana(self):
+        viaje = crear_viaje(self.pasajero)
+        dispatch_trip(viaje)
+
+        # SAVEPOINT + bloqueo del conductor + ¿ya tiene viaje? + UPDATE condicional + limpieza de ofertas + RELEASE
+        with self.assertNumQueries(6):
+            self.assertTrue(accept_trip(viaje.id, self.medio.id))
+        self.assertFalse(accept_trip(viaje.id, self.cerca.id))
+
+        viaje.refresh_from_db()
+        self.assertEqual(viaje.conductor_id, self.medio.id)
+        self.assertEqual(viaje.estado, Viaje.EstadoViaje.ACEPTADO)
+        self.assertFalse(OfertaViaje.objects.filter(viaje=viaje).exists())
+
+    def test_un_conductor_no_gana_dos_viajes(self):
+        primero, segundo = crear_viaje(self.pasajero), crear_viaje(self.pasajero)
+        dispatch_trip(primero)
+        dispatch_trip(segundo)
+        self.assertTrue(accept_trip(primero.id, self.cerca.id))
+        self.assertFalse(accept_trip(segundo.id, self.cerca.id))
+        segundo.refresh_from_db()
+        self.assertEqual(segundo.estado, Viaje.EstadoViaje.BUSCANDO)
+
+    def test_sin_oferta_no_puede_aceptar(self):
+        viaje = crear_viaje(self.pasajero)
+        dispatch_trip(viaje)
+        self.assertFalse(accept_trip(viaje.id, self.lejos.id))
+
+    def test_api_pedir_y_aceptar(self):
+        client = APIClient()
+        client.force_authenticate(self.pasajero.user)
+        respuesta = client.post(reverse('viaje-create'), {
+            'origen_lat': str(ORIGEN[0]), 'origen_lng': str(ORIGEN[1]),
+            'destino_lat': str(DESTINO[0]), 'destino_lng': str(DESTINO[1]),
+        }, format='json')
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(respuesta.data['conductores_notificados'], 2)
+        viaje_id = respuesta.data['id']
+
+        client.force_authenticate(self.cerca.user)
+        ofertas = client.get(reverse('ofertas-conductor'))
+        self.assertEqual([o['viaje']['id'] for o in ofertas.data], [viaje_id])
+        self.assertEqual(client.post(reverse('viaje-aceptar', args=[viaje_id])).status_code, 200)
+
+        client.force_authenticate(self.medio.user)
+        self.assertEqual(client.post(reverse('viaje-aceptar', args=[viaje_id])).status_code, 409)
+
+
+# ---------------------------------------------------------------------------
+# CAMBIOS DE ESTADO
+# ---------------------------------------------------------------------------
+class TransicionesTests(TestCase):
+
+    def setUp(self):
+        self.pasajero = crear_perfil('pasajero@test.com', '900000000')
+        self.conductor = crear_perfil('conductor@test.com', '900000001')
+        self.viaje = crear_viaje(self.pasajero, conductor=self.conductor, estado=Viaje.EstadoViaje.ACEPTADO)
+
+    def test_transicion_valida_en_un_solo_update(self):
+        with self.assertNumQueries(1):
+            filas = Viaje.transicionar(self.viaje.id, Viaje.EstadoViaje.EN_CAMINO)
+        self.assertEqual(filas, 1)
+        self.viaje.refresh_from_db()
+        self.assertEqual(self.viaje.estado, Viaje.EstadoViaje.EN_CAMINO)
+
+    def test_estado_desactualizado_no_pisa_cambios(self):
+        Viaje.transicionar(self.viaje.id, Viaje.EstadoViaje.CANCELADO)
+        # Otro cliente, que aún cree que el viaje está ACEPTADO
+        self.assertEqual(Viaje.transicionar(self.viaje.id, Viaje.EstadoViaje.EN_CAMINO), 0)
+        self.viaje.refresh_from_db()
+        self.assertEqual(self.viaje.estado, Viaje.EstadoViaje.CANCELADO)
+
+    def test_transicion_fuera_de_la_tabla(self):
+        with self.assertRaises(TransicionInvalida):
+            Viaje.transicionar(self.viaje.id, Viaje.EstadoViaje.FINALIZADO, desde=Viaje.EstadoViaje.ACEPTADO)
+        with self.assertRaises(TransicionInvalida):
+            Viaje.transicionar(self.viaje.id, Viaje.EstadoViaje.BUSCANDO)
+
+    def test_api_solo_el_conductor_avanza_el_viaje(self):
+        client = APIClient()
+        url = reverse('viaje-estado', args=[self.viaje.id])
+
+        client.force_authenticate(self.pasajero.user)
+        self.assertEqual(client.post(url, {'estado': 'EN_CAMINO'}).status_code, 409)
+
+        client.force_authenticate(self.conductor.user)
+        for estado in ('EN_CAMINO', 'EN_PROGRESO'):
+            self.assertEqual(client.post(url, {'estado': estado}).status_code, 200)
+        respuesta = client.post(url, {'estado': 'FINALIZADO', 'precio_final': '12.50'})
+        self.assertEqual(respuesta.status_code, 200)
+
+        self.viaje.refresh_from_db()
+        self.assertEqual(self.viaje.estado, Viaje.EstadoViaje.FINALIZADO)
+        self.assertEqual(self.viaje.precio_final, Decimal('12.50'))
+
+
+# ---------------------------------------------------------------------------
+# HISTORIAL DE VIAJES
+# ---------------------------------------------------------------------------
+class HistorialTests(TestCase):
+
+    def setUp(self):
+        self.pasajero = crear_perfil('pasajero@test.com', '900000000')
+        self.conductor = crear_perfil('conductor@test.com', '900000001')
+        viajes = [crear_viaje(self.pasajero, conductor=self.conductor) for _ in range(7)]
+        # Varios viajes con la misma fecha: el 'id' desempata
+        Viaje.objects.filter(id__in=[v.id for v in viajes[:4]]).update(created_at=viajes[0].created_at)
+        self.esperado = list(
+            Viaje.objects.filter(pasajero=self.pasajero).order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.client = APIClient()
+
+    def recorrer(self, url):
+        ids, paginas = [], 0
+        while url:
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 200)
+            ids += [v['id'] for v in respuesta.data['results']]
+            url, paginas = respuesta.data['next'], paginas + 1
+        return ids, paginas
+
+    def test_pasajero_recorre_todas_las_paginas(self):
+        self.client.force_authenticate(self.pasajero.user)
+        ids, paginas = self.recorrer(reverse('historial-pasajero') + '?page_size=3')
+        self.assertEqual(ids, self.esperado)
+        self.assertEqual(paginas, 3)
+
+    def test_conductor_sin_n_mas_1(self):
+        self.client.force_authenticate(self.conductor.user)
+        self.client.get(reverse('historial-conductor'))  # Calienta la caché user -> perfil
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(reverse('historial-conductor'))
+        self.assertEqual([v['id'] for v in respuesta.data['results']], self.esperado)
+        self.assertEqual(respuesta.data['results'][0]['pasajero_nombre'], 'pasajero@test.com')
+
+    def test_usuario_sin_perfil_recibe_404(self):
+        sin_perfil = User.objects.create(username='sinperfil@test.com')
+        UserProfile.objects.filter(user=sin_perfil).delete()
+        self.client.force_authenticate(sin_perfil)
+        for nombre in ('historial-pasajero', 'historial-conductor', 'ofertas-conductor'):
+            self.assertEqual(self.client.get(reverse(nombre)).status_code, 404)
+
+
+# ---------------------------------------------------------------------------
+# TARIFAS
+# ---------------------------------------------------------------------------
+class PricingTests(TestCase):
+
+    def setUp(self):
+        surge_table.invalidar()
+
+    def tearDown(self):
+        surge_table.invalidar()
+
+    def test_tarifa_minima_y_por_km(self):
+        # Mismo punto: 0 km -> tarifa mínima
+        self.assertEqual(estimate_fare(*ORIGEN, *ORIGEN), (Decimal('0.000'), Decimal('5.00')))
+        km, precio = estimate_fare(*ORIGEN, Decimal('-6.0800'), Decimal('-76.9717'))
+        self.assertEqual(precio, (Decimal('3.00') + Decimal('1.20') * km).quantize(Decimal('0.01')))
+
+    def test_vectorizado_coincide_con_decimal(self):
+        TarifaDinamica.objects.create(nombre='Centro', latitud=ORIGEN[0], longitud=ORIGEN[1], multiplicador='1.5')
+        rutas = [
+            (ORIGEN[0], ORIGEN[1], DESTINO[0], DESTINO[1]),
+            (Decimal('-6.0000'), Decimal('-76.9000'), Decimal('-6.1000'), Decimal('-77.0000')),
+            (ORIGEN[0], ORIGEN[1], ORIGEN[0], ORIGEN[1]),
+        ]
+        _, precios = estimate_fares(rutas)
+        self.assertEqual([Decimal(f"{p:.2f}") for p in precios], [estimate_fare(*r)[1] for r in rutas])
+        # La tarifa dinámica solo aplica a los viajes que salen de esa celda
+        self.assertEqual(estimate_fare(*rutas[2])[1], Decimal('7.50'))
+
+    @override_settings(SURGE_REFRESH_SECONDS=60)
+    def test_tarifa_de_otro_worker_se_ve_al_recargar(self):
+        self.assertEqual(estimate_fare(*ORIGEN, *ORIGEN)[1], Decimal('5.00'))  # Carga la tabla (vacía)
+        # Creada en otro worker: aquí no corre el signal
+        TarifaDinamica.objects.bulk_create([
+            TarifaDinamica(latitud=ORIGEN[0], longitud=ORIGEN[1], celda=clave_celda(*ORIGEN), multiplicador='2')
+        ])
+        with self.assertNumQueries(0):
+            self.assertEqual(estimate_fare(*ORIGEN, *ORIGEN)[1], Decimal('5.00'))
+        with override_settings(SURGE_REFRESH_SECONDS=0):
+            self.assertEqual(estimate_fare(*ORIGEN, *ORIGEN)[1], Decimal('10.00'))
+
+
+    def test_editar_una_tarifa_recarga_al_hacer_commit(self):
+        tarifa = TarifaDinamica.objects.create(latitud=ORIGEN[0], longitud=ORIGEN[1], multiplicador='2')
+        self.assertEqual(estimate_fare(*ORIGEN, *ORIGEN)[1], Decimal('10.00'))
+        tarifa.multiplicador = Decimal('3')
+        with self.captureOnCommitCallbacks(execute=True):
+            tarifa.save()
+            self.assertIsNotNone(surge_table.cargado_en)  # Todavía no: la fila nueva aún no es visible para los demás
+        self.assertEqual(estimate_fare(*ORIGEN, *ORIGEN)[1], Decimal('15.00'))
+
+
+class PricingDBTests(TestCase):
+
+    def setUp(self):
+        driver_index.reemplazar([])
+
+    def test_viaje_nuevo_tiene_precio_estimado_y_backtest(self):
+        pasajero = crear_perfil('pasajero@test.com', '900000000')
+        client = APIClient()
+        client.force_authenticate(pasajero.user)
+        respuesta = client.post(reverse('viaje-create'), {
+            'origen_lat': str(ORIGEN[0]), 'origen_lng': str(ORIGEN[1]),
+            'destino_lat': str(DESTINO[0]), 'destino_lng': str(DESTINO[1]),
+        }, format='json')
+        estimado = estimate_fare(*ORIGEN, *DESTINO)[1]
+        self.assertEqual(Decimal(respuesta.data['precio_estimado']), estimado)
+
+        Viaje.objects.filter(id=respuesta.data['id']).update(
+            estado=Viaje.EstadoViaje.FINALIZADO, precio_final=estimado + 1
+        )
+        resumen = backtest_pricing(Viaje.objects.filter(estado=Viaje.EstadoViaje.FINALIZADO))
+        self.assertEqual(resumen, {'viajes': 1, 'error_absoluto_medio': 1.0, 'sesgo_medio': -1.0})
+
+    def test_api_cotizar_varias_rutas(self):
+        client = APIClient()
+        client.force_authenticate(crear_perfil('pasajero@test.com', '900000000').user)
+        ruta = {
+            'origen_lat': str(ORIGEN[0]), 'origen_lng': str(ORIGEN[1]),
+            'destino_lat': str(DESTINO[0]), 'destino_lng': str(DESTINO[1]),
+        }
+        respuesta = client.post(reverse('cotizar'), {'rutas': [ruta, ruta]}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(
+            [c['precio_estimado'] for c in respuesta.data['cotizaciones']],
+            [str(estimate_fare(*ORIGEN, *DESTINO)[1])] * 2,
+        )
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class DispatchConcurrencyTests(TransactionTestCase):
+    """
+    Varios conductores aceptan el mismo viaje al mismo tiempo (cada hilo
+    con su propia conexión): exactamente uno debe ganar, y ninguno falla.
+    Solo en bases con bloqueo por fila: en SQLite los perdedores morirían
+    con "database is locked" y la prueba no probaría nada.
+    """
+
+    def test_aceptaciones_simultaneas(self):
+        driver_index.reemplazar([])
+        pasajero = crear_perfil('pasajero@test.com', '900000000')
+        conductores = [crear_conductor(n, Decimal('-6.0350'), Decimal('-76.9720')) for n in range(8)]
+
+        for _ in range(5):
+            viaje = crear_viaje(pasajero)
+            dispatch_trip(viaje, k=len(conductores))
+            barrera = threading.Barrier(len(conductores))
+            ganadores, errores = [], []
+
+            def aceptar(conductor_id):
+                try:
+                    barrera.wait()
+                    if accept_trip(viaje.id, conductor_id):
+                        ganadores.append(conductor_id)
+                except Exception as e:
+                    errores.append(e)
+                finally:
+                    connection.close()
+
+            hilos = [threading.Thread(target=aceptar, args=(c.id,)) for c in conductores]
+            for h in hilos:
+                h.start()
+            for h in hilos:
+                h.join()
+
+            viaje.refresh_from_db()
+            self.assertEqual(errores, [])
+            self.assertEqual(len(ganadores), 1)
+            self.assertEqual(viaje.conductor_id, ganadores[0])
+
+    def test_un_conductor_acepta_varios_viajes_a_la_vez(self):
+        driver_index.reemplazar([])
+        pasajero = crear_perfil('pasajero@test.com', '900000000')
+        conductor = crear_conductor(1, Decimal('-6.0350'), Decimal('-76.9720'))
+        viajes = [crear_viaje(pasajero) for _ in range(5)]
+        barrera = threading.Barrier(len(viajes))
+        ganados, errores = [], []
+
+        def aceptar(viaje_id):
+            try:
+                barrera.wait()
+                if accept_trip(viaje_id, conductor.id, require_offer=False):
+                    ganados.append(viaje_id)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=aceptar, args=(v.id,)) for v in viajes]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(len(ganados), 1)
+        self.assertEqual(Viaje.objects.filter(conductor=conductor).count(), 1)
+
+
+# ---------------------------------------------------------------------------
+# TIEMPO REAL (WEBSOCKETS)
+# ---------------------------------------------------------------------------
+class RealtimeBrokerTests(SimpleTestCase):
+
+    def test_publica_solo_a_los_suscriptores_del_canal(self):
+        async def escenario():
+            broker = InMemoryBroker()
+            uno, otro = broker.subscribe(['viaje:1']), broker.subscribe(['viaje:2'])
+            self.assertEqual(broker.publish('viaje:1', {'n': 1}), 1)
+            self.assertEqual(await asyncio.wait_for(uno.get(), 1), {'n': 1})
+            self.assertTrue(otro._cola.empty())
+            await uno.close()
+            await otro.close()
+            self.assertEqual(len(broker), 0)
+        asyncio.run(escenario())
+
+    def test_cliente_lento_pierde_los_mensajes_mas_viejos(self):
+        async def escenario():
+            broker = InMemoryBroker()
+            suscripcion = broker.subscribe(['viaje:1'])
+            for n in range(150):
+                broker.publish('viaje:1', {'n': n})
+            await asyncio.sleep(0)  # Se entregan en el event loop
+            recibidos = [suscripcion._cola.get_nowait()['n'] for _ in range(suscripcion._cola.qsize())]
+            self.assertEqual(recibidos, list(range(50, 150)))
+        asyncio.run(escenario())
+
+    def test_transmitir_sigue_al_conductor_y_cierra_al_terminar(self):
+        async def escenario():
+            broker = InMemoryBroker()
+            entrada, salida = asyncio.Queue(), asyncio.Queue()
+            tarea = asyncio.ensure_future(transmitir(5, None, entrada.get, salida.put, broker=broker))
+            await asyncio.sleep(0)
+
+            broker.publish(canal_viaje(5), {'tipo': 'estado', 'viaje': 5, 'estado': 'ACEPTADO', 'conductor': 9})
+            self.assertEqual((await asyncio.wait_for(salida.get(), 1))['type'], 'websocket.send')
+            # Ya tiene conductor: ahora también llegan sus ubicaciones
+            broker.publish(canal_conductor(9), {'tipo': 'ubicacion', 'conductor': 9, 'lat': 1.0, 'lng': 2.0})
+            self.assertEqual(json.loads((await asyncio.wait_for(salida.get(), 1))['text'])['tipo'], 'ubicacion')
+
+            broker.publish(canal_viaje(5), {'tipo': 'estado', 'viaje': 5, 'estado': 'FINALIZADO', 'conductor': None})
+            await asyncio.wait_for(tarea, 1)
+            await salida.get()
+            self.assertEqual(salida.get_nowait(), {'type': 'websocket.close', 'code': 1000})
+            self.assertEqual(len(broker), 0)
+        asyncio.run(escenario())
+
+
+class PubSubFalso:
+    """Lo que RedisBroker usa del pub/sub de redis.asyncio, en memoria."""
+    creados = 0
+
+    def __init__(self):
+        PubSubFalso.creados += 1
+        self.channels, self.comandos, self.entrantes = set(), [], asyncio.Queue()
+
+    @property
+    def subscribed(self):
+        return bool(self.channels)
+
+    async def subscribe(self, *canales):
+        self.comandos.append(('SUBSCRIBE', canales))
+        self.channels.update(canales)
+
+    async def unsubscribe(self, *canales):
+        self.comandos.append(('UNSUBSCRIBE', canales))
+        self.channels.difference_update(canales)
+
+    async def get_message(self, timeout=None):
+        try:
+            return await asyncio.wait_for(self.entrantes.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class RedisBrokerFalso(RedisBroker):
+
+    def _conectar(self):
+        return PubSubFalso()
+
+
+class RedisBrokerTests(SimpleTestCase):
+
+    def test_una_conexion_por_worker_y_reparte_localmente(self):
+        async def escenario():
+            PubSubFalso.creados = 0
+            broker = RedisBrokerFalso()
+            clientes = [broker.subscribe([canal_viaje(1)]) for _ in range(3)] + [broker.subscribe([canal_viaje(2)])]
+            for cliente in clientes:
+                await cliente.listo()
+            pubsub = broker._pubsub
+            self.assertEqual(PubSubFalso.creados, 1)
+            self.assertEqual(pubsub.comandos, [('SUBSCRIBE', ('viaje:1',)), ('SUBSCRIBE', ('viaje:2',))])
+
+            pubsub.entrantes.put_nowait({'type': 'message', 'channel': b'viaje:1', 'data': '{"n": 1}'})
+            for cliente in clientes[:3]:
+                self.assertEqual(await asyncio.wait_for(cliente.get(), 1), {'n': 1})
+            self.assertTrue(clientes[3]._local._cola.empty())
+
+            for cliente in clientes:
+                await cliente.close()
+            await asyncio.sleep(0)  # Corren los UNSUBSCRIBE
+            self.assertEqual(pubsub.comandos[2:], [('UNSUBSCRIBE', ('viaje:1',)), ('UNSUBSCRIBE', ('viaje:2',))])
+            broker._lector.cancel()
+        asyncio.run(escenario())
+
+
+class ViajeWebsocketTests(TransactionTestCase):
+    """La conexión completa por ASGI (el consumer lee la BD desde otro hilo)."""
+
+    def setUp(self):
+        driver_index.reemplazar([])
+        self.pasajero = crear_perfil('pasajero@test.com', '900000000')
+        self.conductor = crear_perfil('conductor@test.com', '900000001')
+        self.viaje = crear_viaje(self.pasajero)
+
+    def tearDown(self):
+        location_buffer.drain()
+
+    def conectar(self, token, viaje_id=None):
+        """Abre el websocket; devuelve (tarea, entrada, salida)."""
+        entrada, salida = asyncio.Queue(), asyncio.Queue()
+        scope = {
+            'type': 'websocket', 'path': f'/ws/viajes/{viaje_id or self.viaje.id}/',
+            'query_string': f'token={token}'.encode(),
+        }
+        entrada.put_nowait({'type': 'websocket.connect'})
+        return asyncio.ensure_future(application(scope, entrada.get, salida.put)), entrada, salida
+
+    def test_rechaza_token_invalido_y_ajenos(self):
+        intruso = crear_perfil('intruso@test.com', '900000002')
+
+        async def escenario():
+            for token, codigo in (('basura', 4401), (str(AccessToken.for_user(intruso.user)), 4403)):
+                tarea, _, salida = self.conectar(token)
+                await asyncio.wait_for(tarea, 5)
+                self.assertEqual(salida.get_nowait(), {'type': 'websocket.close', 'code': codigo})
+        asyncio.run(escenario())
+
+    def test_el_pasajero_recibe_estado_y_ubicacion(self):
+        token = str(AccessToken.for_user(self.pasajero.user))
+
+        async def escenario():
+            tarea, entrada, salida = self.conectar(token)
+            self.assertEqual(await asyncio.wait_for(salida.get(), 5), {'type': 'websocket.accept'})
+            inicial = json.loads((await asyncio.wait_for(salida.get(), 5))['text'])
+            self.assertEqual(inicial, {'tipo': 'estado', 'viaje': self.viaje.id, 'estado': 'BUSCANDO', 'conductor': None})
+
+            await sync_to_async(accept_trip)(self.viaje.id, self.conductor.id, require_offer=False)
+            aceptado = json.loads((await asyncio.wait_for(salida.get(), 5))['text'])
+            self.assertEqual((aceptado['estado'], aceptado['conductor']), ('ACEPTADO', self.conductor.id))
+
+            await sync_to_async(record_location_pings)(
+                self.conductor.id, [(Decimal('-6.0350'), Decimal('-76.9720'), timezone.now())]
+            )
+            ubicacion = json.loads((await asyncio.wait_for(salida.get(), 5))['text'])
+            self.assertEqual((ubicacion['tipo'], ubicacion['lat']), ('ubicacion', -6.035))
+
+            entrada.put_nowait({'type': 'websocket.disconnect', 'code': 1001})
+            await asyncio.wait_for(tarea, 5)
+        asyncio.run(escenario())
+        self.assertEqual(len(get_broker()), 0)
+
+    def test_cambio_mientras_se_lee_el_estado_no_se_pierde(self):
+        token = str(AccessToken.for_user(self.pasajero.user))
+        leer_estado = consumers._estado_inicial
+
+        def leer_y_cancelar(viaje_id, user_id):
+            # El pasajero cancela (desde otra petición) justo después de leer el estado
+            estado = leer_estado(viaje_id, user_id)
+            Viaje.objects.filter(pk=viaje_id).update(estado=Viaje.EstadoViaje.CANCELADO)
+            publish_now(canal_viaje(viaje_id), {'tipo': 'estado', 'viaje': viaje_id, 'estado': 'CANCELADO', 'conductor': None})
+            return estado
+
+        async def escenario():
+            with mock.patch.object(consumers, '_estado_inicial', leer_y_cancelar):
+                tarea, _, salida = self.conectar(token)
+                await asyncio.wait_for(tarea, 5)  # Se cierra solo, sin que el cliente se desconecte
+            mensajes = [salida.get_nowait() for _ in range(salida.qsize())]
+            self.assertEqual(json.loads(mensajes[1]['text'])['estado'], 'BUSCANDO')
+            self.assertEqual(json.loads(mensajes[2]['text'])['estado'], 'CANCELADO')
+            self.assertEqual(mensajes[-1], {'type': 'websocket.close', 'code': 1000})
+        asyncio.run(escenario())
+        self.assertEqual(len(get_broker()), 0)
@@ -0,0 +1,32 @@
+from django.urls import path
+from .views import (
+    ViajeCreateView,
+    OfertasConductorView,
+    AceptarViajeView,
+    CambiarEstadoViajeView,
+    HistorialPasajeroView,
+    HistorialConductorView,
+    CotizarView,
+)
+
+urlpatterns = [
+    # POST /api/travel/cotizar/ (precio estimado de una o varias rutas)
+    path('cotizar/', CotizarView.as_view(), name='cotizar'),
+
+    # POST /api/travel/viajes/ (el pasajero pide un viaje)
+    path('viajes/', ViajeCreateView.as_view(), name='viaje-create'),
+
+    # GET /api/travel/ofertas/ (viajes ofrecidos al conductor)
+    path('ofertas/', OfertasConductorView.as_view(), name='ofertas-conductor'),
+
+    # POST /api/travel/viajes/<id>/aceptar/
+    path('viajes/<int:pk>/aceptar/', AceptarViajeView.as_view(), name='viaje-aceptar'),
+
+    # POST /api/travel/viajes/<id>/estado/ (en camino, en progreso, finalizado, cancelado)
+    path('viajes/<int:pk>/estado/', CambiarEstadoViajeView.as_view(), name='viaje-estado'),
+
+    # GET /api/travel/historial/pasajero/ y /api/travel/historial/conductor/
+    # (paginados por cursor: seguir el link "next")
+    path('historial/pasajero/', HistorialPasajeroView.as_view(), name='historial-pasajero'),
+    path('historial/conductor/', HistorialConductorView.as_view(), name='historial-conductor'),
+]
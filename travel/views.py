@@ -1,3 +1,263 @@
-from django.shortcuts import render
+from django.db import transaction
+from django.db.models import Q
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
-# Create your views here.
+from promotions.discounts import apply_best_discount, descuentos_aplicables
+from users.models import UserProfile
+from users.utils import get_profile_id
+from .dispatch import dispatch_trip, accept_trip
+from .pricing import estimate_fare, estimate_fares
+from .models import Viaje, OfertaViaje, TransicionInvalida
+from .pagination import HistorialCursorPagination
+from .serializers import (
+    ViajeSerializer,
+    ViajeCreateSerializer,
+    ViajePasajeroSerializer,
+    ViajeConductorSerializer,
+    OfertaViajeSerializer,
+    CambioEstadoSerializer,
+    CotizacionSerializer,
+)
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _perfil_o_404(user):
+    """Id del perfil del usuario; si no tiene perfil, 404 (en vez de un 500)."""
+    try:
+        return get_profile_id(user)
+    except UserProfile.DoesNotExist:
+        raise NotFound("Perfil de usuario no encontrado.")
+
+
+# ---------------------------------------------------------------------------
+# VISTA 1: PEDIR UN VIAJE (PASAJERO)
+# /api/travel/viajes/
+# ---------------------------------------------------------------------------
+class ViajeCreateView(generics.CreateAPIView):
+    """
+    El pasajero pide un viaje. Se crea en estado BUSCANDO y se ofrece
+    de inmediato a los conductores cercanos.
+    Se aplica el mejor cupón disponible (o el que mandó el pasajero).
+    """
+    serializer_class = ViajeCreateSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            pasajero_id = get_profile_id(request.user)
+        except UserProfile.DoesNotExist:
+            return Response(
+                {"error": "Perfil de usuario no encontrado."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        datos = serializer.validated_data
+        _, precio_estimado = estimate_fare(
+            datos['origen_lat'], datos['origen_lng'], datos['destino_lat'], datos['destino_lng']
+        )
+        codigo = datos.pop('promo_code', None)
+        aplicables = descuentos_aplicables(
+            pasajero_id, precio_estimado, codigos=None if codigo is None else [codigo.strip()]
+        )
+        if codigo is not None and not aplicables:
+            return Response(
+                {"error": "El cupón no es válido para este viaje."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        with transaction.atomic():
+            viaje = serializer.save(pasajero_id=pasajero_id, precio_estimado=precio_estimado)
+            uso = apply_best_discount(viaje, aplicables)
+            if codigo is not None and uso is None:
+                # El cupón que pidió se agotó justo ahora: no creamos el viaje sin avisarle
+                transaction.set_rollback(True)
+                return Response(
+                    {"error": "El cupón se agotó o ya no se puede usar."},
+                    status=status.HTTP_409_CONFLICT
+                )
+        ofertas = dispatch_trip(viaje)
+        logger.info(f"Viaje #{viaje.id} creado y ofrecido a {len(ofertas)} conductores")
+
+        data = ViajeSerializer(viaje).data
+        data['conductores_notificados'] = len(ofertas)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+# ---------------------------------------------------------------------------
+# VISTA 2: MIS OFERTAS (CONDUCTOR)
+# /api/travel/ofertas/
+# ---------------------------------------------------------------------------
+class OfertasConductorView(generics.ListAPIView):
+    """
+    Viajes que se le ofrecieron al conductor logueado y que siguen BUSCANDO.
+    """
+    serializer_class = OfertaViajeSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return (
+            OfertaViaje.objects
+            .filter(conductor_id=_perfil_o_404(self.request.user), viaje__estado=Viaje.EstadoViaje.BUSCANDO)
+            .select_related('viaje')
+        )
+
+
+# ---------------------------------------------------------------------------
+# VISTA 3: ACEPTAR UN VIAJE (CONDUCTOR)
+# /api/travel/viajes/<id>/aceptar/
+# ---------------------------------------------------------------------------
+class AceptarViajeView(APIView):
+    """
+    El conductor acepta un viaje que se le ofreció.
+    Si otro conductor lo aceptó primero, responde 409 (Conflicto).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        try:
+            conductor_id = get_profile_id(request.user)
+        except UserProfile.DoesNotExist:
+            return Response(
+                {"error": "Perfil de usuario no encontrado."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if not accept_trip(pk, conductor_id):
+            return Response(
+                {"error": "El viaje ya no está disponible."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        logger.info(f"Viaje #{pk} aceptado por el conductor #{conductor_id}")
+        return Response({"message": "¡Viaje aceptado!"}, status=status.HTTP_200_OK)
+
+
+# ---------------------------------------------------------------------------
+# VISTA 4: CAMBIAR EL ESTADO DE UN VIAJE
+# /api/travel/viajes/<id>/estado/
+# ---------------------------------------------------------------------------
+class CambiarEstadoViajeView(APIView):
+    """
+    Avanza el estado del viaje ("en camino", "en progreso", "finalizado")
+    o lo cancela. Todo se hace en UN solo UPDATE condicional, que además
+    verifica que quien lo pide sea el conductor (o el pasajero, para cancelar).
+    Si el viaje ya no está en un estado que lo permita, responde 409.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        serializer = CambioEstadoSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        nuevo_estado = serializer.validated_data['estado']
+
+        # ACEPTADO se hace desde /aceptar/ (ahí se asigna el conductor)
+        if nuevo_estado == Viaje.EstadoViaje.ACEPTADO:
+            return Response(
+                {"error": "Para aceptar un viaje usa /aceptar/."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            perfil_id = get_profile_id(request.user)
+        except UserProfile.DoesNotExist:
+            return Response(
+                {"error": "Perfil de usuario no encontrado."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # El pasajero solo puede cancelar; el resto lo hace el conductor
+        if nuevo_estado == Viaje.EstadoViaje.CANCELADO:
+            participante = Q(conductor_id=perfil_id) | Q(pasajero_id=perfil_id)
+        else:
+            participante = Q(conductor_id=perfil_id)
+
+        campos = {}
+        if 'precio_final' in serializer.validated_data:
+            campos['precio_final'] = serializer.validated_data['precio_final']
+
+        try:
+            actualizados = Viaje.transicionar(pk, nuevo_estado, participante, **campos)
+        except TransicionInvalida as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not actualizados:
+            return Response(
+                {"error": "El viaje no está en un estado que permita este cambio."},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        logger.info(f"Viaje #{pk} pasó a {nuevo_estado}")
+        return Response({"id": pk, "estado": nuevo_estado}, status=status.HTTP_200_OK)
+
+
+# ---------------------------------------------------------------------------
+# VISTA 5: HISTORIAL DE VIAJES (PASAJERO Y CONDUCTOR)
+# /api/travel/historial/pasajero/
+# /api/travel/historial/conductor/
+# ---------------------------------------------------------------------------
+class HistorialPasajeroView(generics.ListAPIView):
+    """
+    "Mis viajes" como pasajero, del más nuevo al más antiguo.
+    Usa el índice (pasajero, created_at, id) y paginación por cursor.
+    """
+    serializer_class = ViajePasajeroSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HistorialCursorPagination
+
+    def get_queryset(self):
+        return (
+            Viaje.objects
+            .filter(pasajero_id=_perfil_o_404(self.request.user))
+            .select_related('conductor') # Evita una consulta por viaje
+        )
+
+
+class HistorialConductorView(generics.ListAPIView):
+    """
+    "Mis viajes" como conductor, del más nuevo al más antiguo.
+    Usa el índice (conductor, created_at, id) y paginación por cursor.
+    """
+    serializer_class = ViajeConductorSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HistorialCursorPagination
+
+    def get_queryset(self):
+        return (
+            Viaje.objects
+            .filter(conductor_id=_perfil_o_404(self.request.user))
+            .select_related('pasajero') # Evita una consulta por viaje
+        )
+
+
+# ---------------------------------------------------------------------------
+# VISTA 6: COTIZAR RUTAS
+# /api/travel/cotizar/
+# ---------------------------------------------------------------------------
+class CotizarView(APIView):
+    """
+    Devuelve distancia y precio estimado para una o varias rutas.
+    Todas se calculan juntas en una sola pasada (ver travel/pricing.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = CotizacionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rutas = serializer.validated_data['rutas']
+
+        distancias, precios = estimate_fares([
+            (r['origen_lat'], r['origen_lng'], r['destino_lat'], r['destino_lng']) for r in rutas
+        ])
+        return Response({
+            "cotizaciones": [
+                {"distancia_km": round(float(d), 3), "precio_estimado": f"{p:.2f}"}
+                for d, p in zip(distancias, precios)
+            ]
+        })
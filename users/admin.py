@@ -1,4 +1,6 @@
 from django.contrib import admin
+from django.contrib.admin.forms import AdminAuthenticationForm
+from django.core.exceptions import ValidationError
 # ¡Añade los nuevos modelos a la importación!
 from .models import (
     Role, 
@@ -9,6 +11,8 @@ from .models import (
     PaymentMethodType,  
     UserPaymentMethod   
 )
+from .catalogs import payment_method_types
+from .hashing import HashingSaturated
 
 # Register your models here.
 
@@ -32,9 +36,15 @@ class DriverDataAdmin(admin.ModelAdmin):
 
 # --- ADMINS NUEVOS ---
 class UserPaymentMethodAdmin(admin.ModelAdmin):
-    list_display = ('user_profile', 'payment_type', 'card_brand', 'last_four_digits', 'identifier', 'is_default')
+    list_display = ('user_profile', 'tipo', 'card_brand', 'last_four_digits', 'identifier', 'is_default')
     list_filter = ('payment_type', 'card_brand', 'is_default')
     search_fields = ('user_profile__full_name', 'identifier', 'last_four_digits')
+    # El perfil en el mismo SELECT; el tipo sale del catálogo en memoria (sin una consulta por fila)
+    list_select_related = ('user_profile',)
+
+    @admin.display(description="Tipo", ordering='payment_type')
+    def tipo(self, obj):
+        return payment_method_types.get(obj.payment_type_id)
 
 # Registramos los modelos en el panel de admin
 admin.site.register(Role)
@@ -45,4 +55,18 @@ admin.site.register(UserSavedLocation) # <-- Este lo añadimos en el Paso 1
 
 # --- REGISTROS NUEVOS ---
 admin.site.register(PaymentMethodType)
-admin.site.register(UserPaymentMethod, UserPaymentMethodAdmin)
\ No newline at end of file
+admin.site.register(UserPaymentMethod, UserPaymentMethodAdmin)
+
+
+# --- LOGIN DEL ADMIN ---
+# El login del admin también pasa por PooledModelBackend: si el pool de
+# hashes no tiene cupo, mostramos el aviso en el formulario (y no un 500)
+class LoginAdminForm(AdminAuthenticationForm):
+
+    def clean(self):
+        try:
+            return super().clean()
+        except HashingSaturated as e:
+            raise ValidationError(str(e.detail), code='hashing_saturated')
+
+admin.site.login_form = LoginAdminForm
@@ -0,0 +1,179 @@
+"""
+Autenticación JWT "sin estado": el usuario sale del token, no de la BD.
+
+Con el JWTAuthentication normal, cada petición hace un SELECT de auth_user
+(y muchas vistas otro más para el perfil). Aquí el token de acceso ya trae
+lo que casi todas las vistas necesitan:
+
+    user_id, username, is_staff, is_superuser,
+    profile_id     -> el UserProfile (ver users/utils.get_profile_id)
+    roles          -> nombres de sus roles, ej. ["Cliente"]
+    hash_password  -> huella de la contraseña (CHECK_REVOKE_TOKEN de simplejwt)
+
+y request.user es un UsuarioToken armado con esos datos (cero consultas).
+
+Revocación: un token sigue valiendo aunque el usuario se desactive o cambie
+su contraseña. Por eso cada worker guarda en memoria, por unos segundos
+(JWT_REVOCATION_CHECK_SECONDS), si el usuario sigue activo y la huella de su
+contraseña actual (la misma que compara simplejwt): como mucho dos consultas
+por usuario cada ese tiempo, en vez de una por petición.
+
+Permisos: is_staff, is_superuser y los roles NO se toman del token (un
+token viejo seguiría dando permisos que ya se quitaron): salen de esa
+misma copia en memoria, así que un cambio se nota como mucho en
+JWT_REVOCATION_CHECK_SECONDS. Al guardar un User se olvida al momento en este
+worker; en los demás, cuando vence su copia.
+
+Las vistas que necesitan el User real y al día (ej. cambiar la contraseña)
+usan JWTAuthentication, o get_db_user() para asignarlo a una FK.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .logins import record_login
+from .catalogs import roles
+from .models import Role, UserProfile
+from .utils import get_profile_id
+
+
+class UsuarioToken(TokenUser):
+    """
+    El usuario de la petición, armado con los datos del token y, para los
+    permisos, con su estado actual (ver EstadoUsuarios).
+    """
+
+    def __init__(self, token, estado):
+        super().__init__(token)
+        self._estado = estado
+
+    @property
+    def is_staff(self):
+        return self._estado[2]
+
+    @property
+    def is_superuser(self):
+        return self._estado[3]
+
+    @property
+    def profile_id(self):
+        return self.token.get('profile_id')
+
+    @property
+    def roles(self):
+        return self._estado[4]
+
+    def tiene_rol(self, nombre):
+        return nombre in self.roles
+
+
+# ---------------------------------------------------------------------------
+# REVOCACIÓN (CACHÉ CON TTL POR WORKER)
+# ---------------------------------------------------------------------------
+class EstadoUsuarios:
+    """{user_id: (cargado_en, is_active, huella, is_staff, is_superuser, roles)} con vencimiento."""
+
+    MAXIMO = 100_000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._estados = {}
+
+    def __len__(self):
+        return len(self._estados)
+
+    def get(self, user_id):
+        """(is_active, huella, is_staff, is_superuser, roles) del usuario, o None si no existe."""
+        segundos = getattr(settings, 'JWT_REVOCATION_CHECK_SECONDS', 60)
+        user_id = str(user_id)  # En el token viene como texto; los signals pasan el pk
+        guardado = self._estados.get(user_id)
+        if guardado is not None and time.monotonic() - guardado[0] <= segundos:
+            return guardado[1:]
+        fila = User.objects.filter(pk=user_id).values_list('is_active', 'password', 'is_staff', 'is_superuser').first()
+        if fila is None:
+            self.olvidar(user_id)
+            return None
+        estado = (fila[0], get_md5_hash_password(fila[1]), fila[2], fila[3], _nombres_de_roles(
+            # Solo los ids (tabla intermedia, sin JOIN a roles)
+            UserProfile.roles.through.objects.filter(userprofile__user_id=user_id).values_list('role_id', flat=True)
+        ))
+        with self._lock:
+            if len(self._estados) >= self.MAXIMO:
+                self._estados.clear()  # Se vuelven a cargar de a poco
+            self._estados[user_id] = (time.monotonic(), *estado)
+        return estado
+
+    def olvidar(self, user_id):
+        with self._lock:
+            self._estados.pop(str(user_id), None)
+
+    def limpiar(self):
+        with self._lock:
+            self._estados.clear()
+
+
+def _nombres_de_roles(role_ids):
+    # Los nombres salen del catálogo en memoria
+    nombres = []
+    for rid in role_ids:
+        try:
+            nombres.append(roles.get(rid).name)
+        except Role.DoesNotExist:
+            pass  # Un rol recién borrado: ya no da permisos
+    return tuple(sorted(nombres))
+
+
+estado_usuarios = EstadoUsuarios()
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """Autentica con el token y revisa (con caché) que no esté revocado."""
+
+    def get_user(self, validated_token):
+        super().get_user(validated_token)  # Valida que traiga el user_id
+        estado = estado_usuarios.get(validated_token[api_settings.USER_ID_CLAIM])
+        # Las mismas reglas que JWTAuthentication, pero con los datos en caché
+        if estado is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not estado[0]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != estado[1]:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return UsuarioToken(validated_token, estado)
+
+
+class PerfilTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Login: agrega al token los datos que usa StatelessJWTAuthentication.
+    El último login se anota en memoria y se guarda en lote (ver users/logins.py).
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        return data
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        try:
+            profile_id = get_profile_id(user)
+        except UserProfile.DoesNotExist:
+            profile_id = None
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['profile_id'] = profile_id
+        # Solo los ids (tabla intermedia, sin JOIN); los nombres salen del catálogo en memoria
+        role_ids = UserProfile.roles.through.objects.filter(userprofile_id=profile_id).values_list('role_id', flat=True)
+        token['roles'] = list(_nombres_de_roles(role_ids))
+        return token
@@ -0,0 +1,27 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import hash_password, verify_password
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    El ModelBackend de Django, pero el hash de la contraseña se calcula en el
+    pool con cupo (ver users/hashing.py). Si está lleno, el login responde 429.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Igual calculamos un hash, para que no se note por el tiempo si el usuario existe
+            hash_password(password)
+        else:
+            if verify_password(user, password) and self.user_can_authenticate(user):
+                return user
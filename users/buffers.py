@@ -0,0 +1,96 @@
+"""
+Buffer en memoria que junta escrituras repetidas y las manda a la BD en lote.
+
+Cada clave guarda solo su último valor ("la última escritura gana") y un
+hilo en segundo plano vacía el buffer cada cierto intervalo. Así miles de
+escrituras por segundo sobre las mismas filas se vuelven un solo UPDATE
+en lote.
+"""
+import atexit
+import os
+import threading
+import time
+
+from django.db import close_old_connections
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+class CoalescingBuffer:
+    """
+    Clase base. Las subclases definen:
+      - flush_interval(): segundos entre vaciados (<= 0 = sin hilo, se vacía a mano)
+      - write(items): escribe en la BD el dict {clave: valor}
+      - is_newer(nuevo, actual): (opcional) si 'nuevo' debe reemplazar a 'actual'
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        atexit.register(self._flush_at_exit)
+
+    def flush_interval(self):
+        raise NotImplementedError
+
+    def write(self, items):
+        raise NotImplementedError
+
+    def is_newer(self, nuevo, actual):
+        return True
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key, value):
+        """Registra un valor. Devuelve False si era más viejo que el pendiente."""
+        with self._lock:
+            actual = self._pending.get(key)
+            if actual is not None and not self.is_newer(value, actual):
+                return False
+            self._pending[key] = value
+        self._ensure_thread()
+        return True
+
+    def drain(self):
+        """Saca todo lo pendiente (y deja el buffer vacío)."""
+        with self._lock:
+            items, self._pending = self._pending, {}
+        return items
+
+    def flush(self):
+        """Escribe todo lo pendiente en la BD. Devuelve cuántas claves escribió."""
+        items = self.drain()
+        if items:
+            self.write(items)
+        return len(items)
+
+    def _flush_at_exit(self):
+        # Al apagar el worker intentamos no perder lo que quedó pendiente
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Error al vaciar {type(self).__name__} al salir: {e}")
+
+    def _ensure_thread(self):
+        # Comparamos el PID porque gunicorn hace fork: el hilo del proceso
+        # padre no existe en los workers, cada uno debe arrancar el suyo.
+        if self._pid == os.getpid() or self.flush_interval() <= 0:
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(max(self.flush_interval(), 0.05))
+            try:
+                close_old_connections()
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error al vaciar {type(self).__name__}: {e}")
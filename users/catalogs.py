@@ -0,0 +1,126 @@
+"""
+Catálogos en memoria: tablas chicas que casi nunca cambian (Role, PaymentMethodType).
+
+Cada worker las carga completas la primera vez que se usan y después las
+lee de memoria (sin ir a la BD). Para enterarse de que alguien las editó
+en el admin (quizás en OTRO worker), cada catálogo tiene una "versión" en
+la caché compartida (CACHES): al guardar o borrar una fila (ej. desde el
+admin), un signal la cambia. Cada worker compara su versión con la compartida como mucho cada
+CATALOG_VERSION_CHECK_SECONDS y, si cambió, recarga la tabla.
+
+Para eso la caché tiene que ser compartida (Redis, ver CACHES en settings):
+con la de memoria cada worker solo ve sus propios cambios. Por si acaso
+(caché local, un aviso perdido, un cambio hecho sin signals), la tabla se
+recarga igual cuando tiene más de CATALOG_MAX_AGE_SECONDS.
+
+Uso:
+    from users.catalogs import roles, payment_method_types
+    roles.by_name("Cliente").id
+    payment_method_types.get(pk)
+
+Las filas son instancias del modelo compartidas entre peticiones: se leen,
+no se modifican.
+"""
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import PaymentMethodType, Role
+
+
+class Catalog:
+    """Una tabla completa en memoria, indexada por id y por nombre."""
+
+    def __init__(self, model, campo_nombre='name'):
+        self.model = model
+        self.campo_nombre = campo_nombre
+        self.clave_version = f"catalogo:{model._meta.label_lower}:version"
+        self._lock = threading.Lock()
+        self._por_id, self._por_nombre = {}, {}
+        self._version = None
+        self.cargado_en = None
+        self._revisado_en = None
+        self._recargado_por_falta_en = None
+
+    def _vigente(self):
+        """Recarga la tabla si nunca se cargó, si cambió su versión compartida o si ya es muy vieja."""
+        ahora = time.monotonic()
+        segundos = getattr(settings, 'CATALOG_VERSION_CHECK_SECONDS', 5)
+        if self.cargado_en is not None and ahora - self._revisado_en <= segundos:
+            return
+        version = cache.get(self.clave_version)
+        self._revisado_en = ahora
+        edad_maxima = getattr(settings, 'CATALOG_MAX_AGE_SECONDS', 300)
+        if self.cargado_en is None or version != self._version or ahora - self.cargado_en > edad_maxima:
+            self._cargar(version)
+
+    def _cargar(self, version):
+        filas = list(self.model.objects.all())
+        with self._lock:
+            # Se cambian juntos, así una lectura nunca ve un índice viejo con el otro nuevo
+            self._por_id = {fila.pk: fila for fila in filas}
+            self._por_nombre = {getattr(fila, self.campo_nombre): fila for fila in filas}
+            self._version = version
+            self.cargado_en = self._revisado_en = time.monotonic()
+
+    def _buscar(self, indice, clave):
+        self._vigente()
+        fila = getattr(self, indice).get(clave)
+        if fila is None and self._puede_recargar_por_falta():
+            # Puede ser una fila nueva que otro worker creó hace menos de
+            # CATALOG_VERSION_CHECK_SECONDS: recargamos una vez antes de rendirnos.
+            # Como mucho una vez en ese tiempo: un id inventado repetido no
+            # hace un SELECT de toda la tabla en cada petición.
+            self._cargar(cache.get(self.clave_version))
+            fila = getattr(self, indice).get(clave)
+        return fila
+
+    def _puede_recargar_por_falta(self):
+        ahora = time.monotonic()
+        segundos = getattr(settings, 'CATALOG_VERSION_CHECK_SECONDS', 5)
+        with self._lock:
+            if self._recargado_por_falta_en is not None and ahora - self._recargado_por_falta_en <= segundos:
+                return False
+            self._recargado_por_falta_en = ahora
+        return True
+
+    def get(self, pk):
+        """La fila con ese id. Lanza model.DoesNotExist si no existe."""
+        fila = self._buscar('_por_id', pk)
+        if fila is None:
+            raise self.model.DoesNotExist(f"{self.model.__name__} con id {pk} no existe")
+        return fila
+
+    def by_name(self, nombre):
+        """La fila con ese nombre. Lanza model.DoesNotExist si no existe."""
+        fila = self._buscar('_por_nombre', nombre)
+        if fila is None:
+            raise self.model.DoesNotExist(f"{self.model.__name__} '{nombre}' no existe")
+        return fila
+
+    def all(self):
+        """Todas las filas, ordenadas por id."""
+        self._vigente()
+        return [self._por_id[pk] for pk in sorted(self._por_id)]
+
+    def invalidar(self):
+        """
+        La tabla cambió: este worker recarga en el próximo uso, y los demás
+        cuando vean la nueva versión. La versión se cambia después del commit:
+        antes, otro worker podría recargar los datos viejos con la versión nueva.
+        """
+        self.cargado_en = self._recargado_por_falta_en = None
+        transaction.on_commit(self._nueva_version)
+
+    def _nueva_version(self):
+        cache.set(self.clave_version, uuid.uuid4().hex, None)
+
+
+roles = Catalog(Role)
+payment_method_types = Catalog(PaymentMethodType)
+
+CATALOGOS = {Role: roles, PaymentMethodType: payment_method_types}
@@ -0,0 +1,234 @@
+"""
+Utilidades geoespaciales para encontrar conductores cercanos.
+
+Dividimos el mapa en una grilla de celdas de tamaño fijo (en grados).
+Cada conductor "en línea" vive en una celda, así que para buscar a los
+más cercanos solo revisamos las celdas alrededor del pasajero en vez de
+recorrer todos los perfiles.
+
+La misma celda se guarda en la columna indexada `UserProfile.grid_cell`,
+para poder hacer la búsqueda también desde la base de datos.
+"""
+import heapq
+import math
+import threading
+import time
+
+from django.conf import settings
+
+RADIO_TIERRA_KM = 6371.0088
+KM_POR_GRADO = 111.195
+
+# ~1.1 km por celda. OJO: si se cambia, hay que recalcular 'grid_cell' en la BD.
+TAMANO_CELDA_GRADOS = getattr(settings, 'DRIVER_GRID_CELL_DEG', 0.01)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Distancia en km entre dos puntos (lat/lng en grados)."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
+
+
+def celda_de(lat, lng, tamano=TAMANO_CELDA_GRADOS):
+    """Devuelve la celda (fila, columna) de la grilla para una coordenada."""
+    return (math.floor(float(lat) / tamano), math.floor(float(lng) / tamano))
+
+
+def clave_celda(lat, lng, tamano=TAMANO_CELDA_GRADOS):
+    """
+    Celda en formato texto ("fila:columna") para guardarla en la BD.
+    Si no hay coordenadas, devuelve None.
+    """
+    if lat is None or lng is None:
+        return None
+    fila, columna = celda_de(lat, lng, tamano)
+    return f"{fila}:{columna}"
+
+
+def _km_por_celda(lat, radio_km, tamano):
+    """
+    Ancho mínimo (en km) de una celda alrededor de 'lat'.
+    Las celdas se "angostan" hacia los polos, así que usamos el peor caso
+    dentro del radio de búsqueda para no saltarnos a nadie.
+    """
+    lat_extrema = min(89.9, abs(lat) + radio_km / KM_POR_GRADO)
+    return tamano * KM_POR_GRADO * math.cos(math.radians(lat_extrema))
+
+
+def _anillo(fila, columna, r):
+    """Celdas que están exactamente a 'r' celdas de distancia (un "anillo")."""
+    if r == 0:
+        yield (fila, columna)
+        return
+    for dc in range(-r, r + 1):
+        yield (fila - r, columna + dc)
+        yield (fila + r, columna + dc)
+    for df in range(-r + 1, r):
+        yield (fila + df, columna - r)
+        yield (fila + df, columna + r)
+
+
+def celdas_en_radio(lat, lng, radio_km, tamano=TAMANO_CELDA_GRADOS):
+    """Todas las claves de celda que pueden tener puntos dentro del radio."""
+    fila, columna = celda_de(lat, lng, tamano)
+    max_anillo = math.ceil(radio_km / _km_por_celda(lat, radio_km, tamano)) + 1
+    return [
+        f"{f}:{c}"
+        for r in range(max_anillo + 1)
+        for f, c in _anillo(fila, columna, r)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# ÍNDICE EN MEMORIA DE CONDUCTORES EN LÍNEA
+# ---------------------------------------------------------------------------
+class DriverGridIndex:
+    """
+    Índice en memoria: celda -> {profile_id: (lat, lng)}.
+    Responde "los k conductores más cercanos" revisando anillos de celdas
+    desde el centro hacia afuera, y se detiene apenas ningún anillo más
+    lejano pueda mejorar el resultado.
+    """
+
+    def __init__(self, tamano_celda=TAMANO_CELDA_GRADOS):
+        self.tamano_celda = tamano_celda
+        self._celdas = {}
+        self._posiciones = {}
+        self._lock = threading.Lock()
+        self.cargado_en = None
+
+    def __len__(self):
+        return len(self._posiciones)
+
+    def __contains__(self, profile_id):
+        return profile_id in self._posiciones
+
+    def upsert(self, profile_id, lat, lng):
+        """Agrega o mueve a un conductor."""
+        lat, lng = float(lat), float(lng)
+        celda = celda_de(lat, lng, self.tamano_celda)
+        with self._lock:
+            anterior = self._posiciones.get(profile_id)
+            if anterior is not None and anterior[2] != celda:
+                self._sacar_de_celda(profile_id, anterior[2])
+            self._celdas.setdefault(celda, {})[profile_id] = (lat, lng)
+            self._posiciones[profile_id] = (lat, lng, celda)
+
+    def remove(self, profile_id):
+        """Saca a un conductor del índice (ej. se desconectó)."""
+        with self._lock:
+            anterior = self._posiciones.pop(profile_id, None)
+            if anterior is not None:
+                self._sacar_de_celda(profile_id, anterior[2])
+
+    def _sacar_de_celda(self, profile_id, celda):
+        conductores = self._celdas.get(celda)
+        if conductores is not None:
+            conductores.pop(profile_id, None)
+            if not conductores:
+                del self._celdas[celda]
+
+    def reemplazar(self, filas):
+        """Reconstruye todo el índice a partir de (profile_id, lat, lng)."""
+        celdas, posiciones = {}, {}
+        for profile_id, lat, lng in filas:
+            lat, lng = float(lat), float(lng)
+            celda = celda_de(lat, lng, self.tamano_celda)
+            celdas.setdefault(celda, {})[profile_id] = (lat, lng)
+            posiciones[profile_id] = (lat, lng, celda)
+        with self._lock:
+            self._celdas, self._posiciones = celdas, posiciones
+            self.cargado_en = time.monotonic()
+
+    def nearest(self, lat, lng, radio_km, k, excluir=()):
+        """
+        Devuelve hasta 'k' tuplas (profile_id, distancia_km), de la más
+        cercana a la más lejana, solo dentro de 'radio_km'.
+        """
+        lat, lng = float(lat), float(lng)
+        fila, columna = celda_de(lat, lng, self.tamano_celda)
+        km_celda = _km_por_celda(lat, radio_km, self.tamano_celda)
+        max_anillo = math.ceil(radio_km / km_celda) + 1
+
+        # Max-heap (con distancias negativas) de los k mejores hasta ahora
+        mejores = []
+        celdas = self._celdas
+        for r in range(max_anillo + 1):
+            # Todo punto del anillo 'r' está al menos a (r - 1) celdas
+            if len(mejores) == k and -mejores[0][0] <= (r - 1) * km_celda:
+                break
+            for celda in _anillo(fila, columna, r):
+                conductores = celdas.get(celda)
+                if not conductores:
+                    continue
+                for profile_id, (plat, plng) in list(conductores.items()):
+                    if profile_id in excluir:
+                        continue
+                    distancia = haversine_km(lat, lng, plat, plng)
+                    if distancia > radio_km:
+                        continue
+                    if len(mejores) < k:
+                        heapq.heappush(mejores, (-distancia, profile_id))
+                    elif distancia < -mejores[0][0]:
+                        heapq.heapreplace(mejores, (-distancia, profile_id))
+
+        return [(pid, -d) for d, pid in sorted(mejores, reverse=True)]
+
+
+# Índice compartido por todo el proceso (cada worker de gunicorn tiene el suyo)
+driver_index = DriverGridIndex()
+
+
+def _filas_conductores_activos():
+    from .models import UserProfile  # Import aquí para evitar imports circulares
+    return UserProfile.objects.filter(
+        is_active_for_service=True,
+        current_latitude__isnull=False,
+        current_longitude__isnull=False,
+    ).values_list('id', 'current_latitude', 'current_longitude')
+
+
+def refresh_driver_index(force=False):
+    """
+    Recarga el índice desde la BD si nunca se cargó o si ya está "viejo".
+    Así cada worker ve también los cambios hechos por los otros workers.
+    """
+    segundos = getattr(settings, 'DRIVER_INDEX_REFRESH_SECONDS', 30)
+    cargado_en = driver_index.cargado_en
+    if force or cargado_en is None or time.monotonic() - cargado_en > segundos:
+        driver_index.reemplazar(_filas_conductores_activos().iterator(chunk_size=5000))
+
+
+def nearest_available_drivers(lat, lng, radius=5.0, k=10, exclude=()):
+    """
+    Los 'k' conductores en línea más cercanos a (lat, lng) dentro de
+    'radius' km, usando el índice en memoria.
+    Devuelve una lista de (profile_id, distancia_km).
+    """
+    refresh_driver_index()
+    return driver_index.nearest(lat, lng, radius, k, excluir=set(exclude))
+
+
+def nearest_available_drivers_db(lat, lng, radius=5.0, k=10, exclude=()):
+    """
+    Igual que nearest_available_drivers(), pero consultando la BD a través
+    del índice (is_active_for_service, grid_cell). Útil cuando el índice en
+    memoria no está disponible (ej. scripts o comandos de management).
+    """
+    filas = _filas_conductores_activos().filter(
+        grid_cell__in=celdas_en_radio(lat, lng, radius)
+    ).exclude(id__in=list(exclude))
+    lat, lng = float(lat), float(lng)
+    candidatos = (
+        (pid, haversine_km(lat, lng, float(plat), float(plng)))
+        for pid, plat, plng in filas
+    )
+    return heapq.nsmallest(
+        k,
+        (c for c in candidatos if c[1] <= radius),
+        key=lambda c: c[1],
+    )
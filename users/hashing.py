@@ -0,0 +1,190 @@
+"""
+Hash de contraseñas con costo configurable y con un límite de concurrencia.
+
+1. Costo: TunedPBKDF2PasswordHasher lee las iteraciones de
+   PASSWORD_PBKDF2_ITERATIONS. Más iteraciones = más difícil de romper,
+   pero cada login/registro ocupa la CPU más tiempo (medirlo con
+   manage.py benchmark_password_hashers). Al cambiarlo, cada contraseña
+   se vuelve a calcular con el nuevo costo en el siguiente login.
+
+2. Límite: los hashes se calculan en un pool de PASSWORD_HASHING_WORKERS
+   hilos por proceso (PBKDF2 suelta el GIL, así que corren en paralelo de
+   verdad). Si ya hay PASSWORD_HASHING_QUEUE esperando, no se encola uno
+   más: se responde 429 al momento (HashingSaturated) en vez de dejar
+   a todo el worker esperando detrás de una ráfaga de logins.
+
+3. ASGI: con uvicorn, Django corre TODAS las vistas síncronas de un worker
+   en un mismo hilo. Si una vista síncrona esperara su hash, ese hilo
+   (y con él todas las demás vistas del worker) quedaría parado. Por eso
+   las vistas que calculan hashes (login, registro, cambio de contraseña;
+   ver users/views.py) son async: antes de correr la vista normal calculan
+   los hashes que va a necesitar con await precompute(...) en el pool, y
+   run() los toma ya hechos (dentro de precomputed_hashes()). Lo que no se precalculó (ej. el login del
+   admin) se calcula en el momento, como antes.
+"""
+import asyncio
+import contextlib
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    check_password,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con las iteraciones de PASSWORD_PBKDF2_ITERATIONS (mismo formato que el de Django)."""
+
+    @property
+    def iterations(self):
+        return getattr(settings, 'PASSWORD_PBKDF2_ITERATIONS', PBKDF2PasswordHasher.iterations)
+
+
+class HashingSaturated(APIException):
+    status_code = status.HTTP_429_TOO_MANY_REQUESTS
+    default_detail = "Hay demasiados inicios de sesión en este momento. Intenta de nuevo en unos segundos."
+    default_code = 'hashing_saturated'
+
+
+class HashingPool:
+    """
+    Pool de hilos con cupo: 'workers' hashes a la vez y hasta 'cola' esperando.
+    Se crea uno por proceso (gunicorn hace fork: los hilos del padre no existen en los workers).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._cupos = None
+        self._pid = None
+
+    def _preparar(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', 2)
+            cola = getattr(settings, 'PASSWORD_HASHING_QUEUE', 8)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='hashing')
+            self._cupos = threading.BoundedSemaphore(workers + cola)
+            self._pid = os.getpid()
+
+    def reiniciar(self):
+        """Vuelve a leer la configuración (el próximo uso crea otro pool)."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor, self._cupos, self._pid = None, None, None
+
+    def run(self, funcion, *args):
+        """
+        Corre funcion(*args) en el pool y espera el resultado (o lo toma de
+        precompute(), si ya se calculó). Lanza HashingSaturated si no hay cupo.
+        """
+        precalculados = _precalculados.get()
+        if precalculados is not None and (funcion, args) in precalculados:
+            return precalculados[(funcion, args)]
+        self._preparar()
+        cupos = self._cupos
+        if not cupos.acquire(blocking=False):
+            raise HashingSaturated()
+        try:
+            return self._executor.submit(funcion, *args).result()
+        finally:
+            cupos.release()
+
+    async def run_async(self, funcion, *args):
+        """Como run(), pero se espera con await: no ocupa ningún hilo mientras tanto."""
+        self._preparar()
+        cupos = self._cupos
+        if not cupos.acquire(blocking=False):
+            raise HashingSaturated()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, funcion, *args)
+        finally:
+            cupos.release()
+
+
+hashing_pool = HashingPool()
+
+# {(funcion, args): resultado} ya calculados para la petición actual
+_precalculados = contextvars.ContextVar('hashes_precalculados', default=None)
+
+
+@contextlib.contextmanager
+def precomputed_hashes():
+    """
+    Los hashes de precompute() valen solo dentro de este bloque (una
+    petición): al salir se olvidan, aunque el contexto siga vivo.
+    """
+    token = _precalculados.set({})
+    try:
+        yield
+    finally:
+        _precalculados.reset(token)
+
+
+async def precompute(funcion, *args):
+    """
+    Calcula funcion(*args) en el pool (con await) y lo deja listo para que
+    hashing_pool.run() lo use sin volver a calcularlo, dentro del bloque
+    precomputed_hashes() (también en el código síncrono que se llama desde
+    ahí con sync_to_async). Devuelve el resultado.
+    """
+    resultado = await hashing_pool.run_async(funcion, *args)
+    precalculados = _precalculados.get()
+    if precalculados is not None:
+        precalculados[(funcion, args)] = resultado
+    return resultado
+
+
+def _verificar(raw_password, encoded):
+    """(¿es correcta?, ¿hay que recalcular el hash con el costo actual?)"""
+    if not check_password(raw_password, encoded):
+        return False, False
+    hasher = identify_hasher(encoded)
+    preferido = get_hasher('default')
+    return True, hasher.algorithm != preferido.algorithm or preferido.must_update(encoded)
+
+
+def hash_password(raw_password):
+    """El hash (para User.password) calculado en el pool."""
+    return hashing_pool.run(make_password, raw_password)
+
+
+async def prepare_hash_password(raw_password):
+    """Precalcula (con await) lo que va a devolver hash_password(raw_password) en esta petición."""
+    return await precompute(make_password, raw_password)
+
+
+async def prepare_verify_password(encoded, raw_password):
+    """
+    Precalcula verify_password() contra el hash guardado 'encoded' (y el
+    hash nuevo, si hay que actualizar su costo). Devuelve si es correcta.
+    """
+    correcta, recalcular = await precompute(_verificar, raw_password, encoded)
+    if correcta and recalcular:
+        await prepare_hash_password(raw_password)
+    return correcta
+
+
+def verify_password(user, raw_password):
+    """
+    Como user.check_password(), pero el hash se calcula en el pool.
+    Si el hash guardado usa otro costo, lo actualiza (como hace Django).
+    """
+    correcta, recalcular = hashing_pool.run(_verificar, raw_password, user.password)
+    if correcta and recalcular:
+        user.password = hash_password(raw_password)
+        user.save(update_fields=['password'])
+    return correcta
@@ -0,0 +1,96 @@
+"""
+Ingesta de ubicaciones (pings GPS) de los conductores.
+
+Los pings se guardan en memoria (solo el más reciente por perfil) y se
+escriben a la BD en lote cada LOCATION_FLUSH_INTERVAL_MS con un único
+bulk_update (UPDATE ... CASE). No se llama a save(), así que no se
+dispara ningún post_save ni se toca 'updated_at'.
+
+Cuál ping es "más reciente" se decide por su 'timestamp', que manda el
+celular: por eso nunca se acepta uno del futuro (se toma la hora del
+servidor), y el buffer recuerda la hora del último ping que escribió de
+cada perfil, para que uno atrasado que llega después del vaciado no pise
+en la BD una ubicación más nueva.
+"""
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from backend_project.realtime import canal_conductor, publish_now
+from .buffers import CoalescingBuffer
+from .geo import clave_celda, driver_index
+from .models import UserProfile
+
+
+class LocationPingBuffer(CoalescingBuffer):
+    """Buffer {profile_id: (lat, lng, timestamp)}."""
+
+    MAXIMO_ESCRITOS = 100_000
+
+    def __init__(self):
+        super().__init__()
+        self._escritos = {}  # {profile_id: timestamp del último ping escrito}
+        self._lock_escritos = threading.Lock()
+
+    def add(self, key, value):
+        escrito = self._escritos.get(key)
+        if escrito is not None and value[2] < escrito:
+            return False  # Llegó tarde: la BD ya tiene uno más nuevo
+        return super().add(key, value)
+
+    def flush_interval(self):
+        return getattr(settings, 'LOCATION_FLUSH_INTERVAL_MS', 1000) / 1000
+
+    def is_newer(self, nuevo, actual):
+        return nuevo[2] >= actual[2]
+
+    def write(self, items):
+        perfiles = [
+            UserProfile(
+                id=profile_id,
+                current_latitude=lat,
+                current_longitude=lng,
+                grid_cell=clave_celda(lat, lng),
+            )
+            for profile_id, (lat, lng, _) in items.items()
+        ]
+        UserProfile.objects.bulk_update(
+            perfiles,
+            ['current_latitude', 'current_longitude', 'grid_cell'],
+            batch_size=getattr(settings, 'LOCATION_FLUSH_BATCH_SIZE', 1000),
+        )
+        with self._lock_escritos:
+            if len(self._escritos) + len(items) > self.MAXIMO_ESCRITOS:
+                self._escritos.clear()  # Se vuelven a llenar de a poco
+            self._escritos.update((profile_id, ts) for profile_id, (_, _, ts) in items.items())
+
+
+location_buffer = LocationPingBuffer()
+
+
+def record_location_pings(profile_id, pings):
+    """
+    Registra uno o varios pings (lat, lng, timestamp) de un perfil.
+    Solo el más reciente llega a la BD; el índice de conductores cercanos
+    de este proceso y los websockets de sus viajes se actualizan al instante.
+    Los timestamps del futuro se toman como la hora del servidor.
+    Devuelve el ping que quedó vigente (o None si todos eran viejos).
+    """
+    if not pings:
+        return None
+    ahora = timezone.now()
+    pings = [(lat, lng, min(ts, ahora)) for lat, lng, ts in pings]
+    # Con timestamps iguales gana el último del lote
+    ultimo = max(reversed(pings), key=lambda p: p[2])
+    if not location_buffer.add(profile_id, ultimo):
+        return None
+    if profile_id in driver_index:
+        driver_index.upsert(profile_id, ultimo[0], ultimo[1])
+    # A los websockets de sus viajes (no toca la BD: se publica ya, sin esperar al flush)
+    lat, lng, ts = ultimo
+    publish_now(canal_conductor(profile_id), {
+        'tipo': 'ubicacion', 'conductor': profile_id, 'lat': float(lat), 'lng': float(lng),
+        'ts': ts.isoformat() if hasattr(ts, 'isoformat') else ts,
+    })
+    return ultimo
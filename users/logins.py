@@ -0,0 +1,44 @@
+"""
+Registro del "último login" de los usuarios.
+
+simplejwt (con UPDATE_LAST_LOGIN) hace un UPDATE de auth_user dentro de
+cada login, antes de responder. En los picos de la mañana son miles de
+UPDATEs por minuto en el camino del login. Aquí el login solo anota la hora
+en memoria; un hilo la escribe a la BD en lote cada LAST_LOGIN_FLUSH_INTERVAL_SECONDS
+con un único bulk_update (sin save(), así que no dispara signals).
+
+Si el mismo usuario entra varias veces entre dos vaciados, se escribe una
+sola vez (la más reciente). Si el worker muere de golpe se puede perder el
+último intervalo: es un dato informativo, no hace falta más.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .buffers import CoalescingBuffer
+
+
+class LastLoginBuffer(CoalescingBuffer):
+    """Buffer {user_id: fecha del último login}."""
+
+    def flush_interval(self):
+        return getattr(settings, 'LAST_LOGIN_FLUSH_INTERVAL_SECONDS', 10)
+
+    def is_newer(self, nuevo, actual):
+        return nuevo >= actual
+
+    def write(self, items):
+        User.objects.bulk_update(
+            [User(id=user_id, last_login=fecha) for user_id, fecha in items.items()],
+            ['last_login'],
+            batch_size=getattr(settings, 'LAST_LOGIN_FLUSH_BATCH_SIZE', 1000),
+        )
+
+
+last_login_buffer = LastLoginBuffer()
+
+
+def record_login(user):
+    """Anota que el usuario acaba de entrar (se guarda en el próximo vaciado)."""
+    user.last_login = timezone.now()
+    last_login_buffer.add(user.pk, user.last_login)
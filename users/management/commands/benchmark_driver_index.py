@@ -0,0 +1,64 @@
+import heapq
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.geo import DriverGridIndex, haversine_km, KM_POR_GRADO
+
+
+class Command(BaseCommand):
+    help = "Compara la búsqueda de conductores cercanos: recorrido completo vs. índice de grilla."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drivers', type=int, default=20000, help="Conductores en línea simulados")
+        parser.add_argument('--queries', type=int, default=1000, help="Búsquedas a medir")
+        parser.add_argument('--radius', type=float, default=3.0, help="Radio de búsqueda (km)")
+        parser.add_argument('-k', type=int, default=10, help="Conductores a devolver")
+        parser.add_argument('--spread', type=float, default=15.0, help="Radio de la ciudad simulada (km)")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        # Centro de Moyobamba
+        centro_lat, centro_lng = -6.0346, -76.9717
+        spread = options['spread'] / KM_POR_GRADO
+
+        def punto():
+            return (centro_lat + rng.uniform(-spread, spread), centro_lng + rng.uniform(-spread, spread))
+
+        conductores = [(i, *punto()) for i in range(options['drivers'])]
+        consultas = [punto() for _ in range(options['queries'])]
+        radio, k = options['radius'], options['k']
+
+        indice = DriverGridIndex()
+        inicio = time.perf_counter()
+        indice.reemplazar(conductores)
+        carga = time.perf_counter() - inicio
+
+        def recorrido_completo(lat, lng):
+            candidatos = ((pid, haversine_km(lat, lng, plat, plng)) for pid, plat, plng in conductores)
+            return heapq.nsmallest(k, (c for c in candidatos if c[1] <= radio), key=lambda c: c[1])
+
+        inicio = time.perf_counter()
+        esperados = [recorrido_completo(lat, lng) for lat, lng in consultas]
+        t_naive = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        obtenidos = [indice.nearest(lat, lng, radio, k) for lat, lng in consultas]
+        t_indice = time.perf_counter() - inicio
+
+        distintos = sum(
+            1 for a, b in zip(esperados, obtenidos) if [p for p, _ in a] != [p for p, _ in b]
+        )
+
+        n = len(consultas)
+        self.stdout.write(f"Conductores: {len(conductores)} | Búsquedas: {n} | Radio: {radio} km | k: {k}")
+        self.stdout.write(f"Carga del índice:       {carga * 1000:.1f} ms")
+        self.stdout.write(f"Recorrido completo:     {t_naive / n * 1000:.3f} ms/búsqueda")
+        self.stdout.write(f"Índice de grilla:       {t_indice / n * 1000:.3f} ms/búsqueda")
+        self.stdout.write(f"Aceleración:            x{t_naive / t_indice:.1f}")
+        if distintos:
+            self.stdout.write(self.style.WARNING(f"Resultados distintos en {distintos} búsquedas"))
+        else:
+            self.stdout.write(self.style.SUCCESS("Ambos métodos devuelven los mismos conductores."))
@@ -0,0 +1,151 @@
+import asyncio
+import json
+import os
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from users.hashing import hashing_pool
+
+CLAVE = 'clave-de-prueba-123'
+LIVIANAS = 10  # Peticiones a otra vista durante la ráfaga
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el costo del hash de contraseñas para varios valores de "
+        "PASSWORD_PBKDF2_ITERATIONS (ms por hash y hashes por segundo con varios hilos), "
+        "y cómo responde el servidor a una ráfaga de logins (cuántos 429, y si las "
+        "demás vistas se frenan). La ráfaga solo lee la BD."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, nargs='+', default=[100_000, 300_000, 600_000, 1_000_000],
+                            help="Iteraciones de PBKDF2 a comparar")
+        parser.add_argument('--hashes', type=int, default=20, help="Hashes a medir por configuración")
+        parser.add_argument('--threads', type=int, default=None,
+                            help="Hilos en paralelo (por defecto PASSWORD_HASHING_WORKERS)")
+        parser.add_argument('--burst', type=int, default=50, help="Logins simultáneos en la prueba de ráfaga")
+        parser.add_argument('--url', default=None,
+                            help="Servidor al que mandar la ráfaga (ej. http://localhost:8086); "
+                                 "por defecto la app ASGI en este proceso")
+
+    def handle(self, *args, **options):
+        hilos = options['threads'] or settings.PASSWORD_HASHING_WORKERS
+        n = options['hashes']
+        self.stdout.write(f"CPUs: {os.cpu_count()} | Hilos: {hilos} | Hashes por prueba: {n}")
+        self.stdout.write(f"{'Iteraciones':>12} {'ms/hash':>9} {'hashes/s (1 hilo)':>18} {f'hashes/s ({hilos} hilos)':>18}")
+
+        for iteraciones in options['iterations']:
+            with override_settings(PASSWORD_PBKDF2_ITERATIONS=iteraciones):
+                inicio = time.perf_counter()
+                for _ in range(n):
+                    make_password(CLAVE)
+                uno = time.perf_counter() - inicio
+
+                with ThreadPoolExecutor(max_workers=hilos) as pool:
+                    inicio = time.perf_counter()
+                    list(pool.map(make_password, [CLAVE] * n))
+                    varios = time.perf_counter() - inicio
+
+            marca = "  <- actual" if iteraciones == settings.PASSWORD_PBKDF2_ITERATIONS else ""
+            self.stdout.write(
+                f"{iteraciones:>12} {uno / n * 1000:>9.1f} {n / uno:>18.1f} {n / varios:>18.1f}{marca}"
+            )
+
+        self._clientes = ThreadPoolExecutor(max_workers=options['burst'] + LIVIANAS)
+        try:
+            self._rafaga(options['burst'], options['url'])
+        finally:
+            self._clientes.shutdown()
+
+    def _rafaga(self, cantidad, url=None):
+        """
+        Muchos logins a la vez contra el servidor (la app ASGI que corre
+        uvicorn, o el servidor de --url), y mientras tanto peticiones livianas
+        a otra vista síncrona: los logins que no entran al pool reciben 429
+        al momento, y las demás vistas no deberían esperar a los hashes.
+        Los logins son de un usuario que no existe: solo se lee la BD.
+        """
+        hashing_pool.reiniciar()
+        pedir = self._pedir_http if url else self._pedir_asgi
+        login = ('/api/users/token/', {'username': 'benchmark@no-existe.invalid', 'password': CLAVE})
+        liviana = ('/api/users/token/refresh/', {'refresh': 'no-es-un-token'})  # Vista síncrona, 401 sin BD ni hash
+        resultados = asyncio.run(self._en_paralelo(pedir, url, [login] * cantidad, [liviana] * LIVIANAS))
+
+        logins, livianas = resultados[:cantidad], resultados[cantidad:]
+        atendidos = sorted(t for codigo, t in logins if codigo != 429)
+        rechazados = [t for codigo, t in logins if codigo == 429]
+        cupo = settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE
+        self.stdout.write(
+            f"Ráfaga de {cantidad} logins contra {url or 'la app ASGI (en proceso)'} (cupo: "
+            f"{settings.PASSWORD_HASHING_WORKERS} hilos + {settings.PASSWORD_HASHING_QUEUE} en cola = {cupo}):"
+        )
+        self.stdout.write(
+            f"  atendidos: {len(atendidos)} (el más lento esperó {atendidos[-1] * 1000:.0f} ms)"
+            if atendidos else "  atendidos: 0"
+        )
+        if rechazados:
+            self.stdout.write(f"  429 inmediatos: {len(rechazados)} (en {max(rechazados) * 1000:.1f} ms como mucho)")
+        self.stdout.write(
+            f"  {len(livianas)} peticiones a otra vista durante la ráfaga: "
+            f"la más lenta tardó {max(t for _, t in livianas) * 1000:.1f} ms"
+        )
+
+    async def _en_paralelo(self, pedir, url, logins, livianas):
+        tareas = [asyncio.ensure_future(pedir(url, *peticion)) for peticion in logins]
+        await asyncio.sleep(0.01)  # Que los logins ya estén ocupando el pool
+        tareas += [asyncio.ensure_future(pedir(url, *peticion)) for peticion in livianas]
+        return await asyncio.gather(*tareas)
+
+    async def _pedir_asgi(self, url, ruta, datos):
+        """POST a la app ASGI, igual que lo haría uvicorn. Devuelve (código, segundos)."""
+        from backend_project.asgi import application
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h not in ('*', '')), 'localhost').lstrip('.')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'POST',
+            'scheme': 'http', 'path': ruta, 'raw_path': ruta.encode(), 'query_string': b'', 'root_path': '',
+            'headers': [(b'host', host.encode()), (b'content-type', b'application/json')],
+            'client': ('127.0.0.1', 0), 'server': (host, 80),
+        }
+        cuerpo = [{'type': 'http.request', 'body': json.dumps(datos).encode(), 'more_body': False}]
+        desconectado = asyncio.Event()
+        respuesta = {}
+
+        async def receive():
+            if cuerpo:
+                return cuerpo.pop()
+            await desconectado.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(mensaje):
+            if mensaje['type'] == 'http.response.start':
+                respuesta['codigo'] = mensaje['status']
+
+        inicio = time.perf_counter()
+        await application(scope, receive, send)
+        desconectado.set()
+        return respuesta['codigo'], time.perf_counter() - inicio
+
+    async def _pedir_http(self, url, ruta, datos):
+        """POST por HTTP a un servidor de verdad (en un hilo: urllib bloquea). Devuelve (código, segundos)."""
+        def pedir():
+            peticion = urllib.request.Request(
+                url.rstrip('/') + ruta, data=json.dumps(datos).encode(), method='POST',
+                headers={'Content-Type': 'application/json'},
+            )
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+                    codigo = respuesta.status
+            except urllib.error.HTTPError as e:
+                codigo = e.code
+            return codigo, time.perf_counter() - inicio
+        return await asyncio.get_running_loop().run_in_executor(self._clientes, pedir)
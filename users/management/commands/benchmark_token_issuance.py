@@ -0,0 +1,100 @@
+import threading
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, update_last_login
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from users.authentication import PerfilTokenObtainPairSerializer
+from users.logins import last_login_buffer
+from users.models import UserProfile
+
+PREFIJO = 'bench-login-'
+CLAVE = 'clave-de-prueba'
+
+
+class LoginConUpdate(TokenObtainPairSerializer):
+    """El login de antes: UPDATE de auth_user dentro de cada login (UPDATE_LAST_LOGIN=True)."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        update_last_login(None, self.user)
+        return data
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide cuántos tokens por segundo emite el login con varios hilos a la vez: "
+        "con el UPDATE de last_login en cada login vs. anotándolo en memoria y "
+        "guardándolo en lote. Para que se note el costo de la escritura, las claves "
+        "de prueba usan un hasher rápido. Crea usuarios temporales: ¡usar en staging!"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help="Usuarios distintos que entran")
+        parser.add_argument('--threads', type=int, default=8, help="Logins en paralelo (como workers)")
+        parser.add_argument('--logins', type=int, default=200, help="Logins por hilo")
+        parser.add_argument('--keep', action='store_true', help="No borrar los datos creados")
+
+    def handle(self, *args, **options):
+        # El costo del hash (ver benchmark_password_hashers) taparía lo que queremos medir
+        with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+            self._limpiar()
+            clave = make_password(CLAVE)
+            users = User.objects.bulk_create([
+                User(username=f'{PREFIJO}{i}', password=clave) for i in range(options['users'])
+            ])
+            # El signal de User no corre con bulk_create: creamos los perfiles nosotros
+            UserProfile.objects.bulk_create([
+                UserProfile(user=u, full_name=u.username, phone=f'{PREFIJO}{u.id}') for u in users
+            ])
+            usernames = [u.username for u in users]
+
+            antes = self._medir(LoginConUpdate, usernames, options)
+            last_login_buffer.drain()
+            ahora = self._medir(PerfilTokenObtainPairSerializer, usernames, options)
+            pendientes = len(last_login_buffer)
+            inicio = time.perf_counter()
+            last_login_buffer.flush()
+            vaciado = time.perf_counter() - inicio
+
+        total = options['threads'] * options['logins']
+        self.stdout.write(f"Logins: {total} ({options['threads']} hilos, {len(usernames)} usuarios)")
+        self.stdout.write(f"UPDATE en cada login:   {total / antes:.0f} tokens/s")
+        self.stdout.write(f"En memoria + lote:      {total / ahora:.0f} tokens/s (x{antes / ahora:.1f})")
+        self.stdout.write(f"Vaciado del lote:       {pendientes} usuarios en {vaciado * 1000:.1f} ms (un bulk_update)")
+
+        if not options['keep']:
+            self._limpiar()
+
+    def _medir(self, serializer_class, usernames, options):
+        barrera = threading.Barrier(options['threads'])
+        errores = []
+
+        def hilo(n):
+            try:
+                barrera.wait()
+                for i in range(options['logins']):
+                    username = usernames[(n + i * options['threads']) % len(usernames)]
+                    serializer = serializer_class(data={'username': username, 'password': CLAVE})
+                    if not serializer.is_valid():
+                        errores.append(serializer.errors)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=hilo, args=(n,)) for n in range(options['threads'])]
+        inicio = time.perf_counter()
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        duracion = time.perf_counter() - inicio
+        if errores:
+            self.stdout.write(self.style.ERROR(f"{len(errores)} logins fallaron, ej.: {errores[0]}"))
+        return duracion
+
+    def _limpiar(self):
+        User.objects.filter(username__startswith=PREFIJO).delete()
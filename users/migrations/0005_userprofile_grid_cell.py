@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:31
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Copia fija de users.geo.clave_celda (tamaño de celda de 0.01°): la migración
+# no debe cambiar si después cambia el código de la app.
+TAMANO_CELDA_GRADOS = 0.01
+
+
+def clave_celda(lat, lng):
+    fila = math.floor(float(lat) / TAMANO_CELDA_GRADOS)
+    columna = math.floor(float(lng) / TAMANO_CELDA_GRADOS)
+    return f"{fila}:{columna}"
+
+
+def calcular_celdas(apps, schema_editor):
+    UserProfile = apps.get_model('users', 'UserProfile')
+    perfiles = UserProfile.objects.filter(current_latitude__isnull=False, current_longitude__isnull=False)
+    lote = []
+    for perfil in perfiles.only('id', 'current_latitude', 'current_longitude').iterator(chunk_size=2000):
+        perfil.grid_cell = clave_celda(perfil.current_latitude, perfil.current_longitude)
+        lote.append(perfil)
+        if len(lote) >= 2000:
+            UserProfile.objects.bulk_update(lote, ['grid_cell'])
+            lote = []
+    if lote:
+        UserProfile.objects.bulk_update(lote, ['grid_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_userprofile_average_rating_userprofile_total_ratings'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='grid_cell',
+            field=models.CharField(blank=True, editable=False, max_length=24, null=True, verbose_name='Celda de Ubicación'),
+        ),
+        migrations.AddIndex(
+            model_name='userprofile',
+            index=models.Index(fields=['is_active_for_service', 'grid_cell'], name='profile_active_cell_idx'),
+        ),
+        migrations.RunPython(calcular_celdas, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:11
+
+from django.db import migrations, models
+
+
+def vacios_a_nulo(apps, schema_editor):
+    # El registro guardaba phone='' (y por ser único, solo funcionaba para el primer usuario)
+    UserProfile = apps.get_model('users', 'UserProfile')
+    UserProfile.objects.filter(phone='').update(phone=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_userprofile_rating_sum'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userprofile',
+            name='phone',
+            field=models.CharField(blank=True, max_length=20, null=True, unique=True, verbose_name='Teléfono'),
+        ),
+        migrations.RunPython(vacios_a_nulo, migrations.RunPython.noop),
+    ]
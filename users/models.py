@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User # El auth_user que ya existe
 from django.conf import settings # Para usar el User
+from .geo import clave_celda # Para la búsqueda de conductores cercanos
 
 # Create your models here.
 
@@ -29,7 +30,8 @@ class UserProfile(models.Model):
     
     # Datos obligatorios que pediste para el Cliente
     full_name = models.CharField(max_length=100, verbose_name="Nombre Completo")
-    phone = models.CharField(max_length=20, unique=True, verbose_name="Teléfono")
+    # Nulo hasta que el usuario lo ingresa en "Editar Perfil" (varios NULL no chocan con 'unique')
+    phone = models.CharField(max_length=20, unique=True, null=True, blank=True, verbose_name="Teléfono")
     
     # La relación Muchos-a-Muchos que pediste.
     # Django creará la tabla intermedia (users_userprofile_roles) por ti.
@@ -40,6 +42,9 @@ class UserProfile(models.Model):
     current_latitude = models.DecimalField(max_digits=22, decimal_places=16, null=True, blank=True)
     current_longitude = models.DecimalField(max_digits=22, decimal_places=16, null=True, blank=True)
     is_active_for_service = models.BooleanField(default=False, verbose_name="¿Activo para servicio?") # Ej. Conductor "en línea"
+    # Celda de la grilla donde está el usuario (se calcula sola en save()).
+    # Sirve para buscar conductores cercanos sin recorrer toda la tabla.
+    grid_cell = models.CharField(max_length=24, null=True, blank=True, editable=False, verbose_name="Celda de Ubicación")
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -52,14 +57,29 @@ class UserProfile(models.Model):
         verbose_name="Calificación Promedio"
     )
     total_ratings = models.PositiveIntegerField(default=0, verbose_name="Total de Calificaciones")
+    # Suma de todas las estrellas recibidas. Con esto y 'total_ratings' el
+    # promedio se actualiza en O(1) por reseña (ver reviews/ratings.py).
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name="Suma de Calificaciones")
 
 
     def __str__(self):
         return f"Perfil de {self.user.username} ({self.full_name})"
 
+    def save(self, *args, **kwargs):
+        # Mantenemos la celda sincronizada con la ubicación actual
+        self.grid_cell = clave_celda(self.current_latitude, self.current_longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'current_latitude', 'current_longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'grid_cell'}
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Perfil de Usuario"
         verbose_name_plural = "Perfiles de Usuario"
+        indexes = [
+            # Búsqueda de conductores "en línea" por celda de la grilla
+            models.Index(fields=['is_active_for_service', 'grid_cell'], name='profile_active_cell_idx'),
+        ]
 
 # ---------------------------------------------------------------------------
 # MODELO 3: DATOS DEL CONDUCTOR (CAMPOS OBLIGATORIOS)
@@ -179,10 +199,13 @@ class UserPaymentMethod(models.Model):
     is_default = models.BooleanField(default=False, verbose_name="¿Es método por defecto?")
 
     def __str__(self):
-        if self.payment_type.name == PaymentMethodType.Types.TARJETA:
+        # El tipo sale del catálogo en memoria (sin JOIN ni consulta extra)
+        from .catalogs import payment_method_types  # Import local: catalogs importa este módulo
+        tipo = payment_method_types.get(self.payment_type_id)
+        if tipo.name == PaymentMethodType.Types.TARJETA:
             return f"{self.user_profile.full_name} - {self.card_brand} **** {self.last_four_digits}"
         else:
-            return f"{self.user_profile.full_name} - {self.payment_type.get_name_display()}"
+            return f"{self.user_profile.full_name} - {tipo.get_name_display()}"
 
     class Meta:
         verbose_name = "Método de Pago de Usuario"
@@ -0,0 +1,63 @@
+"""
+Registro de usuarios (Nombre, Correo, Contraseña) en la menor cantidad de consultas.
+
+Antes eran ~8-10 consultas por registro (exists() del correo, get_or_create
+del rol, INSERT del user, UPDATE para el nombre, dos intentos de crear el
+perfil...). Ahora, dentro de una transacción:
+
+    INSERT auth_user              (ya con first_name y el hash)
+    INSERT users_userprofile      (lo crea el signal, con el nombre del user)
+    INSERT users_userprofile_roles (el id del rol sale de la memoria)
+
+El hash se calcula ANTES de abrir la transacción (tarda ~cientos de ms y
+no hace falta tener nada bloqueado mientras tanto). Si el correo ya existe
+no se pregunta antes: lo dice la restricción única del INSERT.
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .catalogs import roles
+from .hashing import hash_password
+from .models import Role, UserProfile
+
+import logging
+logger = logging.getLogger(__name__)
+
+ROL_CLIENTE = "Cliente"
+
+
+class EmailYaRegistrado(ValueError):
+    """Ya hay un usuario con ese correo."""
+
+
+def role_id(nombre):
+    """Id del rol (sale del catálogo en memoria; si el rol falta, se crea)."""
+    try:
+        return roles.by_name(nombre).id
+    except Role.DoesNotExist:
+        pass
+    rol, creado = Role.objects.get_or_create(name=nombre)
+    if creado:
+        logger.warning(f"Rol '{nombre}' no existía, fue creado.")
+    return rol.id
+
+
+def register_user(email, full_name, password, rol=ROL_CLIENTE):
+    """
+    Crea el User, su UserProfile y le asigna el rol. Devuelve el User
+    (con user.profile ya cargado). Lanza EmailYaRegistrado si el correo está en uso.
+    """
+    email = email.lower()
+    user = User(username=email, email=email, first_name=full_name, password=hash_password(password))
+    rid = role_id(rol)
+    try:
+        with transaction.atomic():
+            user.save()  # El signal crea el perfil y lo deja en user.profile
+            UserProfile.roles.through.objects.create(userprofile_id=user.profile.id, role_id=rid)
+    except IntegrityError:
+        # Solo en el camino de error preguntamos si fue por el correo
+        if User.objects.filter(username=email).exists():
+            raise EmailYaRegistrado(email)
+        raise
+    logger.info(f"Usuario registrado: {user.username}")
+    return user
@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import UserProfile, Role
+from .models import UserProfile
+from .hashing import hash_password, verify_password
+from .registration import EmailYaRegistrado, register_user
 from django.db import transaction
 
 import logging
@@ -19,61 +21,17 @@ class RegisterSerializer(serializers.Serializer):
     })
 
     def validate_email(self, value):
-        """Verifica si el email ya existe (el 'username' es el email)"""
-        # Pasamos el email a minúsculas para evitar duplicados
-        normalized_email = value.lower()
-        if User.objects.filter(username=normalized_email).exists():
-            raise serializers.ValidationError("Este correo electrónico ya está registrado.")
-        return normalized_email 
-
-    @transaction.atomic # Asegura que todo se cree junto, o nada
+        """El 'username' es el email, en minúsculas para evitar duplicados."""
+        # Si ya existe no lo preguntamos aquí: lo dice el INSERT (ver users/registration.py)
+        return value.lower()
+
     def create(self, validated_data):
-        logger.info("Iniciando creación de usuario...")
-        
-        # 1. Obtenemos el rol "Cliente". Si no existe, lo creamos.
-        # (En producción, esto se debe crear desde el admin)
-        try:
-            client_role, created = Role.objects.get_or_create(name="Cliente")
-            if created:
-                logger.warning("Rol 'Cliente' no existía, fue creado.")
-        except Exception as e:
-            logger.error(f"Error al obtener/crear rol 'Cliente': {e}")
-            raise serializers.ValidationError("Error interno al configurar el rol de usuario.")
-
-        # 2. Creamos el 'auth_user'
-        # Usamos el email como 'username' para el login
-        try:
-            user = User.objects.create_user(
-                username=validated_data['email'], # email en minúsculas
-                email=validated_data['email'],
-                password=validated_data['password']
-            )
-            # Guardamos el nombre en el 'auth_user' también, es útil
-            user.first_name = validated_data['full_name']
-            user.save()
-            logger.info(f"Usuario 'auth_user' creado: {user.username}")
-        except Exception as e:
-            logger.error(f"Error al crear 'auth_user': {e}")
-            raise serializers.ValidationError("Error interno al crear el usuario.")
-
-        # 3. Creamos el 'UserProfile' (el "corazón")
-        # ¡Nuestro signal 'create_user_wallet' se disparará automáticamente después de esto!
         try:
-            profile = UserProfile.objects.create(
-                user=user,
-                full_name=validated_data['full_name'],
-                phone="" # El teléfono se pedirá después al "Editar Perfil"
+            return register_user(
+                validated_data['email'], validated_data['full_name'], validated_data['password']
             )
-            logger.info(f"Perfil 'UserProfile' creado para: {user.username}")
-        except Exception as e:
-            logger.error(f"Error al crear 'UserProfile': {e}")
-            # Si esto falla, la transacción (atomic) revertirá la creación del 'auth_user'
-            raise serializers.ValidationError("Error interno al crear el perfil de usuario.")
-
-        # 4. Asignamos el rol de "Cliente"
-        profile.roles.add(client_role)
-        
-        return user
+        except EmailYaRegistrado:
+            raise serializers.ValidationError({"email": ["Este correo electrónico ya está registrado."]})
     
 # ---------------------------------------------------------------------------
 # ¡¡¡CÓDIGO NUEVO!!! (Paso 13)
@@ -110,8 +68,10 @@ class UserProfileSerializer(serializers.ModelSerializer):
         # 2. Actualizamos el 'UserProfile' (full_name, phone)
         # Esto es lo normal:
         instance.full_name = validated_data.get('full_name', instance.full_name)
-        instance.phone = validated_data.get('phone', instance.phone)
-        instance.save()
+        instance.phone = validated_data.get('phone', instance.phone) or None # "" = sin teléfono
+        # Solo estas columnas: el rating (se suma con F()) y la ubicación cambian
+        # por otro lado mientras tanto, y un save() completo los pisaría con lo leído antes
+        instance.save(update_fields=['full_name', 'phone'])
 
         # 3. Actualizamos el 'User' (email) si cambió
         if new_email and instance.user.email != new_email:
@@ -122,7 +82,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
             
             instance.user.email = normalized_email
             instance.user.username = normalized_email # ¡Actualizamos el username también!
-            instance.user.save()
+            instance.user.save(update_fields=['email', 'username'])
 
         return instance
     
@@ -144,7 +104,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         """
         # self.context['request'] nos da el usuario que está logueado (el del "Pase VIP")
         user = self.context['request'].user
-        if not user.check_password(value):
+        if not verify_password(user, value):
             raise serializers.ValidationError("La contraseña actual no es correcta.")
         return value
 
@@ -162,6 +122,25 @@ class ChangePasswordSerializer(serializers.Serializer):
         Guarda la nueva contraseña.
         """
         user = self.context['request'].user
-        user.set_password(self.validated_data['new_password'])
-        user.save()
-        return user
\ No newline at end of file
+        user.password = hash_password(self.validated_data['new_password'])
+        user.save(update_fields=['password'])
+        return user
+
+
+# ---------------------------------------------------------------------------
+# VISTA 4: UBICACIÓN DEL CONDUCTOR (PINGS GPS)
+# ---------------------------------------------------------------------------
+class LocationPingSerializer(serializers.Serializer):
+    """
+    Un ping GPS. Si el celular no manda 'timestamp', usamos la hora del servidor.
+    """
+    latitude = serializers.DecimalField(max_digits=22, decimal_places=16, min_value=-90, max_value=90)
+    longitude = serializers.DecimalField(max_digits=22, decimal_places=16, min_value=-180, max_value=180)
+    timestamp = serializers.DateTimeField(required=False)
+
+
+class LocationBatchSerializer(serializers.Serializer):
+    """
+    Varios pings juntos (ej. los que el celular acumuló sin señal).
+    """
+    pings = LocationPingSerializer(many=True, allow_empty=False, max_length=100)
@@ -1,9 +1,14 @@
 # users/signals.py (CÓDIGO CORREGIDO CON LÓGICA COMENTADA)
 
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
+from django.db import transaction
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import PaymentMethodType, Role, UserProfile
+from .geo import driver_index
+from .utils import clear_profile_id_cache
+from .authentication import estado_usuarios
+from .catalogs import CATALOGOS
 
 # from wallets.models import Wallet # <-- ¡COMENTADO! Esta línea causaba el error circular.
 
@@ -17,13 +22,46 @@ logger = logging.getLogger(__name__)
 def create_user_profile(sender, instance, created, **kwargs):
     """
     Crea automáticamente un UserProfile cuando un nuevo User es creado.
+    El nombre sale del User (el registro ya lo trae en first_name); el
+    teléfono queda vacío hasta que lo ingrese en "Editar Perfil".
+    Después de esto, instance.profile ya está cargado (sin otra consulta).
     """
     if created:
         try:
-            UserProfile.objects.create(user=instance)
+            UserProfile.objects.create(user=instance, full_name=instance.first_name[:100])
             logger.info(f"UserProfile creado para el usuario: {instance.username}")
         except Exception as e:
+            # Si falla, que falle todo el alta (estamos dentro de su transacción)
             logger.error(f"Error al crear UserProfile para {instance.username}: {e}")
+            raise
+
+@receiver(post_save, sender=User)
+def forget_user_auth_state(sender, instance, created, **kwargs):
+    """
+    Si cambió la contraseña o se desactivó, este worker lo nota al momento
+    (los demás, cuando venza su copia; ver users/authentication.py).
+    """
+    if not created:
+        estado_usuarios.olvidar(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user_auth_state(sender, instance, **kwargs):
+    estado_usuarios.olvidar(instance.pk)
+
+
+@receiver(m2m_changed, sender=UserProfile.roles.through)
+def forget_roles_auth_state(sender, instance, action, reverse, pk_set, **kwargs):
+    """Los roles también salen de esa copia: si cambian, se vuelven a leer."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        estado_usuarios.olvidar(instance.user_id)
+    elif pk_set:
+        for user_id in UserProfile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True):
+            estado_usuarios.olvidar(user_id)
+    else:
+        estado_usuarios.limpiar()  # role.users.clear(): no sabemos a quiénes tenía
 
 # -----------------------------------------------------------------
 # SEÑAL 2: Crea la Wallet cuando se crea un UserProfile (¡COMENTADA!)
@@ -50,4 +88,48 @@ def create_user_wallet(sender, instance, created, **kwargs):
         # --- FIN DE LÓGICA DE BILLETERA ---
         
         logger.warning(f"Señal create_user_wallet disparada para {instance.id}, pero la lógica está comentada.")
-        pass # No hacer nada por ahora.
\ No newline at end of file
+        pass # No hacer nada por ahora.
+
+# -----------------------------------------------------------------
+# SEÑAL 3: Mantiene el índice de conductores cercanos al día
+# -----------------------------------------------------------------
+CAMPOS_DEL_INDICE = {'is_active_for_service', 'current_latitude', 'current_longitude'}
+
+
+@receiver(post_save, sender=UserProfile)
+def sync_driver_index(sender, instance, **kwargs):
+    """
+    Cada vez que se guarda un perfil, actualizamos el índice en memoria:
+    si está "en línea" y tiene ubicación lo agregamos/movemos, si no, lo sacamos.
+    Recién después del commit: si el guardado se deshace, el índice no cambia.
+    """
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and not CAMPOS_DEL_INDICE & set(update_fields):
+        return  # Ej. se editó el nombre: la ubicación en memoria podría ser más nueva que la del objeto
+    profile_id = instance.id
+    if (
+        instance.is_active_for_service
+        and instance.current_latitude is not None
+        and instance.current_longitude is not None
+    ):
+        lat, lng = instance.current_latitude, instance.current_longitude
+        transaction.on_commit(lambda: driver_index.upsert(profile_id, lat, lng))
+    else:
+        transaction.on_commit(lambda: driver_index.remove(profile_id))
+
+
+@receiver(post_delete, sender=UserProfile)
+def remove_from_driver_index(sender, instance, **kwargs):
+    profile_id = instance.id
+    transaction.on_commit(lambda: driver_index.remove(profile_id))
+    # Si el usuario vuelve a tener perfil, tendrá otro id
+    clear_profile_id_cache()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+@receiver(post_save, sender=PaymentMethodType)
+@receiver(post_delete, sender=PaymentMethodType)
+def invalidate_catalog(sender, instance, **kwargs):
+    # Este worker y los demás (por la versión en la caché compartida) recargan el catálogo
+    CATALOGOS[sender].invalidar()
@@ -1,3 +1,551 @@
-from django.test import TestCase
+import random
+import threading
+import time
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .geo import (
+    DriverGridIndex,
+    clave_celda,
+    driver_index,
+    haversine_km,
+    nearest_available_drivers_db,
+)
+from .authentication import estado_usuarios
+from .catalogs import payment_method_types, roles
+from . import hashing
+from .hashing import HashingPool, HashingSaturated, hash_password, hashing_pool, verify_password
+from .location import location_buffer
+from .logins import last_login_buffer
+from .models import PaymentMethodType, Role, UserPaymentMethod, UserProfile
+from .registration import register_user
+from .serializers import UserProfileSerializer
+
+
+def crear_perfil(username, phone, **campos):
+    """Crea un User + UserProfile (sin pasar por el registro)."""
+    user = User.objects.create(username=username)
+    UserProfile.objects.filter(user=user).delete()  # Lo crea el signal; lo rehacemos con nuestros datos
+    return UserProfile.objects.create(user=user, full_name=username, phone=phone, **campos)
+
+
+# ---------------------------------------------------------------------------
+# BÚSQUEDA DE CONDUCTORES CERCANOS
+# ---------------------------------------------------------------------------
+class DriverGridIndexTests(SimpleTestCase):
+
+    def test_haversine_distancia_conocida(self):
+        # Moyobamba -> Tarapoto: ~82 km en línea recta
+        distancia = haversine_km(-6.0346, -76.9717, -6.4825, -76.3733)
+        self.assertAlmostEqual(distancia, 82.4, delta=1.0)
+
+    def test_nearest_coincide_con_recorrido_completo(self):
+        rng = random.Random(7)
+        conductores = [(i, -6.03 + rng.uniform(-0.1, 0.1), -76.97 + rng.uniform(-0.1, 0.1)) for i in range(2000)]
+        indice = DriverGridIndex()
+        indice.reemplazar(conductores)
+
+        for _ in range(50):
+            lat, lng = -6.03 + rng.uniform(-0.1, 0.1), -76.97 + rng.uniform(-0.1, 0.1)
+            esperado = sorted(
+                ((pid, haversine_km(lat, lng, plat, plng)) for pid, plat, plng in conductores),
+                key=lambda c: c[1],
+            )
+            esperado = [pid for pid, d in esperado if d <= 2.5][:8]
+            self.assertEqual([pid for pid, _ in indice.nearest(lat, lng, 2.5, 8)], esperado)
+
+    def test_upsert_mueve_y_remove_saca(self):
+        indice = DriverGridIndex()
+        indice.upsert(1, -6.03, -76.97)
+        indice.upsert(1, -6.50, -76.40)  # Se movió lejos
+        self.assertEqual(indice.nearest(-6.03, -76.97, 5, 10), [])
+        self.assertEqual([p for p, _ in indice.nearest(-6.50, -76.40, 5, 10)], [1])
+
+        indice.remove(1)
+        self.assertEqual(len(indice), 0)
+        self.assertEqual(indice.nearest(-6.50, -76.40, 5, 10), [])
+
+
+class DriverLocationSyncTests(TestCase):
+
+    def setUp(self):
+        driver_index.reemplazar([])
+
+    def test_save_calcula_celda_y_actualiza_indice(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            perfil = crear_perfil(
+                'conductor@test.com', '900000001',
+                current_latitude=Decimal('-6.0346'), current_longitude=Decimal('-76.9717'),
+                is_active_for_service=True,
+            )
+        self.assertEqual(perfil.grid_cell, clave_celda(-6.0346, -76.9717))
+        self.assertIn(perfil.id, driver_index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            perfil.is_active_for_service = False
+            perfil.save()
+        self.assertNotIn(perfil.id, driver_index)
+
+    def test_guardado_deshecho_no_toca_el_indice(self):
+        perfil = crear_perfil('conductor@test.com', '900000001')
+        try:
+            with transaction.atomic():
+                perfil.current_latitude, perfil.current_longitude = Decimal('-6.0346'), Decimal('-76.9717')
+                perfil.is_active_for_service = True
+                perfil.save()
+                raise RuntimeError("se deshace")
+        except RuntimeError:
+            pass
+        self.assertNotIn(perfil.id, driver_index)
+
+    def test_busqueda_en_bd_por_celdas(self):
+        cerca = crear_perfil(
+            'cerca@test.com', '900000002',
+            current_latitude=Decimal('-6.0350'), current_longitude=Decimal('-76.9720'),
+            is_active_for_service=True,
+        )
+        crear_perfil(
+            'lejos@test.com', '900000003',
+            current_latitude=Decimal('-6.4825'), current_longitude=Decimal('-76.3733'),
+            is_active_for_service=True,
+        )
+        crear_perfil(
+            'offline@test.com', '900000004',
+            current_latitude=Decimal('-6.0347'), current_longitude=Decimal('-76.9718'),
+        )
+
+        resultado = nearest_available_drivers_db(-6.0346, -76.9717, radius=3, k=5)
+        self.assertEqual([pid for pid, _ in resultado], [cerca.id])
+
+
+# ---------------------------------------------------------------------------
+# INGESTA DE UBICACIÓN (PINGS GPS)
+# ---------------------------------------------------------------------------
+@override_settings(LOCATION_FLUSH_INTERVAL_MS=0)  # Sin hilo: vaciamos a mano
+class DriverLocationViewTests(TestCase):
+
+    def setUp(self):
+        location_buffer.drain()
+        location_buffer._escritos.clear()  # Los ids de perfil se repiten entre tests
+        self.perfil = crear_perfil('chofer@test.com', '900000010')
+        self.client = APIClient()
+        self.client.force_authenticate(self.perfil.user)
+
+    def tearDown(self):
+        location_buffer.drain()
+
+    def test_lote_se_junta_y_gana_el_mas_reciente(self):
+        url = reverse('driver-location')
+        respuesta = self.client.post(url, {"pings": [
+            {"latitude": "-6.0310", "longitude": "-76.9710", "timestamp": "2024-01-01T10:00:02Z"},
+            {"latitude": "-6.0320", "longitude": "-76.9720", "timestamp": "2024-01-01T10:00:05Z"},
+            {"latitude": "-6.0330", "longitude": "-76.9730", "timestamp": "2024-01-01T10:00:03Z"},
+        ]}, format='json')
+        self.assertEqual(respuesta.status_code, 202)
+
+        # Nada llega a la BD hasta que se vacía el buffer
+        self.perfil.refresh_from_db()
+        self.assertIsNone(self.perfil.current_latitude)
+
+        updated_at = self.perfil.updated_at
+        with self.assertNumQueries(1):
+            self.assertEqual(location_buffer.flush(), 1)
+
+        self.perfil.refresh_from_db()
+        self.assertEqual(self.perfil.current_latitude, Decimal('-6.0320'))
+        self.assertEqual(self.perfil.current_longitude, Decimal('-76.9720'))
+        self.assertEqual(self.perfil.grid_cell, clave_celda(-6.0320, -76.9720))
+        self.assertEqual(self.perfil.updated_at, updated_at)
+
+    def test_timestamp_del_futuro_no_fija_la_ubicacion(self):
+        url = reverse('driver-location')
+        self.client.post(url, {"latitude": "-6.0300", "longitude": "-76.9700", "timestamp": "2099-01-01T00:00:00Z"}, format='json')
+        respuesta = self.client.post(url, {"latitude": "-6.0310", "longitude": "-76.9710"}, format='json')
+        self.assertFalse(respuesta.data['stale'])
+        location_buffer.flush()
+        self.perfil.refresh_from_db()
+        self.assertEqual(self.perfil.current_latitude, Decimal('-6.0310'))
+
+    def test_ping_atrasado_despues_del_vaciado_no_pisa_la_bd(self):
+        url = reverse('driver-location')
+        self.client.post(url, {"latitude": "-6.0300", "longitude": "-76.9700", "timestamp": "2024-01-01T10:00:05Z"}, format='json')
+        location_buffer.flush()
+        respuesta = self.client.post(url, {"latitude": "-6.0310", "longitude": "-76.9710", "timestamp": "2024-01-01T10:00:01Z"}, format='json')
+        self.assertTrue(respuesta.data['stale'])
+        self.assertEqual(location_buffer.flush(), 0)
+        self.perfil.refresh_from_db()
+        self.assertEqual(self.perfil.current_latitude, Decimal('-6.0300'))
+
+    def test_ping_invalido(self):
+        respuesta = self.client.post(reverse('driver-location'), {"latitude": "95", "longitude": "0"}, format='json')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+# ---------------------------------------------------------------------------
+# AUTENTICACIÓN JWT SIN ESTADO
+# ---------------------------------------------------------------------------
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL_SECONDS=0)  # Sin hilo: el login solo anota en memoria
+class StatelessJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        estado_usuarios.limpiar()
+        self.perfil = crear_perfil('cliente@test.com', '900000020')
+        self.perfil.roles.add(Role.objects.create(name='Cliente'))
+        self.perfil.user.set_password('clave-secreta-1')
+        self.perfil.user.save()
+        self.client = APIClient()
+
+    def tearDown(self):
+        last_login_buffer.drain()  # Que no quede nada para el vaciado al salir (sin BD de tests)
+
+    def login(self):
+        respuesta = self.client.post(
+            reverse('token_obtain_pair'), {'username': 'cliente@test.com', 'password': 'clave-secreta-1'}
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {respuesta.data['access']}")
+        return AccessToken(respuesta.data['access'])
+
+    def test_el_token_trae_perfil_y_roles(self):
+        token = self.login()
+        self.assertEqual(token['profile_id'], self.perfil.id)
+        self.assertEqual(token['roles'], ['Cliente'])
+        self.assertEqual(token['username'], 'cliente@test.com')
+        self.assertFalse(token['is_staff'])
+
+    def test_no_consulta_el_usuario_en_cada_peticion(self):
+        self.login()
+        url = reverse('user-profile')
+        self.assertEqual(self.client.get(url).status_code, 200)  # Carga el estado del usuario
+        with self.assertNumQueries(1):  # Solo el perfil (con su user, en el mismo SELECT)
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.data['email'], self.perfil.user.email)
+
+    def test_cambiar_la_clave_revoca_los_tokens_anteriores(self):
+        self.login()
+        respuesta = self.client.put(reverse('change-password'), {
+            'old_password': 'clave-secreta-1', 'new_password': 'clave-secreta-2', 'new_password_confirm': 'clave-secreta-2',
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 401)
+
+    def test_los_permisos_no_salen_del_token(self):
+        self.login()
+        url = reverse('user-profile')
+        self.assertEqual(self.client.get(url).status_code, 200)
+        # Le quitan el rol en el admin: el token viejo ya no lo trae consigo
+        self.perfil.roles.clear()
+        self.perfil.user.is_staff = True
+        self.perfil.user.save()
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        usuario = respuesta.wsgi_request.user
+        self.assertEqual(usuario.roles, ())
+        self.assertTrue(usuario.is_staff)
+
+    def test_un_rol_recien_borrado_no_rompe_la_autenticacion(self):
+        self.login()
+        estado_usuarios.limpiar()
+        # El perfil todavía lo tiene, pero el catálogo ya no lo encuentra
+        with mock.patch.object(roles, 'get', side_effect=Role.DoesNotExist):
+            respuesta = self.client.get(reverse('user-profile'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.wsgi_request.user.roles, ())
+
+    @override_settings(JWT_REVOCATION_CHECK_SECONDS=0)
+    def test_staff_quitado_en_otro_worker(self):
+        User.objects.filter(pk=self.perfil.user_id).update(is_staff=True)
+        self.login()
+        self.assertTrue(self.client.get(reverse('user-profile')).wsgi_request.user.is_staff)
+        User.objects.filter(pk=self.perfil.user_id).update(is_staff=False, is_superuser=False)  # Sin signals
+        self.assertFalse(self.client.get(reverse('user-profile')).wsgi_request.user.is_staff)
+
+    @override_settings(JWT_REVOCATION_CHECK_SECONDS=0)
+    def test_usuario_desactivado(self):
+        self.login()
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 200)
+        User.objects.filter(pk=self.perfil.user_id).update(is_active=False)  # Sin signals, como otro worker
+        self.assertEqual(self.client.get(reverse('user-profile')).status_code, 401)
+
+
+@override_settings(LAST_LOGIN_FLUSH_INTERVAL_SECONDS=0)  # Sin hilo: vaciamos a mano
+class LastLoginTests(TestCase):
+
+    def setUp(self):
+        last_login_buffer.drain()
+        self.user = crear_perfil('cliente@test.com', '900000030').user
+        self.user.set_password('clave-secreta-1')
+        self.user.save()
+
+    def tearDown(self):
+        last_login_buffer.drain()
+
+    def test_el_login_no_escribe_y_el_lote_guarda_el_ultimo(self):
+        url = reverse('token_obtain_pair')
+        for _ in range(3):
+            respuesta = self.client.post(url, {'username': 'cliente@test.com', 'password': 'clave-secreta-1'})
+            self.assertEqual(respuesta.status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_login)
+        ultimo = last_login_buffer._pending[self.user.id]
+
+        with self.assertNumQueries(1):
+            self.assertEqual(last_login_buffer.flush(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_login, ultimo)
+
+
+# ---------------------------------------------------------------------------
+# HASH DE CONTRASEÑAS (COSTO Y CUPO)
+# ---------------------------------------------------------------------------
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000, LAST_LOGIN_FLUSH_INTERVAL_SECONDS=0)
+class PasswordHashingTests(TestCase):
+
+    def setUp(self):
+        hashing_pool.reiniciar()
+        self.user = crear_perfil('cliente@test.com', '900000040').user
+
+    def tearDown(self):
+        hashing_pool.reiniciar()
+        last_login_buffer.drain()
+
+    def ocupar_el_pool(self):
+        """Deja el único hilo del pool ocupado; devuelve la función que lo libera."""
+        ocupado, liberar = threading.Event(), threading.Event()
+
+        def hash_lento():
+            ocupado.set()
+            liberar.wait(5)
+
+        hilo = threading.Thread(target=hashing_pool.run, args=(hash_lento,))
+        hilo.start()
+        ocupado.wait(5)
+
+        def soltar():
+            liberar.set()
+            hilo.join()
+        return soltar
+
+    def hashes_precalculados(self, peticion):
+        """Corre la petición y devuelve, por cada hash que pidió la vista, si ya estaba calculado."""
+        llamadas, run = [], HashingPool.run
+
+        def espia(pool, funcion, *args):
+            llamadas.append((funcion, args) in (hashing._precalculados.get() or {}))
+            return run(pool, funcion, *args)
+
+        with mock.patch.object(HashingPool, 'run', espia):
+            respuesta = peticion()
+        return respuesta, llamadas
+
+    def test_las_vistas_no_esperan_hashes_en_el_hilo_de_las_vistas(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=500):
+            self.user.password = hash_password('clave-secreta-1')
+        self.user.save()
+        client = APIClient()
+        login = lambda clave: client.post(reverse('token_obtain_pair'), {'username': 'cliente@test.com', 'password': clave}, format='json')
+
+        # Login con costo viejo: verificar + nuevo hash, los dos ya calculados
+        respuesta, llamadas = self.hashes_precalculados(lambda: login('clave-secreta-1'))
+        self.assertEqual((respuesta.status_code, llamadas), (200, [True, True]))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+        respuesta, llamadas = self.hashes_precalculados(lambda: login('otra-clave'))
+        self.assertEqual((respuesta.status_code, llamadas), (401, [True]))
+
+        respuesta, llamadas = self.hashes_precalculados(lambda: client.post(
+            reverse('token_obtain_pair'), {'username': 'nadie@test.com', 'password': 'clave-secreta-1'}, format='json'
+        ))
+        self.assertEqual((respuesta.status_code, llamadas), (401, [True]))
+
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {login('clave-secreta-1').data['access']}")
+        respuesta, llamadas = self.hashes_precalculados(lambda: client.put(reverse('change-password'), {
+            'old_password': 'clave-secreta-1', 'new_password': 'clave-secreta-2', 'new_password_confirm': 'clave-secreta-2',
+        }, format='json'))
+        self.assertEqual((respuesta.status_code, llamadas), (200, [True, True]))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('clave-secreta-2'))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=0)
+    def test_login_sin_cupo_responde_429_sin_esperar(self):
+        self.user.set_password('clave-secreta-1')
+        self.user.save()
+        soltar = self.ocupar_el_pool()
+        try:
+            inicio = time.monotonic()
+            respuesta = APIClient().post(
+                reverse('token_obtain_pair'), {'username': 'cliente@test.com', 'password': 'clave-secreta-1'}, format='json'
+            )
+            self.assertEqual(respuesta.status_code, 429)
+            self.assertEqual(respuesta.json()['detail'], HashingSaturated.default_detail)
+            self.assertLess(time.monotonic() - inicio, 1)
+        finally:
+            soltar()
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=0)
+    def test_login_del_admin_sin_cupo_muestra_el_aviso(self):
+        self.user.is_staff = True
+        self.user.set_password('clave-secreta-1')
+        self.user.save()
+        soltar = self.ocupar_el_pool()
+        try:
+            respuesta = self.client.post(reverse('admin:login'), {'username': 'cliente@test.com', 'password': 'clave-secreta-1'})
+        finally:
+            soltar()
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, "demasiados inicios de sesión")
+
+    def test_el_costo_sale_de_la_configuracion_y_se_actualiza_al_entrar(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=500):
+            self.user.password = hash_password('clave-secreta-1')
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$500$'))
+        self.user.save()
+
+        self.assertFalse(verify_password(self.user, 'otra-clave'))
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$500$'))
+        self.assertTrue(verify_password(self.user, 'clave-secreta-1'))
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1, PASSWORD_HASHING_QUEUE=0)
+    def test_sin_cupo_responde_429(self):
+        soltar = self.ocupar_el_pool()
+        try:
+            with self.assertRaises(HashingSaturated) as error:
+                hash_password('clave-secreta-1')
+            self.assertEqual(error.exception.status_code, 429)
+        finally:
+            soltar()
+        self.assertTrue(hash_password('clave-secreta-1').startswith('pbkdf2_sha256$1000$'))
+
+
+# ---------------------------------------------------------------------------
+# REGISTRO
+# ---------------------------------------------------------------------------
+@override_settings(PASSWORD_PBKDF2_ITERATIONS=1000)
+class RegistrationTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Role.objects.create(name='Cliente')  # El signal hace recargar el catálogo
+
+    def test_registro_completo_en_una_transaccion_de_tres_inserts(self):
+        register_user('primero@test.com', 'Primero', 'clave-secreta-1')  # Carga el id del rol
+        # SAVEPOINT + INSERT user + INSERT perfil + INSERT rol + RELEASE
+        with self.assertNumQueries(5):
+            user = register_user('Ana@Test.com', 'Ana Pérez', 'clave-secreta-1')
+
+        user = User.objects.select_related('profile').get(pk=user.pk)
+        self.assertEqual((user.username, user.first_name), ('ana@test.com', 'Ana Pérez'))
+        self.assertTrue(user.check_password('clave-secreta-1'))
+        self.assertEqual(user.profile.full_name, 'Ana Pérez')
+        self.assertIsNone(user.profile.phone)
+        self.assertEqual(list(user.profile.roles.all()), [self.cliente])
+
+    def test_endpoint_y_correo_repetido(self):
+        url = reverse('register')
+        datos = {'full_name': 'Ana', 'email': 'ana@test.com', 'password': 'clave-secreta-1'}
+        self.assertEqual(self.client.post(url, datos).status_code, 201)
+        # Otro usuario sin teléfono no choca con el primero
+        self.assertEqual(self.client.post(url, {**datos, 'email': 'beto@test.com'}).status_code, 201)
+
+        respuesta = self.client.post(url, {**datos, 'email': 'ANA@test.com'})
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn('email', respuesta.json())
+        self.assertEqual(User.objects.count(), 2)
+
+
+# ---------------------------------------------------------------------------
+# CATÁLOGOS EN MEMORIA (roles y tipos de método de pago)
+# ---------------------------------------------------------------------------
+@override_settings(CATALOG_VERSION_CHECK_SECONDS=0)  # Mira la versión compartida en cada uso
+class CatalogTests(TestCase):
+
+    def setUp(self):
+        self.cliente = Role.objects.create(name='Cliente')
+        self.yape = PaymentMethodType.objects.create(name=PaymentMethodType.Types.YAPE)
+
+    def test_se_carga_una_vez(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(roles.by_name('Cliente').id, self.cliente.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(roles.get(self.cliente.id).name, 'Cliente')
+            self.assertEqual(roles.all(), [self.cliente])
+        with self.assertRaises(Role.DoesNotExist):
+            roles.by_name('Conductor')
+
+    def test_otro_worker_cambia_la_version(self):
+        roles.all()
+        Role.objects.filter(pk=self.cliente.pk).update(name='Pasajero')  # Sin signals, como otro worker
+        self.assertEqual(roles.get(self.cliente.id).name, 'Cliente')
+        cache.set(roles.clave_version, 'otra-version', None)  # Su signal, después del commit
+        self.assertEqual(roles.get(self.cliente.id).name, 'Pasajero')
+        # Una fila que aún no conocemos: se recarga una vez antes de decir que no existe
+        conductor = Role.objects.bulk_create([Role(name='Conductor')])[0]
+        self.assertEqual(roles.by_name('Conductor').id, conductor.id)
+
+    @override_settings(CATALOG_VERSION_CHECK_SECONDS=60)
+    def test_un_id_inexistente_no_recarga_en_cada_consulta(self):
+        roles.invalidar()
+        roles.all()
+        with self.assertNumQueries(1):  # La primera vez recarga, por si es nuevo
+            with self.assertRaises(Role.DoesNotExist):
+                roles.get(999)
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                with self.assertRaises(Role.DoesNotExist):
+                    roles.get(999)
+
+    @override_settings(CATALOG_MAX_AGE_SECONDS=60)
+    def test_se_recarga_al_vencer_aunque_no_cambie_la_version(self):
+        roles.all()
+        Role.objects.filter(pk=self.cliente.pk).update(name='Pasajero')  # Sin signals ni versión nueva
+        self.assertEqual(roles.get(self.cliente.id).name, 'Cliente')
+        roles.cargado_en -= 61
+        self.assertEqual(roles.get(self.cliente.id).name, 'Pasajero')
+
+    def test_guardar_cambia_la_version_al_hacer_commit(self):
+        antes = cache.get(roles.clave_version)
+        with self.captureOnCommitCallbacks(execute=True):
+            Role.objects.create(name='Conductor')
+            self.assertEqual(cache.get(roles.clave_version), antes)
+        self.assertNotEqual(cache.get(roles.clave_version), antes)
+        self.assertEqual(roles.by_name('Conductor').name, 'Conductor')
+
+    def test_str_del_metodo_de_pago_sin_consultar_el_tipo(self):
+        perfil = crear_perfil('cliente@test.com', '900000050')
+        metodo = UserPaymentMethod.objects.create(user_profile=perfil, payment_type=self.yape, identifier='900000050')
+        metodo = UserPaymentMethod.objects.select_related('user_profile').get(pk=metodo.pk)
+        payment_method_types.all()
+        with self.assertNumQueries(0):
+            self.assertEqual(str(metodo), 'cliente@test.com - Yape')
+
+
+# ---------------------------------------------------------------------------
+# EDITAR EL PERFIL
+# ---------------------------------------------------------------------------
+class UserProfileUpdateTests(TestCase):
+
+    def test_no_pisa_el_rating_ni_la_ubicacion(self):
+        perfil = crear_perfil('cliente@test.com', '900000060')
+        # Mientras el usuario edita, llega una calificación y se mueve (sin pasar por este objeto)
+        UserProfile.objects.filter(pk=perfil.pk).update(
+            rating_sum=5, total_ratings=1, average_rating=Decimal('5.00'), current_latitude=Decimal('-6.0346'),
+        )
+        serializer = UserProfileSerializer(perfil, data={'full_name': 'Nuevo Nombre', 'phone': '', 'email': 'cliente@test.com'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        serializer.save()
+
+        perfil.refresh_from_db()
+        self.assertEqual((perfil.full_name, perfil.phone), ('Nuevo Nombre', None))
+        self.assertEqual((perfil.rating_sum, perfil.total_ratings), (5, 1))
+        self.assertEqual(perfil.current_latitude, Decimal('-6.0346'))
@@ -1,19 +1,17 @@
 from django.urls import path
 # ¡Importamos la nueva vista!
-from .views import RegisterView, UserProfileView, ChangePasswordView
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
+from .views import UserProfileView, DriverLocationView, register, token_obtain_pair, change_password
+from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     # --- Endpoint de Registro (Ya lo tenías) ---
     # POST /api/users/register/
-    path('register/', RegisterView.as_view(), name='register'),
+    # (registro, login y cambio de contraseña son async: el hash no para el worker, ver users/views.py)
+    path('register/', register, name='register'),
     
     # --- Endpoints de Login (JWT) (Ya los tenías) ---
     # POST /api/users/token/
-    path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('token/', token_obtain_pair, name='token_obtain_pair'),
     
     # POST /api/users/token/refresh/
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
@@ -29,5 +27,10 @@ urlpatterns = [
     # 4. Endpoint de Cambiar Contraseña
     # -----------------------------------------------------------------
     # PUT /api/users/change-password/
-    path('change-password/', ChangePasswordView.as_view(), name='change-password'),
+    path('change-password/', change_password, name='change-password'),
+
+    # 5. Endpoint de Ubicación (pings GPS del conductor)
+    # -----------------------------------------------------------------
+    # POST /api/users/location/
+    path('location/', DriverLocationView.as_view(), name='driver-location'),
 ]
\ No newline at end of file
@@ -0,0 +1,39 @@
+from functools import lru_cache
+
+from django.contrib.auth.models import User
+
+from .models import UserProfile
+
+
+@lru_cache(maxsize=100_000)
+def _profile_id_for_user_id(user_id):
+    return UserProfile.objects.values_list('id', flat=True).get(user_id=user_id)
+
+
+def get_profile_id(user):
+    """
+    Devuelve el id del UserProfile del usuario sin cargar el perfil completo.
+    Si el usuario viene del token (ver users/authentication.py), el id ya
+    viene ahí. Si no, como el par user -> perfil nunca cambia (es OneToOne),
+    lo guardamos en memoria y las siguientes peticiones no van a la BD.
+    Lanza UserProfile.DoesNotExist si el usuario no tiene perfil.
+    """
+    profile_id = getattr(user, 'profile_id', None)
+    if profile_id is not None:
+        return profile_id
+    return _profile_id_for_user_id(user.id)
+
+
+def get_db_user(user):
+    """
+    El User de la BD del usuario de la petición (ej. para asignarlo a una FK).
+    Si ya es un User, no hace ninguna consulta.
+    """
+    if isinstance(user, User):
+        return user
+    return User.objects.get(pk=user.id)
+
+
+def clear_profile_id_cache():
+    """Olvida los ids guardados (ej. cuando se borra un perfil)."""
+    _profile_id_for_user_id.cache_clear()
@@ -1,7 +1,26 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
-from .serializers import RegisterSerializer, UserProfileSerializer, ChangePasswordSerializer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .hashing import HashingSaturated, precomputed_hashes, prepare_hash_password, prepare_verify_password
+from .serializers import (
+    RegisterSerializer,
+    UserProfileSerializer,
+    ChangePasswordSerializer,
+    LocationPingSerializer,
+    LocationBatchSerializer,
+)
 from .models import UserProfile
+from .location import record_location_pings
+from .utils import get_profile_id
 
 import logging
 logger = logging.getLogger(__name__)
@@ -28,6 +47,8 @@ class RegisterView(generics.CreateAPIView):
                 {"message": "¡Usuario creado con éxito!"},
                 status=status.HTTP_201_CREATED
             )
+        except APIException:
+            raise # Correo repetido (400) o demasiados registros a la vez (429)
         except Exception as e:
             logger.error(f"Error inesperado durante el registro: {e}")
             return Response(
@@ -52,10 +73,10 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         """
         Sobrescribimos este método para que siempre devuelva
         el perfil del usuario que está haciendo la petición (el del "Pase VIP").
+        El id del perfil viene en el token: una sola consulta (perfil + user).
         """
         try:
-            # request.user nos lo da el "Pase VIP" (JWT)
-            return self.request.user.profile
+            return UserProfile.objects.select_related('user').get(pk=get_profile_id(self.request.user))
         except UserProfile.DoesNotExist:
             logger.error(f"Error crítico: El usuario {self.request.user.username} no tiene UserProfile.")
             # Esto no debería pasar gracias a nuestros signals, pero es bueno tenerlo.
@@ -105,6 +126,8 @@ class ChangePasswordView(generics.UpdateAPIView):
     """
     serializer_class = ChangePasswordSerializer
     permission_classes = [permissions.IsAuthenticated] # ¡PROTEGIDA!
+    # Necesita el User real (y al día) de la BD para verificar y cambiar la clave
+    authentication_classes = [JWTAuthentication]
 
     def get_object(self):
         # El objeto que estamos actualizando es el 'auth_user'
@@ -125,4 +148,133 @@ class ChangePasswordView(generics.UpdateAPIView):
         return Response(
             {"message": "Contraseña actualizada con éxito."},
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+# ---------------------------------------------------------------------------
+# VISTA 4: UBICACIÓN DEL CONDUCTOR (PINGS GPS)
+# /api/users/location/
+# ---------------------------------------------------------------------------
+class DriverLocationView(generics.GenericAPIView):
+    """
+    Recibe la ubicación del usuario logueado (normalmente un conductor
+    cada ~3 segundos). Acepta un ping suelto o un lote {"pings": [...]}.
+    No escribe en la BD al momento: los pings se juntan en memoria y se
+    guardan en lote (ver users/location.py).
+    """
+    permission_classes = [permissions.IsAuthenticated] # ¡PROTEGIDA!
+
+    def post(self, request, *args, **kwargs):
+        if 'pings' in request.data:
+            serializer = LocationBatchSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            pings = serializer.validated_data['pings']
+        else:
+            serializer = LocationPingSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            pings = [serializer.validated_data]
+
+        try:
+            profile_id = get_profile_id(request.user)
+        except UserProfile.DoesNotExist:
+            return Response(
+                {"error": "Perfil de usuario no encontrado."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        ahora = timezone.now()
+        vigente = record_location_pings(
+            profile_id,
+            [(p['latitude'], p['longitude'], p.get('timestamp', ahora)) for p in pings],
+        )
+        return Response(
+            {"accepted": len(pings), "stale": vigente is None},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+
+# ---------------------------------------------------------------------------
+# VISTAS QUE CALCULAN HASHES DE CONTRASEÑA (ASGI)
+# ---------------------------------------------------------------------------
+# Con uvicorn todas las vistas síncronas de un worker comparten UN hilo: si
+# el login esperara ahí su hash, se pararía todo el worker. Estas versiones
+# async calculan antes (con await, en el pool con cupo) los hashes que la
+# vista va a pedir, y después corren la vista de siempre, que los encuentra
+# hechos (ver users/hashing.py). Sin cupo, 429 sin llegar a la vista.
+def _datos_del_cuerpo(request):
+    """Los campos del cuerpo (JSON o formulario), o {} si no se entiende (la vista responderá 400)."""
+    if request.content_type == 'application/json':
+        try:
+            datos = json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+        return datos if isinstance(datos, dict) else {}
+    return request.POST
+
+
+def _texto(datos, campo):
+    valor = datos.get(campo)
+    return valor.strip() if isinstance(valor, str) else None  # Igual que los CharField de DRF
+
+
+def _clave_guardada(username):
+    return User.objects.filter(username=username).values_list('password', flat=True).first()
+
+
+def _clave_del_token(request):
+    try:
+        autenticado = JWTAuthentication().authenticate(request)
+    except APIException:
+        return None  # La vista responderá 401
+    return autenticado[0].password if autenticado else None
+
+
+async def _preparar_login(request):
+    datos = _datos_del_cuerpo(request)
+    username, password = _texto(datos, 'username'), _texto(datos, 'password')
+    if not username or not password:
+        return
+    guardada = await sync_to_async(_clave_guardada)(username)
+    if guardada is None:
+        await prepare_hash_password(password)  # El backend igual calcula uno (ver PooledModelBackend)
+    else:
+        await prepare_verify_password(guardada, password)
+
+
+async def _preparar_registro(request):
+    password = _texto(_datos_del_cuerpo(request), 'password')
+    if password and len(password) >= 8:
+        await prepare_hash_password(password)
+
+
+async def _preparar_cambio_de_clave(request):
+    if request.method not in ('PUT', 'PATCH'):
+        return
+    datos = _datos_del_cuerpo(request)
+    vieja, nueva = _texto(datos, 'old_password'), _texto(datos, 'new_password')
+    if not vieja:
+        return
+    guardada = await sync_to_async(_clave_del_token)(request)
+    if guardada is None or not await prepare_verify_password(guardada, vieja):
+        return
+    if nueva and len(nueva) >= 8 and nueva == _texto(datos, 'new_password_confirm'):
+        await prepare_hash_password(nueva)
+
+
+def _con_hashes_precalculados(vista, preparar):
+    correr = sync_to_async(vista)
+
+    @csrf_exempt
+    async def vista_async(request, *args, **kwargs):
+        with precomputed_hashes():
+            if request.method != 'OPTIONS':
+                try:
+                    await preparar(request)
+                except HashingSaturated as e:
+                    return JsonResponse({'detail': e.detail}, status=e.status_code)
+            return await correr(request, *args, **kwargs)
+    return vista_async
+
+
+register = _con_hashes_precalculados(RegisterView.as_view(), _preparar_registro)
+token_obtain_pair = _con_hashes_precalculados(TokenObtainPairView.as_view(), _preparar_login)
+change_password = _con_hashes_precalculados(ChangePasswordView.as_view(), _preparar_cambio_de_clave)
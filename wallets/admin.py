@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Wallet, Transaction
+from .models import Wallet, Transaction, WalletSnapshot
 
 # Register your models here.
 
@@ -15,10 +15,16 @@ class TransactionAdmin(admin.ModelAdmin):
     
     # Función para mostrar el monto con su signo +/-
     def amount_display(self, obj):
-        if obj.transaction_type in [Transaction.TransactionType.DEPOSIT, Transaction.TransactionType.BONUS, Transaction.TransactionType.REFUND]:
+        if obj.transaction_type in Transaction.CREDIT_TYPES:
             return f"+ S/ {obj.amount}"
         return f"- S/ {obj.amount}"
     amount_display.short_description = "Monto"
 
+class WalletSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'wallet', 'as_of', 'balance')
+    list_filter = ('as_of',)
+    readonly_fields = ('wallet', 'as_of', 'balance', 'created_at') # Las genera el comando 'snapshot_wallets'
+
 admin.site.register(Wallet, WalletAdmin)
-admin.site.register(Transaction, TransactionAdmin)
\ No newline at end of file
+admin.site.register(Transaction, TransactionAdmin)
+admin.site.register(WalletSnapshot, WalletSnapshotAdmin)
@@ -0,0 +1,156 @@
+"""
+Verificación del libro contable: el saldo de cada billetera debe ser igual
+a la suma (con signo) de sus transacciones COMPLETADAS.
+
+No se revisa billetera por billetera (una consulta por cada una). Se leen
+dos flujos ordenados por id de billetera, con iterator(chunk_size=...) para
+no cargar todo en memoria:
+  1. los saldos de las billeteras del rango
+  2. UN solo GROUP BY con la suma de sus transacciones
+y se cruzan como un merge de dos listas ordenadas.
+
+Como los saldos pueden cambiar mientras se lee, cada descuadre encontrado
+se vuelve a revisar con la billetera bloqueada antes de reportarlo (o de
+repararlo). Para millones de transacciones, la lectura se puede repartir
+por rangos de ids entre varios procesos (ver verify_ledger).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .ledger import signed_amount_sum
+from .models import Wallet, Transaction
+
+CERO = Decimal('0.00')
+
+
+def _resultado():
+    # 'descuadres' es una lista de (wallet_id, saldo, saldo esperado)
+    return {'revisadas': 0, 'descuadres': [], 'reparadas': 0}
+
+
+def _sumar(total, parcial):
+    total['revisadas'] += parcial['revisadas']
+    total['descuadres'].extend(parcial['descuadres'])
+    total['reparadas'] += parcial['reparadas']
+
+
+def _sumas(desde_id, hasta_id):
+    """GROUP BY de las transacciones completadas del rango, ordenado por billetera."""
+    return (
+        Transaction.objects
+        .filter(wallet_id__gte=desde_id, wallet_id__lte=hasta_id, status=Transaction.TransactionStatus.COMPLETED)
+        .values('wallet_id')
+        .annotate(total=signed_amount_sum())
+        .order_by('wallet_id')
+        .values_list('wallet_id', 'total')
+    )
+
+
+def verify_range(desde_id, hasta_id, chunk_size=5000):
+    """
+    Cruza saldos y sumas de las billeteras con id en [desde_id, hasta_id]
+    (solo lectura). Devuelve (billeteras revisadas, ids que no cuadran).
+    """
+    saldos = (
+        Wallet.objects.filter(pk__gte=desde_id, pk__lte=hasta_id)
+        .order_by('pk').values_list('id', 'balance')
+        .iterator(chunk_size=chunk_size)
+    )
+    sumas = _sumas(desde_id, hasta_id).iterator(chunk_size=chunk_size)
+    revisadas, descuadradas = 0, []
+    try:
+        suma = next(sumas, None)
+        for wallet_id, saldo in saldos:
+            revisadas += 1
+            # Las sumas de billeteras que ya no existen (no debería haber: CASCADE) se saltan
+            while suma is not None and suma[0] < wallet_id:
+                suma = next(sumas, None)
+            esperado = suma[1] if suma is not None and suma[0] == wallet_id else CERO
+            if saldo != esperado:
+                descuadradas.append(wallet_id)
+    finally:
+        sumas.close()  # Si quedaron sumas sin leer, se cierra el cursor igual
+    return revisadas, descuadradas
+
+
+def _confirmar(wallet_id, reparar):
+    """
+    Revisa de nuevo la billetera con su fila bloqueada (nadie la mueve mientras
+    tanto). Devuelve (wallet_id, saldo, esperado) si sigue descuadrada, o None.
+    """
+    with transaction.atomic():
+        saldo = Wallet.objects.select_for_update().values_list('balance', flat=True).get(pk=wallet_id)
+        esperado = _sumas(wallet_id, wallet_id).values_list('total', flat=True).first() or CERO
+        if saldo == esperado:
+            return None
+        if reparar:
+            Wallet.objects.filter(pk=wallet_id).update(balance=esperado, updated_at=timezone.now())
+    return wallet_id, saldo, esperado
+
+
+def wallet_id_ranges(tamano):
+    """
+    Divide los ids de billetera en rangos [desde, hasta] de como mucho
+    'tamano' billeteras cada uno (aunque haya huecos en los ids). Cada límite
+    sale de una consulta que recorre solo 'tamano' filas del índice.
+    """
+    ids = Wallet.objects.order_by('pk').values_list('pk', flat=True)
+    maximo = Wallet.objects.aggregate(max_id=Max('id'))['max_id']
+    rangos, desde = [], ids.first()
+    while desde is not None:
+        # El último id de este rango y, si hay, el primero del siguiente
+        limites = list(ids.filter(pk__gte=desde)[tamano - 1:tamano + 1])
+        rangos.append((desde, limites[0] if limites else maximo))
+        desde = limites[1] if len(limites) > 1 else None
+    return rangos
+
+
+def _cerrar_conexiones():
+    # Cada proceso abre su propia conexión; nunca se comparte la del padre
+    connections.close_all()
+
+
+def _verificar_rango(args):
+    return verify_range(*args)
+
+
+def verify_ledger(workers=1, chunk_size=5000, reparar=False, on_range=None):
+    """
+    Verifica todas las billeteras, por rangos de como mucho 'chunk_size'
+    billeteras: la memoria usada no depende del total ni de 'workers' (en
+    MySQL, iterator() no va leyendo de a poco: trae todo el resultado de
+    una consulta). Con workers > 1 los rangos se reparten entre procesos.
+    Los descuadres, que son pocos, se confirman y reparan en este proceso,
+    con la billetera bloqueada.
+    'on_range(resultado_del_rango)' se llama al terminar cada rango.
+    Devuelve el dict con 'revisadas', 'descuadres' y 'reparadas'.
+    """
+    tareas = [(desde, hasta, chunk_size) for desde, hasta in wallet_id_ranges(chunk_size)]
+    if workers <= 1:
+        lecturas = map(_verificar_rango, tareas)
+    else:
+        _cerrar_conexiones()
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_cerrar_conexiones)
+        lecturas = pool.map(_verificar_rango, tareas)
+
+    total = _resultado()
+    try:
+        for revisadas, descuadradas in lecturas:
+            resultado = _resultado()
+            resultado['revisadas'] = revisadas
+            for wallet_id in descuadradas:
+                descuadre = _confirmar(wallet_id, reparar)
+                if descuadre:
+                    resultado['descuadres'].append(descuadre)
+                    resultado['reparadas'] += reparar
+            _sumar(total, resultado)
+            if on_range:
+                on_range(resultado)
+    finally:
+        if workers > 1:
+            pool.shutdown()
+    return total
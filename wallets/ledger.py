@@ -0,0 +1,72 @@
+"""
+Registro de movimientos en las billeteras (el "libro contable").
+
+El saldo nunca se calcula en Python a partir de un objeto Wallet que
+puede estar desactualizado. Se cambia con un UPDATE condicional en la BD:
+
+    UPDATE wallets_wallet SET balance = balance - 10
+    WHERE id = 1 AND balance >= 10
+
+La fila queda bloqueada hasta el final de la transacción (en la que
+también se inserta el Transaction), así que dos movimientos simultáneos
+sobre la misma billetera nunca se pisan, y la verificación de fondos es
+parte del mismo UPDATE.
+"""
+from django.db.models import Case, DecimalField, F, Sum, When
+from django.utils import timezone
+
+from .models import Wallet, Transaction
+
+
+class InsufficientFunds(ValueError):
+    """La billetera no tiene saldo suficiente (o no existe)."""
+
+    def __init__(self, message="Fondos insuficientes"):
+        super().__init__(message)
+
+
+def apply_balance_change(wallet_id, delta):
+    """
+    Suma 'delta' (positivo o negativo) al saldo con un solo UPDATE.
+    Si 'delta' es negativo, solo se aplica si el saldo alcanza.
+    Debe llamarse dentro de transaction.atomic() junto con el INSERT
+    del Transaction correspondiente.
+    """
+    billeteras = Wallet.objects.filter(pk=wallet_id)
+    if delta < 0:
+        billeteras = billeteras.filter(balance__gte=-delta)
+    if not billeteras.update(balance=F('balance') + delta, updated_at=timezone.now()):
+        raise InsufficientFunds()
+
+
+def post_transaction(wallet_id, amount, transaction_type, description, **campos):
+    """
+    Registra un movimiento COMPLETADO y actualiza el saldo, de forma atómica.
+    Lanza InsufficientFunds si es un retiro/comisión y no hay fondos.
+    Devuelve el Transaction creado.
+    """
+    if amount <= 0:
+        raise ValueError("El monto debe ser mayor a cero")
+    # Transaction.save() hace el UPDATE del saldo y el INSERT en la misma transacción
+    return Transaction.objects.create(
+        wallet_id=wallet_id,
+        amount=amount,
+        transaction_type=transaction_type,
+        description=description,
+        status=Transaction.TransactionStatus.COMPLETED,
+        **campos
+    )
+
+
+def signed_amount_sum():
+    """
+    SUM() del monto con signo (créditos suman, débitos restan), para usar
+    en aggregate()/annotate() sobre Transaction.
+    """
+    return Sum(
+        Case(
+            When(transaction_type__in=Transaction.CREDIT_TYPES, then=F('amount')),
+            default=-F('amount'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wallets.settlement import settle_finished_trips
+
+
+class Command(BaseCommand):
+    help = (
+        "Liquida los viajes FINALIZADOS pendientes: registra el pago (DEPOSIT) y la comisión (FEE) "
+        "en la billetera de cada conductor, por lotes. Se puede correr varias veces sin pagar doble."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help="Viajes por lote")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        def progreso(total):
+            self.stdout.write(f"  {total} viajes liquidados ({total / (time.perf_counter() - inicio):.0f}/s)")
+
+        total = settle_finished_trips(chunk_size=options['chunk_size'], on_chunk=progreso)
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Viajes liquidados: {total} en {duracion:.1f} s"
+        ))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from wallets.statements import take_snapshots, ultima_medianoche
+
+
+class Command(BaseCommand):
+    help = (
+        "Guarda la foto del saldo de todas las billeteras (por defecto, a la última medianoche). "
+        "Pensado para correr una vez al día (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help="Fecha y hora de la foto (ISO 8601). Por defecto, las 00:00 de hoy")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Billeteras por lote")
+
+    def handle(self, *args, **options):
+        as_of = ultima_medianoche()
+        if options['as_of']:
+            as_of = parse_datetime(options['as_of'])
+            if as_of is None:
+                raise CommandError("Fecha inválida, usa ISO 8601 (ej. 2024-05-01T00:00:00)")
+            if timezone.is_naive(as_of):
+                as_of = timezone.make_aware(as_of)
+
+        inicio = time.perf_counter()
+        total = take_snapshots(
+            as_of, chunk_size=options['chunk_size'],
+            on_chunk=lambda n: self.stdout.write(f"  {n} billeteras..."),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Fotos al {as_of:%Y-%m-%d %H:%M}: {total} billeteras en {time.perf_counter() - inicio:.1f} s"
+        ))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from wallets.integrity import verify_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica que el saldo de cada billetera sea igual a la suma de sus transacciones "
+        "completadas. Con --repair corrige los saldos descuadrados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Filas leídas por tanda")
+        parser.add_argument('--workers', type=int, default=1, help="Procesos en paralelo (por rangos de ids)")
+        parser.add_argument('--repair', action='store_true', help="Corrige el saldo de las billeteras descuadradas")
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+
+        def reportar(resultado):
+            for wallet_id, saldo, esperado in resultado['descuadres']:
+                self.stdout.write(self.style.WARNING(
+                    f"  Billetera #{wallet_id}: saldo S/ {saldo}, según transacciones S/ {esperado} "
+                    f"(diferencia {saldo - esperado})"
+                ))
+
+        total = verify_ledger(
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            reparar=options['repair'],
+            on_range=reportar,
+        )
+        duracion = time.perf_counter() - inicio
+        resumen = (
+            f"Billeteras revisadas: {total['revisadas']} en {duracion:.1f} s. "
+            f"Descuadradas: {len(total['descuadres'])}, reparadas: {total['reparadas']}"
+        )
+        if total['descuadres'] and not options['repair']:
+            self.stdout.write(self.style.ERROR(resumen))
+        else:
+            self.stdout.write(self.style.SUCCESS(resumen))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('travel', '0004_viaje_liquidado_at'),
+        ('wallets', '0002_transaction_viaje'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalletSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('as_of', models.DateTimeField(verbose_name='Saldo a la fecha')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Saldo')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Foto de Saldo',
+                'verbose_name_plural': 'Fotos de Saldo',
+                'ordering': ['-as_of'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['wallet', 'created_at', 'id'], name='transaction_wallet_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='walletsnapshot',
+            name='wallet',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='wallets.wallet'),
+        ),
+        migrations.AddConstraint(
+            model_name='walletsnapshot',
+            constraint=models.UniqueConstraint(fields=('wallet', 'as_of'), name='snapshot_wallet_as_of_unica'),
+        ),
+    ]
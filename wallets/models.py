@@ -51,6 +51,10 @@ class Transaction(models.Model):
         COMPLETED = 'COMPLETED', 'Completado'
         FAILED = 'FAILED', 'Fallido'
 
+    # Tipos que suman al saldo y tipos que restan
+    CREDIT_TYPES = (TransactionType.DEPOSIT, TransactionType.BONUS, TransactionType.REFUND)
+    DEBIT_TYPES = (TransactionType.WITHDRAWAL, TransactionType.FEE)
+
     # Cada transacción pertenece a UNA billetera
     wallet = models.ForeignKey(
         Wallet, 
@@ -80,34 +84,77 @@ class Transaction(models.Model):
     description = models.CharField(max_length=255, verbose_name="Descripción")
     
     # (Opcional) Podemos enlazar una transacción a un viaje específico
-    # viaje = models.ForeignKey('travel.Viaje', on_delete=models.SET_NULL, null=True, blank=True)
+    viaje = models.ForeignKey('travel.Viaje', on_delete=models.SET_NULL, null=True, blank=True, related_name="transactions")
     
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         # Muestra un signo +/- basado en el tipo
-        sign = '+' if self.transaction_type in [self.TransactionType.DEPOSIT, self.TransactionType.BONUS, self.TransactionType.REFUND] else '-'
+        sign = '+' if self.transaction_type in self.CREDIT_TYPES else '-'
         return f"{self.wallet.user_profile.full_name}: {sign}S/ {self.amount} ({self.get_transaction_type_display()})"
 
     class Meta:
         verbose_name = "Transacción"
         verbose_name_plural = "Transacciones"
         ordering = ['-created_at'] # Las más nuevas primero
+        indexes = [
+            # Estados de cuenta: movimientos de UNA billetera en un rango de fechas
+            models.Index(fields=['wallet', 'created_at', 'id'], name='transaction_wallet_created_idx'),
+        ]
+        constraints = [
+            # Un viaje no puede cobrarse/pagarse dos veces en la misma billetera
+            models.UniqueConstraint(fields=['viaje', 'wallet', 'transaction_type'], name='transaction_viaje_unica'),
+        ]
+
+    @property
+    def signed_amount(self):
+        """El monto con signo: positivo si suma al saldo, negativo si resta."""
+        return self.amount if self.transaction_type in self.CREDIT_TYPES else -self.amount
 
     # Lógica para actualizar la billetera automáticamente
     def save(self, *args, **kwargs):
         # Verificamos si es una transacción nueva y completada
         if self.pk is None and self.status == self.TransactionStatus.COMPLETED:
-            with transaction.atomic(): # Asegura que la operación sea segura
-                if self.transaction_type in [self.TransactionType.DEPOSIT, self.TransactionType.BONUS, self.TransactionType.REFUND]:
-                    self.wallet.balance += self.amount
-                elif self.transaction_type in [self.TransactionType.WITHDRAWAL, self.TransactionType.FEE]:
-                    # En un caso real, validaríamos que haya fondos suficientes
-                    if self.wallet.balance >= self.amount:
-                        self.wallet.balance -= self.amount
-                    else:
-                        raise ValueError("Fondos insuficientes")
-                
-                self.wallet.save() # Guardamos el nuevo saldo en la billetera
-        
-        super().save(*args, **kwargs) # Guardamos la transacción
\ No newline at end of file
+            from .ledger import apply_balance_change # Import aquí para evitar imports circulares
+            with transaction.atomic(): # El saldo y la transacción se guardan juntos, o nada
+                # UPDATE condicional en la BD (no "leer, sumar en Python y guardar"):
+                # si no hay fondos suficientes lanza InsufficientFunds (un ValueError)
+                apply_balance_change(self.wallet_id, self.signed_amount)
+                super().save(*args, **kwargs) # Guardamos la transacción
+            if Transaction.wallet.is_cached(self):
+                self.wallet.refresh_from_db(fields=['balance'])
+            return
+
+        super().save(*args, **kwargs) # Guardamos la transacción
+
+
+# ---------------------------------------------------------------------------
+# MODELO 3: FOTO DEL SALDO (WALLET SNAPSHOT)
+# ---------------------------------------------------------------------------
+class WalletSnapshot(models.Model):
+    """
+    El saldo que tenía una billetera en un momento dado (normalmente a la
+    medianoche, ver el comando 'snapshot_wallets'). Sirve de punto de
+    partida para los estados de cuenta: en vez de sumar TODAS las
+    transacciones de la billetera, se suman solo las posteriores a la foto.
+    """
+    wallet = models.ForeignKey(
+        Wallet,
+        on_delete=models.CASCADE,
+        related_name="snapshots"
+    )
+    as_of = models.DateTimeField(verbose_name="Saldo a la fecha")
+    balance = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Saldo")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Billetera #{self.wallet_id} al {self.as_of:%Y-%m-%d %H:%M}: S/ {self.balance}"
+
+    class Meta:
+        verbose_name = "Foto de Saldo"
+        verbose_name_plural = "Fotos de Saldo"
+        ordering = ['-as_of']
+        constraints = [
+            # Una foto por billetera y fecha (y de paso, el índice para buscar la más cercana)
+            models.UniqueConstraint(fields=['wallet', 'as_of'], name='snapshot_wallet_as_of_unica'),
+        ]
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Transaction
+
+
+class TransactionSerializer(serializers.ModelSerializer):
+    """
+    Un movimiento en el estado de cuenta, con el monto ya con su signo.
+    """
+    monto = serializers.DecimalField(source='signed_amount', max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = Transaction
+        fields = ('id', 'transaction_type', 'status', 'monto', 'description', 'viaje', 'created_at')
+        read_only_fields = fields
+
+
+class EstadoCuentaSerializer(serializers.Serializer):
+    """
+    Rango del estado de cuenta (por query params). Por defecto, los últimos 30 días.
+    """
+    desde = serializers.DateTimeField(required=False)
+    hasta = serializers.DateTimeField(required=False)
+
+    def validate(self, data):
+        data.setdefault('hasta', timezone.now())
+        data.setdefault('desde', data['hasta'] - timedelta(days=30))
+        if data['desde'] > data['hasta']:
+            raise serializers.ValidationError("'desde' debe ser anterior a 'hasta'.")
+        return data
@@ -0,0 +1,123 @@
+"""
+Liquidación de viajes: pagar a los conductores por sus viajes FINALIZADOS.
+
+Por cada viaje se registran dos movimientos en la billetera del conductor:
+    DEPOSIT  +precio_final           ("Pago del Viaje #N")
+    FEE      -precio_final * COMISION ("Comisión del Viaje #N")
+
+En vez de guardar cada Transaction con save() (varias consultas por viaje),
+se procesan lotes de viajes. Cada lote hace una cantidad fija de consultas,
+sin importar su tamaño, todo dentro de una transacción:
+  1. SELECT ... FOR UPDATE de los viajes pendientes del lote
+  2. SELECT (y si faltan, INSERT) de las billeteras de los conductores
+  3. bulk_create de todos los movimientos
+  4. UN solo UPDATE de saldos con CASE (neto por billetera)
+  5. UPDATE que marca los viajes como liquidados ('liquidado_at')
+
+Es idempotente: un viaje con 'liquidado_at' ya no se vuelve a tomar, y la
+restricción única (viaje, billetera, tipo) impide pagar dos veces.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from travel.models import Viaje
+from .models import Wallet, Transaction
+
+CENTIMO = Decimal('0.01')
+
+
+def comision_app():
+    return Decimal(str(getattr(settings, 'COMISION_APP', '0.10')))
+
+
+def _pendientes():
+    return Viaje.objects.filter(
+        estado=Viaje.EstadoViaje.FINALIZADO,
+        liquidado_at__isnull=True,
+        conductor__isnull=False,
+        precio_final__isnull=False,
+    )
+
+
+def _billeteras_de(perfil_ids):
+    """{profile_id: wallet_id}, creando las billeteras que falten."""
+    billeteras = dict(
+        Wallet.objects.filter(user_profile_id__in=perfil_ids).values_list('user_profile_id', 'id')
+    )
+    faltantes = set(perfil_ids) - set(billeteras)
+    if faltantes:
+        Wallet.objects.bulk_create(
+            [Wallet(user_profile_id=pid) for pid in faltantes], ignore_conflicts=True
+        )
+        billeteras.update(
+            Wallet.objects.filter(user_profile_id__in=faltantes).values_list('user_profile_id', 'id')
+        )
+    return billeteras
+
+
+def settle_chunk(desde_id, tamano):
+    """
+    Liquida hasta 'tamano' viajes pendientes con id > desde_id.
+    Devuelve (cantidad de viajes liquidados, último id visto o None si no quedan).
+    """
+    comision = comision_app()
+    with transaction.atomic():
+        viajes = list(
+            _pendientes().filter(pk__gt=desde_id)
+            .order_by('pk')
+            .select_for_update(skip_locked=True) # Si otro proceso ya los tomó, los saltamos
+            .values_list('id', 'conductor_id', 'precio_final')[:tamano]
+        )
+        if not viajes:
+            return 0, None
+
+        billeteras = _billeteras_de({conductor_id for _, conductor_id, _ in viajes})
+        ahora = timezone.now()
+        movimientos, netos = [], {}
+        for viaje_id, conductor_id, precio in viajes:
+            wallet_id = billeteras[conductor_id]
+            fee = (precio * comision).quantize(CENTIMO, ROUND_HALF_UP)
+            movimientos.append(Transaction(
+                wallet_id=wallet_id, viaje_id=viaje_id, amount=precio,
+                transaction_type=Transaction.TransactionType.DEPOSIT,
+                description=f"Pago del Viaje #{viaje_id}",
+            ))
+            movimientos.append(Transaction(
+                wallet_id=wallet_id, viaje_id=viaje_id, amount=fee,
+                transaction_type=Transaction.TransactionType.FEE,
+                description=f"Comisión del Viaje #{viaje_id}",
+            ))
+            netos[wallet_id] = netos.get(wallet_id, Decimal('0')) + precio - fee
+
+        # bulk_create no llama a Transaction.save(): el saldo lo movemos abajo, una vez por billetera
+        Transaction.objects.bulk_create(movimientos)
+        Wallet.objects.filter(pk__in=netos).update(
+            balance=F('balance') + Case(
+                *[When(pk=wallet_id, then=Value(neto)) for wallet_id, neto in netos.items()],
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+            updated_at=ahora,
+        )
+        Viaje.objects.filter(pk__in=[v[0] for v in viajes]).update(liquidado_at=ahora)
+
+    return len(viajes), viajes[-1][0]
+
+
+def settle_finished_trips(chunk_size=2000, on_chunk=None):
+    """
+    Recorre todos los viajes pendientes por lotes (paginando por id) y los
+    liquida. 'on_chunk(liquidados_hasta_ahora)' se llama después de cada lote.
+    Devuelve el total de viajes liquidados.
+    """
+    total, ultimo_id = 0, 0
+    while True:
+        liquidados, ultimo_id = settle_chunk(ultimo_id, chunk_size)
+        if ultimo_id is None:
+            return total
+        total += liquidados
+        if on_chunk:
+            on_chunk(total)
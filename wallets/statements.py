@@ -0,0 +1,123 @@
+"""
+Estados de cuenta: "¿cuánto tenía a tal hora?" y "¿qué movimientos hubo
+entre tal y tal fecha?", sin recorrer todo el historial de la billetera.
+
+Cada día se guarda una foto del saldo de cada billetera (WalletSnapshot).
+Para saber el saldo en un momento T se toma la foto más cercana anterior
+a T y se le suman solo los movimientos entre la foto y T, usando el
+índice (wallet, created_at, id). El costo depende de cuántos movimientos
+hubo desde la última foto (un día), no de toda la historia.
+
+Solo cuentan las transacciones COMPLETADAS (las únicas que mueven el saldo).
+"""
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from .ledger import signed_amount_sum
+from .models import Wallet, Transaction, WalletSnapshot
+
+CERO = Decimal('0.00')
+
+
+def _completadas(wallet_ids):
+    return Transaction.objects.filter(
+        wallet_id__in=wallet_ids, status=Transaction.TransactionStatus.COMPLETED
+    )
+
+
+def _suma(queryset):
+    return queryset.aggregate(total=signed_amount_sum())['total'] or CERO
+
+
+def ultima_medianoche():
+    """Las 00:00 de hoy, en la zona horaria del proyecto."""
+    return timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+
+
+def snapshot_chunk(as_of, desde_id, tamano):
+    """
+    Guarda la foto del saldo al 'as_of' de hasta 'tamano' billeteras con id > desde_id.
+    Devuelve (fotos guardadas, último id visto o None si no quedan).
+
+    saldo(as_of) = saldo actual - movimientos posteriores a 'as_of'.
+    Las billeteras del lote se bloquean mientras se calcula, para que
+    ningún movimiento se cuele entre la lectura del saldo y la suma.
+    """
+    with transaction.atomic():
+        saldos = dict(
+            Wallet.objects.filter(pk__gt=desde_id).order_by('pk')
+            .select_for_update()
+            .values_list('id', 'balance')[:tamano]
+        )
+        if not saldos:
+            return 0, None
+        posteriores = dict(
+            _completadas(saldos).filter(created_at__gt=as_of)
+            .values('wallet_id').annotate(total=signed_amount_sum())
+            .order_by().values_list('wallet_id', 'total')
+        )
+        WalletSnapshot.objects.bulk_create(
+            [
+                WalletSnapshot(wallet_id=wallet_id, as_of=as_of, balance=saldo - posteriores.get(wallet_id, CERO))
+                for wallet_id, saldo in saldos.items()
+            ],
+            ignore_conflicts=True, # Si ya había foto de ese día, se deja la que estaba
+        )
+    return len(saldos), max(saldos)
+
+
+def take_snapshots(as_of=None, chunk_size=1000, on_chunk=None):
+    """
+    Foto del saldo de todas las billeteras al 'as_of' (por defecto, la
+    última medianoche). Devuelve cuántas billeteras se procesaron.
+    """
+    as_of = as_of or ultima_medianoche()
+    total, ultimo_id = 0, 0
+    while True:
+        procesadas, ultimo_id = snapshot_chunk(as_of, ultimo_id, chunk_size)
+        if ultimo_id is None:
+            return total
+        total += procesadas
+        if on_chunk:
+            on_chunk(total)
+
+
+def balance_at(wallet_id, momento):
+    """
+    Saldo de la billetera en 'momento' (incluye los movimientos de ese instante).
+
+    Con foto anterior: foto + movimientos en (foto, momento].
+    Sin foto (billetera nueva): saldo actual - movimientos posteriores a 'momento'.
+    Lanza Wallet.DoesNotExist si la billetera no existe.
+    """
+    foto = (
+        WalletSnapshot.objects.filter(wallet_id=wallet_id, as_of__lte=momento)
+        .order_by('-as_of').values_list('as_of', 'balance').first()
+    )
+    if foto:
+        as_of, saldo = foto
+        return saldo + _suma(_completadas([wallet_id]).filter(created_at__gt=as_of, created_at__lte=momento))
+
+    saldo = Wallet.objects.values_list('balance', flat=True).get(pk=wallet_id)
+    return saldo - _suma(_completadas([wallet_id]).filter(created_at__gt=momento))
+
+
+def transactions_between(wallet_id, desde, hasta):
+    """
+    Movimientos de la billetera en (desde, hasta]. Es un QuerySet: se
+    pagina por cursor (created_at, id) sobre el índice de la billetera.
+    """
+    return Transaction.objects.filter(wallet_id=wallet_id, created_at__gt=desde, created_at__lte=hasta)
+
+
+def statement(wallet_id, desde, hasta):
+    """Saldo inicial (en 'desde') y final (en 'hasta') del estado de cuenta."""
+    saldo_inicial = balance_at(wallet_id, desde)
+    movimientos = _completadas([wallet_id]).filter(created_at__gt=desde, created_at__lte=hasta)
+    return {
+        'saldo_inicial': saldo_inicial,
+        'saldo_final': saldo_inicial + _suma(movimientos),
+    }
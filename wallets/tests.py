@@ -1,3 +1,255 @@
-from django.test import TestCase
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from travel.models import Viaje
+from users.models import UserProfile
+from users.utils import clear_profile_id_cache
+from .integrity import verify_ledger, wallet_id_ranges
+from .ledger import InsufficientFunds, post_transaction
+from .models import Wallet, Transaction, WalletSnapshot
+from .settlement import settle_chunk, settle_finished_trips
+from .statements import balance_at, take_snapshots
+
+T = Transaction.TransactionType
+
+
+def crear_billetera(username, phone, balance='0.00'):
+    user = User.objects.create(username=username)
+    UserProfile.objects.filter(user=user).delete()  # Lo crea el signal; lo rehacemos con nuestros datos
+    perfil = UserProfile.objects.create(user=user, full_name=username, phone=phone)
+    return Wallet.objects.create(user_profile=perfil, balance=Decimal(balance))
+
+
+# ---------------------------------------------------------------------------
+# MOVIMIENTOS DE BILLETERA
+# ---------------------------------------------------------------------------
+class LedgerTests(TestCase):
+
+    def setUp(self):
+        self.wallet = crear_billetera('conductor@test.com', '900000001', '10.00')
+
+    def test_deposito_y_retiro(self):
+        with self.assertNumQueries(4):  # SAVEPOINT + UPDATE + INSERT + RELEASE
+            post_transaction(self.wallet.id, Decimal('5.50'), T.DEPOSIT, "Pago de viaje")
+        post_transaction(self.wallet.id, Decimal('3.00'), T.FEE, "Comisión")
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('12.50'))
+
+    def test_fondos_insuficientes_no_guarda_nada(self):
+        with self.assertRaises(InsufficientFunds):
+            post_transaction(self.wallet.id, Decimal('10.01'), T.WITHDRAWAL, "Retiro")
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('10.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_save_con_billetera_desactualizada(self):
+        # Otra copia del objeto Wallet, con el saldo "viejo"
+        vieja = Wallet.objects.get(pk=self.wallet.pk)
+        post_transaction(self.wallet.id, Decimal('5.00'), T.DEPOSIT, "Pago")
+        Transaction.objects.create(wallet=vieja, amount=Decimal('1.00'), transaction_type=T.BONUS, description="Bono")
+        self.assertEqual(vieja.balance, Decimal('16.00'))
+
+
+class LedgerConcurrencyTests(TransactionTestCase):
+    """
+    Muchos hilos (cada uno con su conexión) moviendo la misma billetera
+    a la vez: el saldo final debe ser exacto.
+    """
+
+    def correr_en_hilos(self, n_hilos, trabajo):
+        barrera = threading.Barrier(n_hilos)
+
+        def hilo(i):
+            try:
+                barrera.wait()
+                trabajo(i)
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=hilo, args=(i,)) for i in range(n_hilos)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+
+    def test_saldo_exacto(self):
+        wallet = crear_billetera('conductor@test.com', '900000001', '100.00')
+
+        def trabajo(i):
+            for _ in range(10):
+                post_transaction(wallet.id, Decimal('2.00'), T.DEPOSIT, "Pago")
+                post_transaction(wallet.id, Decimal('1.00'), T.FEE, "Comisión")
+
+        self.correr_en_hilos(10, trabajo)
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('200.00'))
+        self.assertEqual(Transaction.objects.count(), 200)
+
+    def test_nunca_queda_en_negativo(self):
+        wallet = crear_billetera('conductor@test.com', '900000001', '10.00')
+        exitos, rechazos = [], []
+
+        def trabajo(i):
+            try:
+                post_transaction(wallet.id, Decimal('1.00'), T.WITHDRAWAL, "Retiro")
+                exitos.append(i)
+            except InsufficientFunds:
+                rechazos.append(i)
+
+        self.correr_en_hilos(25, trabajo)
+        wallet.refresh_from_db()
+        self.assertEqual(wallet.balance, Decimal('0.00'))
+        self.assertEqual((len(exitos), len(rechazos)), (10, 15))
+
+
+# ---------------------------------------------------------------------------
+# LIQUIDACIÓN DE VIAJES
+# ---------------------------------------------------------------------------
+class SettlementTests(TestCase):
+
+    def setUp(self):
+        self.wallet = crear_billetera('conductor@test.com', '900000001', '1.00')
+        self.conductor = self.wallet.user_profile
+        self.sin_billetera = UserProfile.objects.get(user=User.objects.create(username='nuevo@test.com'))
+        self.pasajero = self.sin_billetera
+
+    def crear_viaje(self, conductor, precio, estado=Viaje.EstadoViaje.FINALIZADO):
+        return Viaje.objects.create(
+            pasajero=self.pasajero, conductor=conductor, estado=estado, precio_final=precio,
+            origen_lat=0, origen_lng=0, destino_lat=0, destino_lng=0,
+        )
+
+    def test_liquida_por_lotes_y_es_idempotente(self):
+        self.crear_viaje(self.conductor, Decimal('10.00'))
+        self.crear_viaje(self.conductor, Decimal('20.05'))
+        self.crear_viaje(self.sin_billetera, Decimal('8.00'))
+        self.crear_viaje(self.conductor, Decimal('99.00'), estado=Viaje.EstadoViaje.EN_PROGRESO)
+
+        self.assertEqual(settle_finished_trips(chunk_size=2), 3)
+
+        self.wallet.refresh_from_db()
+        # 1.00 + (10.00 - 1.00) + (20.05 - 2.01)
+        self.assertEqual(self.wallet.balance, Decimal('28.04'))
+        self.assertEqual(Wallet.objects.get(user_profile=self.sin_billetera).balance, Decimal('7.20'))
+        self.assertEqual(Transaction.objects.count(), 6)
+
+        # Correrlo de nuevo no paga doble
+        self.assertEqual(settle_finished_trips(), 0)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('28.04'))
+
+    def test_consultas_fijas_por_lote(self):
+        viajes = [self.crear_viaje(self.conductor, Decimal('10.00')) for _ in range(50)]
+        # SAVEPOINT, SELECT viajes, SELECT billeteras, INSERT, UPDATE saldos, UPDATE viajes, RELEASE
+        with self.assertNumQueries(7):
+            self.assertEqual(settle_chunk(0, 100), (50, viajes[-1].pk))
+
+
+# ---------------------------------------------------------------------------
+# FOTOS DE SALDO Y ESTADOS DE CUENTA
+# ---------------------------------------------------------------------------
+class StatementTests(TestCase):
+
+    def setUp(self):
+        self.wallet = crear_billetera('conductor@test.com', '900000001')
+        self.t0 = timezone.now() - timedelta(days=3)
+        # Un movimiento por día: +100 (día 0), -30 (día 1), +50 (día 2)
+        for dias, monto, tipo in ((0, '100.00', T.DEPOSIT), (1, '30.00', T.WITHDRAWAL), (2, '50.00', T.DEPOSIT)):
+            tx = post_transaction(self.wallet.id, Decimal(monto), tipo, "Movimiento")
+            Transaction.objects.filter(pk=tx.pk).update(created_at=self.dia(dias))
+
+    def dia(self, n, horas=0):
+        return self.t0 + timedelta(days=n, hours=horas)
+
+    def test_saldo_en_el_tiempo_con_y_sin_fotos(self):
+        esperados = {self.dia(0, -1): '0.00', self.dia(0): '100.00', self.dia(1, 1): '70.00', self.dia(3): '120.00'}
+        for momento, saldo in esperados.items():
+            self.assertEqual(balance_at(self.wallet.id, momento), Decimal(saldo))
+
+        self.assertEqual(take_snapshots(as_of=self.dia(1, 12), chunk_size=1), 1)
+        self.assertEqual(WalletSnapshot.objects.get().balance, Decimal('70.00'))
+        # Foto + una suma acotada por el índice
+        with self.assertNumQueries(2):
+            self.assertEqual(balance_at(self.wallet.id, self.dia(2, 1)), Decimal('120.00'))
+        for momento, saldo in esperados.items():
+            self.assertEqual(balance_at(self.wallet.id, momento), Decimal(saldo))
+
+        # Repetir la foto del mismo momento no la duplica
+        take_snapshots(as_of=self.dia(1, 12))
+        self.assertEqual(WalletSnapshot.objects.count(), 1)
+
+    def test_api_estado_de_cuenta(self):
+        client = APIClient()
+        client.force_authenticate(self.wallet.user_profile.user)
+        respuesta = client.get(reverse('estado-de-cuenta'), {
+            'desde': self.dia(0, 1).isoformat(), 'hasta': self.dia(3).isoformat(), 'page_size': 1,
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual((respuesta.data['saldo_inicial'], respuesta.data['saldo_final']), ('100.00', '120.00'))
+        self.assertEqual([m['monto'] for m in respuesta.data['results']], ['50.00'])
+
+        respuesta = client.get(respuesta.data['next'])
+        self.assertEqual([m['monto'] for m in respuesta.data['results']], ['-30.00'])
+        self.assertIsNone(respuesta.data['next'])
+
+    def test_api_sin_perfil_es_404(self):
+        clear_profile_id_cache()
+        user = User.objects.create(username='sinperfil@test.com')
+        UserProfile.objects.filter(user=user).delete()
+        client = APIClient()
+        client.force_authenticate(user)
+        respuesta = client.get(reverse('estado-de-cuenta'), {'desde': self.dia(0).isoformat(), 'hasta': self.dia(3).isoformat()})
+        self.assertEqual(respuesta.status_code, 404)
+
+
+# ---------------------------------------------------------------------------
+# VERIFICACIÓN DEL LIBRO CONTABLE
+# ---------------------------------------------------------------------------
+class LedgerIntegrityTests(TestCase):
+
+    def setUp(self):
+        self.billeteras = [crear_billetera(f'u{i}@test.com', f'90000000{i}') for i in range(5)]
+        for wallet in self.billeteras:
+            post_transaction(wallet.id, Decimal('40.00'), T.DEPOSIT, "Recarga")
+            post_transaction(wallet.id, Decimal('15.50'), T.WITHDRAWAL, "Retiro")
+        # Un movimiento pendiente no cuenta
+        Transaction.objects.create(
+            wallet=self.billeteras[0], amount=Decimal('99.00'), transaction_type=T.DEPOSIT,
+            description="Pendiente", status=Transaction.TransactionStatus.PENDING,
+        )
+
+    def test_detecta_y_repara_descuadres(self):
+        malas = self.billeteras[1], self.billeteras[4]
+        Wallet.objects.filter(pk__in=[w.pk for w in malas]).update(balance=Decimal('1.00'))
+
+        resultado = verify_ledger(chunk_size=2)
+        self.assertEqual(resultado['revisadas'], 5)
+        self.assertEqual(
+            resultado['descuadres'],
+            [(w.id, Decimal('1.00'), Decimal('24.50')) for w in malas],
+        )
+        self.assertEqual(Wallet.objects.get(pk=malas[0].pk).balance, Decimal('1.00'))  # Sin --repair no toca nada
+
+        salida = StringIO()
+        call_command('verify_ledger', repair=True, stdout=salida)
+        self.assertIn("reparadas: 2", salida.getvalue())
+        self.assertEqual(set(Wallet.objects.values_list('balance', flat=True)), {Decimal('24.50')})
+        self.assertEqual(verify_ledger()['descuadres'], [])
+
+    def test_rangos_cubren_todas_las_billeteras(self):
+        ids = sorted(w.id for w in self.billeteras)
+        Wallet.objects.filter(pk=ids[1]).delete()  # Un hueco en los ids
+        ids.pop(1)
+        rangos = wallet_id_ranges(2)
+        self.assertEqual(rangos, [(ids[0], ids[1]), (ids[2], ids[3])])
+        self.assertEqual(wallet_id_ranges(3), [(ids[0], ids[2]), (ids[3], ids[3])])
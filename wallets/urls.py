@@ -0,0 +1,8 @@
+from django.urls import path
+from .views import EstadoCuentaView
+
+urlpatterns = [
+    # GET /api/wallets/estado-de-cuenta/?desde=...&hasta=...
+    # (paginado por cursor: seguir el link "next")
+    path('estado-de-cuenta/', EstadoCuentaView.as_view(), name='estado-de-cuenta'),
+]
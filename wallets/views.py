@@ -1,3 +1,57 @@
-from django.shortcuts import render
+from django.http import Http404
+from rest_framework import generics, permissions
 
-# Create your views here.
+from travel.pagination import HistorialCursorPagination
+from users.models import UserProfile
+from users.utils import get_profile_id
+from .models import Wallet
+from .serializers import TransactionSerializer, EstadoCuentaSerializer
+from .statements import statement, transactions_between
+
+
+# ---------------------------------------------------------------------------
+# VISTA 1: ESTADO DE CUENTA
+# /api/wallets/estado-de-cuenta/?desde=...&hasta=...
+# ---------------------------------------------------------------------------
+class EstadoCuentaView(generics.ListAPIView):
+    """
+    Movimientos de MI billetera en un rango de fechas (del más nuevo al más
+    antiguo, paginados por cursor), con el saldo al inicio y al final del rango.
+    Los saldos se calculan desde la foto diaria más cercana (ver wallets/statements.py).
+    """
+    serializer_class = TransactionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = HistorialCursorPagination
+
+    def get_rango(self):
+        if not hasattr(self, '_rango'):
+            params = EstadoCuentaSerializer(data=self.request.query_params)
+            params.is_valid(raise_exception=True)
+            self._rango = params.validated_data
+        return self._rango
+
+    def get_wallet_id(self):
+        if not hasattr(self, '_wallet_id'):
+            try:
+                self._wallet_id = Wallet.objects.values_list('id', flat=True).get(
+                    user_profile_id=get_profile_id(self.request.user)
+                )
+            except UserProfile.DoesNotExist:
+                raise Http404("Perfil de usuario no encontrado.")
+            except Wallet.DoesNotExist:
+                raise Http404("No tienes una billetera.")
+        return self._wallet_id
+
+    def get_queryset(self):
+        rango = self.get_rango()
+        return transactions_between(self.get_wallet_id(), rango['desde'], rango['hasta'])
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        rango = self.get_rango()
+        response.data.update(
+            desde=rango['desde'],
+            hasta=rango['hasta'],
+            **{clave: str(valor) for clave, valor in statement(self.get_wallet_id(), rango['desde'], rango['hasta']).items()},
+        )
+        return response